@@ -0,0 +1,53 @@
+"""
+SQLite settings for running several workers against one database file, and the
+router that sends reads from safe requests to the read-only alias.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Applied by Django to every new connection (OPTIONS["init_command"]).
+# journal_mode=WAL lets readers proceed while one writer commits; it is stored in
+# the file, the others are per connection.
+SQLITE_PRAGMAS = ';'.join((
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-20000',
+    'PRAGMA mmap_size=134217728',
+    'PRAGMA temp_store=MEMORY',
+))
+
+_use_read_database = ContextVar('use_read_database', default=False)
+
+
+@contextmanager
+def read_database():
+    """Route reads in this block (and in code it awaits) to settings.READ_DATABASE_ALIAS."""
+    token = _use_read_database.set(True)
+    try:
+        yield
+    finally:
+        _use_read_database.reset(token)
+
+
+class ReadWriteRouter:
+    """
+    Writes and migrations go to "default". Reads go to the read alias inside
+    `read_database()`, which ReadOnlyRequestMiddleware opens for GET/HEAD/OPTIONS.
+    Both aliases point at the same file, so there is no replication lag.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_read_database.get() and settings.READ_DATABASE_ALIAS in settings.DATABASES:
+            return settings.READ_DATABASE_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
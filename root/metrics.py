@@ -0,0 +1,222 @@
+"""
+In-process request metrics in the Prometheus text format.
+
+RequestMetricsMiddleware samples requests (METRICS_SAMPLE_RATE). A sampled
+request gets a per-request `RequestStats` in a context variable. A wrapper
+installed on every database connection adds each statement's count, time and SQL
+to it, so this also works for sync views run from the async handler's thread
+pool. Unsampled requests skip all of this and cost one random() call.
+
+Every worker process keeps its own registry, so /metrics describes the process
+that answered the scrape.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'sql_seconds', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        """SQL strings (parameters aside) run at least `threshold` times: the usual sign of an N+1 loop."""
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_seconds += time.perf_counter() - start
+        stats.queries += 1
+        stats.statements[sql] += 1
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket', {**labels, 'le': _format(bound)}, cumulative
+        yield f'{name}_bucket', {**labels, 'le': '+Inf'}, self.count
+        yield f'{name}_sum', labels, self.sum
+        yield f'{name}_count', labels, self.count
+
+
+class MetricsRegistry:
+    """Per-route histograms and counters, plus collectors other apps register for their own gauges."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.query_counts = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.sql_durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.repeated_queries = Counter()
+        self.collectors = []
+
+    def register_collector(self, collector):
+        """`collector()` returns an iterable of (name, type, help, [(labels, value), ...])."""
+        self.collectors.append(collector)
+
+    def observe(self, route, method, status, seconds, stats):
+        key = (route, method)
+        with self._lock:
+            self.requests[(route, method, str(status))] += 1
+            self.durations[key].observe(seconds)
+            self.query_counts[key].observe(stats.queries)
+            self.sql_durations[key].observe(stats.sql_seconds)
+            if stats.repeated(settings.METRICS_NPLUSONE_THRESHOLD):
+                self.repeated_queries[key] += 1
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.durations.clear()
+            self.query_counts.clear()
+            self.sql_durations.clear()
+            self.repeated_queries.clear()
+
+    def render(self):
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{_labels(labels)} {_format(value)}')
+
+        def route_labels(key):
+            return {'route': key[0], 'method': key[1]}
+
+        with self._lock:
+            family('http_requests_total', 'counter', 'Sampled requests by route, method and status.', [
+                ('http_requests_total', {'route': route, 'method': method, 'status': status}, count)
+                for (route, method, status), count in sorted(self.requests.items())
+            ])
+            for name, help_text, histograms in (
+                ('http_request_duration_seconds', 'Wall time spent in Django per sampled request.', self.durations),
+                ('http_request_queries', 'SQL statements per sampled request.', self.query_counts),
+                ('http_request_sql_seconds', 'Time spent in SQL per sampled request.', self.sql_durations),
+            ):
+                family(name, 'histogram', help_text, [
+                    sample for key in sorted(histograms)
+                    for sample in histograms[key].samples(name, route_labels(key))
+                ])
+            family('http_requests_repeated_queries_total', 'counter',
+                   f'Sampled requests that ran one statement at least {settings.METRICS_NPLUSONE_THRESHOLD} times.', [
+                       ('http_requests_repeated_queries_total', route_labels(key), count)
+                       for key, count in sorted(self.repeated_queries.items())
+                   ])
+        family('metrics_sample_rate', 'gauge', 'Fraction of requests that are instrumented.', [
+            ('metrics_sample_rate', {}, settings.METRICS_SAMPLE_RATE),
+        ])
+        for collector in self.collectors:
+            for name, kind, help_text, samples in collector():
+                family(name, kind, help_text, [(name, labels, value) for labels, value in samples])
+        return '\n'.join(lines) + '\n'
+
+
+def _format(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def start_request():
+    stats = RequestStats()
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+    return stats, _current.set(stats)
+
+
+def finish_request(request, response, stats, token, started):
+    _current.reset(token)
+    seconds = time.perf_counter() - started
+    match = request.resolver_match
+    route = '/' + match.route if match else '<unmatched>'
+    registry.observe(route, request.method, response.status_code, seconds, stats)
+
+    repeated = stats.repeated(settings.METRICS_NPLUSONE_THRESHOLD)
+    for sql, count in repeated.items():
+        logger.warning('%s %s ran the same statement %d times: %s', request.method, route, count, sql)
+    # Keep any entries the view added (e.g. the dashboard's per-section timings).
+    response['Server-Timing'] = ', '.join(filter(None, (
+        f'app;dur={seconds * 1000:.1f}',
+        f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.queries} queries, {len(repeated)} repeated"',
+        response.get('Server-Timing'),
+    )))
+
+
+def metrics_view(request):
+    # With METRICS_TOKEN set scrapers present it; without one only staff signed in to the admin may look.
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,9 +1,12 @@
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
 from django.conf.global_settings import AUTH_USER_MODEL, MEDIA_ROOT
 
+from root.db import SQLITE_PRAGMAS
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,7 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'root.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'root.middleware.ReadOnlyRequestMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -49,7 +54,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'root.middleware.AsyncWhiteNoiseMiddleware',
 ]
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -83,11 +88,53 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite in WAL mode with persistent connections. "read" is the same file opened
+# query_only; ReadWriteRouter sends the reads of safe requests there.
+# SQLITE_PATH points both at another file (e.g. a benchmark's seeded database).
+SQLITE_PATH = os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': SQLITE_PATH,
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': SQLITE_PRAGMAS,
+        },
+    },
+    'read': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_PATH,
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'init_command': SQLITE_PRAGMAS + ';PRAGMA query_only=1',
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['root.db.ReadWriteRouter']
+READ_DATABASE_ALIAS = 'read'
+
+
+# Caches: "default" is per process, "shared" is visible to every worker on the host.
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'auth-order-cache')),
+    },
 }
 
 
@@ -145,9 +192,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Railway's edge proxy appends the client address to X-Forwarded-For; entries
+    # before it come from the client and are not trusted (0: use REMOTE_ADDR).
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 1)),
 }
 
 SIMPLE_JWT = {
@@ -162,4 +212,132 @@ SPECTACULAR_SETTINGS = {
     'TITLE': 'Auth API',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
-}
\ No newline at end of file
+    'DEFAULT_GENERATOR_CLASS': 'users.schema.SchemaGenerator',
+}
+
+# collectstatic writes the OpenAPI schema here, plus a content-hashed copy that /schema/ redirects to
+SCHEMA_STATIC_PATH = 'openapi/schema.json'
+
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'users.openapi.SchemaFinder',
+]
+
+# Keyset (cursor) pagination used by the order listings
+KEYSET_PAGE_SIZE = 50
+KEYSET_MAX_PAGE_SIZE = 500
+
+# Rows fetched per database round trip by the streaming exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Product import (users.imports): rows validated and upserted per transaction,
+# and the most row errors reported in full (the rest are only counted)
+PRODUCT_IMPORT_BATCH_SIZE = 1000
+PRODUCT_IMPORT_MAX_ERRORS = 1000
+
+# Cached ranking behind /top-products/ (?limit= is capped at the cache size), kept
+# where every worker sees it so an order or product write invalidates it for all
+TOP_PRODUCTS_CACHE_ALIAS = 'shared'
+TOP_PRODUCTS_CACHE_SIZE = 50
+TOP_PRODUCTS_CACHE_TIMEOUT = 300
+
+# Rows per INSERT statement when /last-orders/ receives a batch
+ORDER_INGEST_CHUNK_SIZE = 500
+
+# Overdue to-do/doing orders become "lated" (mark_overdue_orders); with an interval
+# set, every app process also runs the job on a background thread
+ORDER_OVERDUE_AFTER = timedelta(days=3)
+ORDER_OVERDUE_BATCH_SIZE = 1000
+ORDER_OVERDUE_INTERVAL = int(os.environ.get('ORDER_OVERDUE_INTERVAL', 0))
+
+# Window of daily order rollups returned by /chart/ (?days=)
+CHART_DEFAULT_DAYS = 7
+CHART_MAX_DAYS = 90
+
+# /dashboard/: threads computing its sections, seconds each section is cached
+# (0 disables), and the number of top products it lists
+DASHBOARD_WORKERS = 4
+DASHBOARD_SECTION_TTL = {
+    'recent_orders': 5,
+    'top_products': 30,
+    'chart': 30,
+    'profile': 10,
+}
+DASHBOARD_TOP_PRODUCTS = 3
+
+# /orders/stream/ (users.events): events kept for Last-Event-ID resume, events queued
+# per client before a slow client is dropped, seconds between heartbeats, the
+# reconnect delay sent to clients, and the most streams one process serves
+ORDER_STREAM_BUFFER = 1000
+ORDER_STREAM_CLIENT_BUFFER = 256
+ORDER_STREAM_HEARTBEAT = 15
+ORDER_STREAM_RETRY_MS = 3000
+ORDER_STREAM_MAX_SUBSCRIBERS = 1000
+# Under WSGI (the web process type) a stream holds a whole worker: 0 refuses it with
+# 503, otherwise it ends after that many seconds and the client reconnects
+ORDER_STREAM_WSGI_SECONDS = float(os.environ.get('ORDER_STREAM_WSGI_SECONDS', 0))
+
+# Delta sync (/products/changes/, /orders/changes/): changes per response, how long a
+# change is held back (longer than a write can wait for the SQLite lock, see
+# DATABASES timeout), and how long tombstones of deleted rows are kept; older
+# sync tokens are refused
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 5000
+SYNC_SETTLE = timedelta(seconds=25)
+SYNC_TOMBSTONE_TTL = timedelta(days=30)
+
+# User lookups done by CachedJWTAuthentication, cached per process; the TTL bounds
+# how long other workers can serve a user after it changed
+AUTH_USER_CACHE_LOCAL_TTL = 5
+AUTH_USER_CACHE_SIZE = 1024
+
+# Serve the async view variants; root/asgi.py turns this on
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '0') == '1'
+
+# Token-bucket throttles of the auth views (users.throttling), kept in a SQLite
+# file every worker process shares. "N/period" allows a burst of N, refilled at
+# N per period, for each client IP and each submitted username
+THROTTLE_DATABASE = os.environ.get(
+    'THROTTLE_DATABASE', os.path.join(tempfile.gettempdir(), 'auth-order-throttle.sqlite3')
+)
+THROTTLE_DATABASE_TIMEOUT = 1.0
+THROTTLE_RATES = {
+    'login': {'ip': '30/min', 'username': '10/min'},
+    'register': {'ip': '10/hour'},
+    'refresh': {'ip': '60/min'},
+}
+THROTTLE_PRUNE_EVERY = 1000
+
+# Bounded thread pool for password hashing in the async auth views
+HASHING_POOL_WORKERS = 4
+HASHING_POOL_QUEUE = 32
+
+# In-memory index of blacklisted refresh tokens (users.tokens.revocation_index)
+REVOCATION_FILTER_CAPACITY = 100_000
+REVOCATION_FILTER_ERROR_RATE = 0.001
+REVOCATION_CONFIRMED_SIZE = 10_000
+REVOCATION_SYNC_INTERVAL = 1.0
+REVOCATION_REBUILD_INTERVAL = 3600
+
+# Versioned response cache for the product endpoints
+CATALOG_VERSION_CACHE_ALIAS = 'shared'
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 600
+
+# Resized image variants built after upload (users.images)
+IMAGE_VARIANT_WIDTHS = (160, 480, 960)
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_PIPELINE_WORKERS = 2
+
+# bench_endpoints --compare: a p95 more than this fraction (and this many ms) slower is a regression
+BENCH_REGRESSION_THRESHOLD = 0.5
+BENCH_REGRESSION_MIN_DELTA_MS = 5.0
+
+# Request instrumentation (root.metrics): share of requests timed, repeats of one
+# statement that count as an N+1, and the bearer token /metrics asks for (without one
+# it is open to staff signed in to the admin only)
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))
+METRICS_NPLUSONE_THRESHOLD = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
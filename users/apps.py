@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.conf import settings
+        from root.metrics import registry
+        from users import metrics, signals  # noqa: F401
+        from users.statuses import overdue_scheduler
+        registry.register_collector(metrics.collect)
+        if settings.ORDER_OVERDUE_INTERVAL:
+            overdue_scheduler.start()
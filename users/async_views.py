@@ -0,0 +1,228 @@
+"""
+Async counterparts of the auth and read views, routed in place of the DRF ones
+when the app runs under root/asgi.py (settings.ASYNC_VIEWS).
+
+The hashing flows from users.auth run on `hashing_pool`, so a burst of logins
+ties up a bounded number of threads instead of whole worker processes.
+
+The read views reuse the configuration of their DRF view (queryset, filters,
+pagination, fields, response cache) and read rows with the async ORM. While a
+request waits on the database or a slow client, the worker serves other
+connections. Cache lookups stay synchronous: they are in-memory or small local
+file reads. Other methods on the same URL (e.g. POST /products/) go to the DRF
+view.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from users import auth
+from users.authentication import CachedJWTAuthentication
+from users.events import astream, event_stream_response, last_event_id, order_events
+from users.caching import VersionedResponseMixin
+from users.hashing import hashing_pool, HashingPoolSaturated
+from users.models import Order
+from users.pagination import KeysetPagination
+from users.renderers import ORJSONRenderer
+from users.sales import atop_products
+from users.serializers import UserProfileSerializer, recent_orders_values_serializer
+from users.throttling import throttle_wait
+from users.views import GetUsersAPIView, ProductsAPIView, stream_unavailable, top_products_limit
+
+
+class AsyncAPIView(View):
+    http_method_names = ['post', 'options']
+    throttle_scope = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    @staticmethod
+    def parse(request):
+        if request.content_type == 'application/json':
+            return json.loads(request.body or b'{}')
+        return request.POST.dict()
+
+    async def run_flow(self, flow, *args):
+        try:
+            body, code = await hashing_pool.run(flow, *args)
+        except HashingPoolSaturated:
+            response = JsonResponse(
+                {"detail": "Too many authentication requests, try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            response['Retry-After'] = '1'
+            return response
+        return JsonResponse(body, status=code)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.data = self.parse(request)
+        except ValueError as e:
+            return JsonResponse({"detail": f"JSON parse error - {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if self.throttle_scope and request.method != 'OPTIONS':
+            wait = await sync_to_async(throttle_wait, thread_sensitive=False)(self.throttle_scope, request, request.data)
+            if wait is not None:
+                return self.throttled(wait)
+        return await super().dispatch(request, *args, **kwargs)
+
+    @staticmethod
+    def throttled(wait):
+        # The same response DRF gives for a throttled request.
+        exc = Throttled(wait)
+        response = JsonResponse({"detail": exc.detail}, status=exc.status_code)
+        response['Retry-After'] = '%d' % exc.wait
+        return response
+
+
+class AsyncRegisterAPIView(AsyncAPIView):
+    throttle_scope = 'register'
+
+    async def post(self, request):
+        return await self.run_flow(auth.register, request.data)
+
+
+class AsyncLoginAPIView(AsyncAPIView):
+    throttle_scope = 'login'
+
+    async def post(self, request):
+        return await self.run_flow(auth.login, request.data)
+
+
+async def authenticate(request):
+    """Set request.user from the bearer token; return a 401 response if that fails."""
+    authenticator = CachedJWTAuthentication()
+    try:
+        result = await sync_to_async(authenticator.authenticate)(request)
+    except APIException as e:
+        return unauthorized(authenticator, request, e.detail)
+    if result is None:
+        return unauthorized(authenticator, request, "Authentication credentials were not provided.")
+    request.user = result[0]
+    return None
+
+
+def unauthorized(authenticator, request, detail):
+    response = JsonResponse({"detail": detail}, status=status.HTTP_401_UNAUTHORIZED)
+    response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+    return response
+
+
+class AsyncChangePasswordAPIView(AsyncAPIView):
+    async def post(self, request):
+        denied = await authenticate(request)
+        if denied is not None:
+            return denied
+        return await self.run_flow(auth.change_password, request, request.data)
+
+
+class AsyncReadAPIView(View):
+    """
+    Authenticated GET/HEAD handled natively async and rendered like the DRF views
+    (ORJSONRenderer). Every other method is passed to `sync_view`, when set.
+    """
+    sync_view = None
+    delegate = None
+    renderer = ORJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        if cls.sync_view is not None:
+            initkwargs.setdefault('delegate', sync_to_async(cls.sync_view.as_view()))
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') and self.delegate is not None:
+            return await self.delegate(request, *args, **kwargs)
+        denied = await authenticate(request)
+        if denied is not None:
+            return denied
+        self.drf_request = Request(request, authenticators=())
+        self.drf_request.user = request.user
+        self.drf_request.accepted_renderer = self.renderer
+        self.drf_request.accepted_media_type = self.renderer.media_type
+        try:
+            response = await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = Response(detail, status=exc.status_code)
+        return self.finalize(response)
+
+    def finalize(self, response):
+        if not isinstance(response, Response):
+            return response
+        content = b'' if response.data is None else self.renderer.render(response.data)
+        rendered = HttpResponse(content, status=response.status_code, content_type=self.renderer.media_type)
+        for header, value in response.items():
+            if header != 'Content-Type':
+                rendered[header] = value
+        return rendered
+
+    def sync_view_instance(self, *args, **kwargs):
+        """The DRF view, set up for this request, whose configuration the async view reads."""
+        view = type(self).sync_view()
+        view.request, view.args, view.kwargs = self.drf_request, args, kwargs
+        view.format_kwarg = None
+        return view
+
+
+class AsyncListAPIView(AsyncReadAPIView):
+    """list() of a DRF generic view using ValuesListMixin, including its response cache if it has one."""
+
+    async def get(self, request, *args, **kwargs):
+        view = self.sync_view_instance(*args, **kwargs)
+        if isinstance(view, VersionedResponseMixin):
+            return await view.aversioned_response(self.drf_request, lambda: self.list(view))
+        return await self.list(view)
+
+    async def list(self, view):
+        serializer = view.get_values_serializer()
+        rows = serializer.rows(view.filter_queryset(view.get_queryset()))
+        paginator = view.paginator
+        if paginator is None:
+            return Response(serializer.serialize([row async for row in rows]))
+        page = await paginator.apaginate_queryset(rows, self.drf_request, view=view)
+        return Response(paginator.get_paginated_data(serializer.serialize(page)))
+
+
+class AsyncProfileAPIView(AsyncReadAPIView):
+    async def get(self, request):
+        return Response(UserProfileSerializer(request.user, context={'request': self.drf_request}).data)
+
+
+class AsyncGetUsersAPIView(AsyncListAPIView):
+    sync_view = GetUsersAPIView
+
+
+class AsyncProductsAPIView(AsyncListAPIView):
+    sync_view = ProductsAPIView
+
+
+class AsyncRecentOrdersAPIView(AsyncReadAPIView):
+    async def get(self, request):
+        serializer = recent_orders_values_serializer()
+        paginator = KeysetPagination()
+        orders = await paginator.apaginate_queryset(serializer.rows(Order.objects.all()), self.drf_request)
+        return Response(paginator.get_paginated_data(serializer.serialize(orders)))
+
+
+class AsyncTopSoldProductsAPIView(AsyncReadAPIView):
+    async def get(self, request):
+        return Response(await atop_products(top_products_limit(self.drf_request.query_params)))
+
+
+class AsyncOrderStreamAPIView(AsyncReadAPIView):
+    """/orders/stream/ without a thread per client: the stream waits on the event loop."""
+
+    async def get(self, request):
+        if order_events.is_full():
+            return stream_unavailable()
+        return event_stream_response(astream(last_event_id(request)))
@@ -0,0 +1,50 @@
+"""
+The password-hashing parts of register, login and change-password.
+
+Each flow is a plain synchronous function returning (body, status) so the DRF
+views can call it directly and the async views can run it on `hashing_pool`.
+"""
+from django.contrib.auth import authenticate
+from rest_framework import status
+
+from users.serializers import RegisterSerializer, LoginSerializer, ChangePasswordSerializer
+from users.tokens import IndexedRefreshToken
+
+
+def register(data):
+    serializer = RegisterSerializer(data=data)
+    if serializer.is_valid():
+        user = serializer.save()
+        refresh = IndexedRefreshToken.for_user(user)
+        return {
+            "user": serializer.data,
+            "access_token": str(refresh.access_token),
+            "refresh_token": str(refresh),
+        }, status.HTTP_201_CREATED
+    return serializer.errors, status.HTTP_400_BAD_REQUEST
+
+
+def login(data):
+    serializer = LoginSerializer(data=data)
+    if serializer.is_valid():
+        username = serializer.validated_data['username']
+        password = serializer.validated_data['password']
+        user = authenticate(username=username, password=password)
+        if user:
+            if not user.is_active:
+                return {"error": "User account is inactive."}, status.HTTP_401_UNAUTHORIZED
+            refresh = IndexedRefreshToken.for_user(user)
+            return {
+                "access_token": str(refresh.access_token),
+                "refresh_token": str(refresh),
+            }, status.HTTP_200_OK
+        return {"error": "Invalid username or password."}, status.HTTP_401_UNAUTHORIZED
+    return serializer.errors, status.HTTP_400_BAD_REQUEST
+
+
+def change_password(request, data):
+    serializer = ChangePasswordSerializer(data=data, context={'request': request})
+    if serializer.is_valid():
+        serializer.save()
+        return {"message": "Password changed successfully."}, status.HTTP_200_OK
+    return serializer.errors, status.HTTP_400_BAD_REQUEST
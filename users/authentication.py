@@ -0,0 +1,102 @@
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """
+    Process-local LRU of User rows by id.
+
+    Entries live for AUTH_USER_CACHE_LOCAL_TTL seconds only. Invalidation reaches
+    just the process that saw the write, so the TTL bounds how long another
+    worker can serve a changed or deleted user. Nothing leaves the process: the
+    rows carry password hashes.
+    """
+
+    def __init__(self):
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    def get(self, user_id, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._local.move_to_end(user_id)
+                self.counters['local_hits'] += 1
+                return copy.copy(entry[1])
+
+        self.counters['misses'] += 1
+        user = load()
+        self._remember(user_id, user, now)
+        return copy.copy(user)
+
+    def _remember(self, user_id, user, now):
+        with self._lock:
+            self._local[user_id] = (now + settings.AUTH_USER_CACHE_LOCAL_TTL, user)
+            self._local.move_to_end(user_id)
+            while len(self._local) > settings.AUTH_USER_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._local.pop(user_id, None)
+        self.counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        lookups = self.counters['local_hits'] + self.counters['misses']
+        hits = lookups - self.counters['misses']
+        return {
+            'local_hits': self.counters['local_hits'],
+            'misses': self.counters['misses'],
+            'invalidations': self.counters['invalidations'],
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+            'local_size': len(self._local),
+        }
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the token's user through `user_cache` instead of a query per request."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        def load():
+            try:
+                return self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        user = user_cache.get(user_id, load)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
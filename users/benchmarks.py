@@ -0,0 +1,114 @@
+"""Helpers shared by the bench_* management commands.
+
+Benchmarks run against a throw-away test database, never the configured one.
+"""
+import os
+import time
+from contextlib import contextmanager, ExitStack
+from copy import deepcopy
+from decimal import Decimal
+
+from django.db import connections
+from django.test.utils import override_settings, setup_databases, teardown_databases, setup_test_environment, \
+    teardown_test_environment
+
+from users.models import User, Product
+
+
+@contextmanager
+def benchmark_database(verbosity=0, throttles=False):
+    """The auth throttles are off unless `throttles` is set: benchmarks send far more logins than they allow."""
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity, interactive=False, aliases=set(connections))
+    try:
+        with override_settings(**({} if throttles else {'THROTTLE_RATES': {}})):
+            yield
+    finally:
+        teardown_databases(old_config, verbosity)
+        teardown_test_environment()
+
+
+@contextmanager
+def file_test_databases(directory, **overrides):
+    """
+    Create the test databases as files in `directory` instead of SQLite's shared
+    in-memory database, which locks whole tables and so fails concurrent writers.
+    `overrides` are applied to every alias's settings; all of it is undone on exit.
+    """
+    # Connections share these dicts with connections.settings, so they are changed in place.
+    original = deepcopy(connections.settings)
+    for alias, settings_dict in connections.settings.items():
+        settings_dict['TEST'] = {**settings_dict['TEST'], 'NAME': os.path.join(directory, f'{alias}.sqlite3')}
+        settings_dict.update(deepcopy(overrides))
+    try:
+        yield
+    finally:
+        connections.close_all()
+        for alias, settings_dict in connections.settings.items():
+            settings_dict.clear()
+            settings_dict.update(original[alias])
+
+
+@contextmanager
+def timer():
+    """Yield a dict whose "seconds" key is filled in when the block exits."""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - start
+
+
+@contextmanager
+def count_queries(*aliases):
+    """
+    Count statements sent to the given databases (all of them by default);
+    unlike CaptureQueriesContext it has no 9000-query cap.
+    """
+    result = {'queries': 0}
+
+    def wrapper(execute, sql, params, many, context):
+        result['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for alias in aliases or connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield result
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed_users(count, prefix='bench-user'):
+    User.objects.bulk_create(
+        [User(username=f'{prefix}-{index}', email=f'{prefix}-{index}@example.com') for index in range(count)],
+        batch_size=1000,
+    )
+    return list(User.objects.filter(username__startswith=prefix).order_by('id'))
+
+
+def seed_products(count, owner, batch_size=1000):
+    Product.objects.bulk_create(
+        [
+            Product(
+                name=f'Product {index}',
+                price=Decimal(10 + index % 490) + Decimal('0.99'),
+                user=owner,
+                description=f'Benchmark product number {index}',
+                image='products/image/bench.png',
+                discount=index % 50,
+                gift=index % 7 == 0,
+                delivery=index % 3 == 0,
+            )
+            for index in range(count)
+        ],
+        batch_size=batch_size,
+    )
+    return list(Product.objects.filter(user=owner).order_by('id'))
@@ -0,0 +1,191 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+PRODUCT_VERSION_KEY = 'catalog:product:{}:version'
+
+
+def _versions():
+    return caches[settings.CATALOG_VERSION_CACHE_ALIAS]
+
+
+def _responses():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _version(key):
+    version = _versions().get(key)
+    if version is None:
+        _versions().add(key, uuid.uuid4().hex, None)
+        version = _versions().get(key)
+    return version
+
+
+def catalog_version():
+    return _version(CATALOG_VERSION_KEY)
+
+
+def product_version(pk):
+    return _version(PRODUCT_VERSION_KEY.format(pk))
+
+
+def bump_catalog(*product_ids):
+    """Give the catalog (and the given products) a new version once the current transaction commits."""
+    def bump():
+        _versions().set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+        for pk in product_ids:
+            _versions().set(PRODUCT_VERSION_KEY.format(pk), uuid.uuid4().hex, None)
+    transaction.on_commit(bump)
+
+
+def bump_products(product_ids):
+    """
+    bump_catalog() for a bulk write. The products' version keys are dropped rather
+    than replaced, which costs nothing for the many that were never cached; the
+    next read of one starts a new version.
+    """
+    keys = [PRODUCT_VERSION_KEY.format(pk) for pk in product_ids]
+
+    def bump():
+        _versions().set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+        _versions().delete_many(keys)
+    transaction.on_commit(bump)
+
+
+class VersionedResponseMixin:
+    """
+    Serve GETs from a response cache keyed on a data version, with strong ETags.
+
+    The version lives in the shared cache and is replaced whenever the underlying
+    rows change, so a matching If-None-Match is answered with 304 from two cache
+    reads, and unchanged responses are not re-queried or re-serialized.
+    """
+
+    def get_cache_version(self):
+        raise NotImplementedError
+
+    def get_last_modified(self, data):
+        raise NotImplementedError
+
+    def versioned_response(self, request, build):
+        key, etag, entry, not_modified = self._lookup(request)
+        if not_modified is not None:
+            return not_modified
+        if entry is None:
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = self._store(key, response.data, self.get_last_modified(response.data))
+            if self._matches_any(request):
+                return self._not_modified(etag, entry)
+        return self._respond(etag, entry)
+
+    async def aversioned_response(self, request, build):
+        """versioned_response() for async views: `build` and aget_last_modified() are awaited."""
+        key, etag, entry, not_modified = self._lookup(request)
+        if not_modified is not None:
+            return not_modified
+        if entry is None:
+            response = await build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = self._store(key, response.data, await self.aget_last_modified(response.data))
+            if self._matches_any(request):
+                return self._not_modified(etag, entry)
+        return self._respond(etag, entry)
+
+    def _lookup(self, request):
+        """Return the cache key, the ETag, the cached entry and, if the client's copy is current, a 304."""
+        renderer = getattr(request, 'accepted_renderer', None)
+        raw_key = '|'.join((
+            type(self).__name__,
+            self.get_cache_version(),
+            request.get_host(),
+            request.get_full_path(),
+            renderer.format if renderer else '',
+        ))
+        key = 'response:' + hashlib.sha1(raw_key.encode()).hexdigest()
+        etag = f'"{key[9:]}"'
+        entry = _responses().get(key)
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            # "*" only matches a representation that exists; without a cached one, the view decides (404 or 200).
+            if etag in etags or ('*' in etags and entry is not None):
+                return key, etag, entry, self._not_modified(etag, entry)
+        elif entry and entry['last_modified']:
+            since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+            if since is not None and int(entry['last_modified']) <= since:
+                return key, etag, entry, self._not_modified(etag, entry)
+        return key, etag, entry, None
+
+    @staticmethod
+    def _matches_any(request):
+        return '*' in parse_etags(request.headers.get('If-None-Match', ''))
+
+    @staticmethod
+    def _store(key, data, last_modified):
+        entry = {
+            'data': data,
+            'last_modified': last_modified.timestamp() if last_modified else None,
+        }
+        _responses().set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+        return entry
+
+    def _respond(self, etag, entry):
+        response = Response(entry['data'])
+        self._set_validators(response, etag, entry)
+        return response
+
+    @staticmethod
+    def _set_validators(response, etag, entry):
+        response['ETag'] = etag
+        if entry and entry['last_modified']:
+            response['Last-Modified'] = http_date(entry['last_modified'])
+
+    def _not_modified(self, etag, entry):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        self._set_validators(response, etag, entry)
+        return response
+
+
+class CatalogListCacheMixin(VersionedResponseMixin):
+    def get_cache_version(self):
+        return catalog_version()
+
+    # Lists are validated by ETag only: no row timestamp moves when a product is deleted, and a
+    # second-granular Last-Modified cannot tell two writes within a second apart, so either would
+    # answer If-Modified-Since with a stale 304.
+    def get_last_modified(self, data):
+        return None
+
+    async def aget_last_modified(self, data):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.versioned_response(request, lambda: super(CatalogListCacheMixin, self).list(request, *args, **kwargs))
+
+
+class CatalogDetailCacheMixin(VersionedResponseMixin):
+    def get_cache_version(self):
+        return product_version(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+
+    def get_last_modified(self, data):
+        return self._instance.updated_at
+
+    def get_object(self):
+        self._instance = super().get_object()
+        return self._instance
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.versioned_response(
+            request, lambda: super(CatalogDetailCacheMixin, self).retrieve(request, *args, **kwargs)
+        )
@@ -0,0 +1,68 @@
+from django.db import connections, router
+from django.db.models import Q
+from django.utils import timezone
+
+# Rows per INSERT statement, well under SQLite's limit on bound parameters.
+UPSERT_BATCH_SIZE = 500
+
+
+def increment_many(model, key_fields, deltas):
+    """
+    Add {key: {name: amount}} to the counter rows keyed on `key_fields` (a unique
+    constraint), with one INSERT ... ON CONFLICT DO UPDATE per UPSERT_BATCH_SIZE keys.
+
+    Negative amounts never create a row: a missing row there means its owner is
+    being deleted in the same transaction. Returns whether any row was written.
+    """
+    deltas = {key: amounts for key, amounts in deltas.items() if any(amounts.values())}
+    decrements = [key for key, amounts in deltas.items() if any(value < 0 for value in amounts.values())]
+    if decrements:
+        existing = set(
+            model.objects.filter(_any_key(key_fields, decrements)).values_list(*key_fields)
+        )
+        for key in decrements:
+            if key not in existing:
+                del deltas[key]
+    if not deltas:
+        return False
+
+    names = sorted({name for amounts in deltas.values() for name in amounts})
+    rows = [(*key, *(amounts.get(name, 0) for name in names)) for key, amounts in deltas.items()]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        _upsert(model, key_fields, names, rows[start:start + UPSERT_BATCH_SIZE])
+    return True
+
+
+def _any_key(key_fields, keys):
+    condition = Q()
+    for key in keys:
+        condition |= Q(**dict(zip(key_fields, key)))
+    return condition
+
+
+def _upsert(model, key_fields, names, rows):
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in (*key_fields, *names)]
+    # auto_now columns (updated_at) are written as save() would write them.
+    touched = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+    now = timezone.now()
+
+    columns = [quote(field.column) for field in (*fields, *touched)]
+    placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    params = []
+    for row in rows:
+        params += [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+        params += [field.get_db_prep_save(now, connection) for field in touched]
+    assignments = [
+        f'{quote(field.column)} = {quote(model._meta.db_table)}.{quote(field.column)} + excluded.{quote(field.column)}'
+        for field in fields[len(key_fields):]
+    ] + [f'{quote(field.column)} = excluded.{quote(field.column)}' for field in touched]
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(columns)}) '
+        f'VALUES {", ".join([placeholder] * len(rows))} '
+        f'ON CONFLICT ({", ".join(quote(field.column) for field in fields[:len(key_fields)])}) '
+        f'DO UPDATE SET {", ".join(assignments)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
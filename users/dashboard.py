@@ -0,0 +1,109 @@
+"""
+/dashboard/: the recent orders, top products, chart and profile sections of the
+dashboard page in one response.
+
+Sections are independent, so they are computed concurrently on a small thread
+pool. SQLite in WAL mode serves the reads in parallel and drops the GIL while it
+does. Each task runs in a copy of the request's context, so it reads from the
+read alias and its queries count towards the request's metrics. Every section is
+cached for its own DASHBOARD_SECTION_TTL, per user where the data is.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from users.models import Order
+from users.sales import top_products
+from users.serializers import UserProfileSerializer, recent_orders_values_serializer
+from users.stats import daily_stats
+
+SECTION_KEY = 'dashboard:{name}:{scope}'
+
+
+def recent_orders_section(request):
+    serializer = recent_orders_values_serializer()
+    rows = serializer.rows(Order.objects.order_by('-created_at', '-id'))[:settings.KEYSET_PAGE_SIZE]
+    return serializer.serialize(rows)
+
+
+def top_products_section(request):
+    return top_products(settings.DASHBOARD_TOP_PRODUCTS)
+
+
+def chart_section(request):
+    return daily_stats(request.user, settings.CHART_DEFAULT_DAYS)
+
+
+def profile_section(request):
+    return dict(UserProfileSerializer(request.user, context={'request': request}).data)
+
+
+# name: (compute(request), cached per user)
+SECTIONS = {
+    'recent_orders': (recent_orders_section, False),
+    'top_products': (top_products_section, False),
+    'chart': (chart_section, True),
+    'profile': (profile_section, True),
+}
+
+
+class DashboardPool:
+    """A lazily started thread pool for dashboard sections."""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.DASHBOARD_WORKERS, thread_name_prefix='dashboard'
+                    )
+        return self._executor.submit(contextvars.copy_context().run, self._call, func, *args)
+
+    @staticmethod
+    def _call(func, *args):
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+
+dashboard_pool = DashboardPool()
+
+
+def section_key(name, per_user, request):
+    # Profile URLs are absolute, so the host is part of a per-user entry.
+    scope = f'{request.user.pk}:{request.get_host()}' if per_user else 'all'
+    return SECTION_KEY.format(name=name, scope=scope)
+
+
+def run_section(name, request):
+    compute, per_user = SECTIONS[name]
+    ttl = settings.DASHBOARD_SECTION_TTL.get(name, 0)
+    start = time.perf_counter()
+    key = section_key(name, per_user, request)
+    data = cache.get(key) if ttl else None
+    cached = data is not None
+    if not cached:
+        data = compute(request)
+        if ttl:
+            cache.set(key, data, ttl)
+    return data, cached, time.perf_counter() - start
+
+
+def build_dashboard(request):
+    """Return ({section: data}, {section: (seconds, cached)})."""
+    futures = {name: dashboard_pool.submit(run_section, name, request) for name in SECTIONS}
+    data, timings = {}, {}
+    for name, future in futures.items():
+        data[name], cached, seconds = future.result()
+        timings[name] = (seconds, cached)
+    return data, timings
@@ -0,0 +1,290 @@
+"""
+Order changes as server-sent events (/orders/stream/).
+
+`order_events` is an in-process publish/subscribe hub. The order signals publish
+creations (single and bulk), status changes and deletions through the same
+record_* hooks as the rollups, once the transaction commits. Every event is
+encoded into an SSE frame once and then fanned out to all subscribers.
+
+The last ORDER_STREAM_BUFFER frames are kept in a ring buffer, so a client
+reconnecting with Last-Event-ID receives what it missed. Event ids carry the
+hub's random epoch: ids from another process or before a restart cannot be
+resumed, and neither can ids that have already left the buffer. Such clients
+get a "reset" event and should reload /recent-orders/.
+
+Publishing never waits for a subscriber. Each client has a queue of
+ORDER_STREAM_CLIENT_BUFFER frames. A client that falls that far behind is
+disconnected, and resumes from the buffer when it reconnects.
+Each process has its own hub, so a stream sees the orders written by the
+process serving it; the overdue job's batches come as one "orders.late"
+event per status.
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+import orjson
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+
+from users.models import Order
+
+HEARTBEAT = b': ping\n\n'
+
+
+class StreamFull(Exception):
+    pass
+
+
+def frame(event_id, event, data):
+    return f'id: {event_id}\nevent: {event}\ndata: '.encode() + orjson.dumps(data) + b'\n\n'
+
+
+def reset_frame(event_id):
+    return frame(event_id, 'reset', {'reload': '/recent-orders/'})
+
+
+class Subscription:
+    """The frames queued for one client. `loop` is set for async consumers."""
+
+    def __init__(self, hub, limit, loop=None):
+        self.hub = hub
+        self.limit = limit
+        self.frames = deque()
+        self.overflowed = False
+        self.loop = loop
+        self.ready = asyncio.Event() if loop else threading.Event()
+
+    def push(self, data):
+        """Queue a frame; return True if the consumer has to be woken. Called with the hub's lock held."""
+        if self.overflowed:
+            return False
+        if len(self.frames) >= self.limit:
+            self.frames.clear()
+            self.overflowed = True
+            return True
+        self.frames.append(data)
+        # A consumer with frames already queued has been woken and not taken them yet.
+        return len(self.frames) == 1
+
+    def take(self):
+        """
+        Return the queued frames. After an overflow that is None, which ends the
+        stream: the client reconnects with the last id it got and resumes from the buffer.
+        """
+        with self.hub.lock:
+            if self.loop is None:
+                self.ready.clear()
+            if self.overflowed:
+                return [None]
+            frames = list(self.frames)
+            self.frames.clear()
+            return frames
+
+    def wait(self, timeout):
+        return self.ready.wait(timeout)
+
+    async def await_frames(self, timeout):
+        # push() sets the event through the loop, so clearing it here cannot lose a wake-up.
+        self.ready.clear()
+        if self.frames or self.overflowed:
+            return True
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+def wake(subscriptions):
+    """Set the subscriptions' events: directly for threads, with one callback per event loop for the rest."""
+    loops = {}
+    for subscription in subscriptions:
+        if subscription.loop is None:
+            subscription.ready.set()
+        else:
+            loops.setdefault(subscription.loop, []).append(subscription.ready)
+    for loop, events in loops.items():
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(set_all, events)
+
+
+def set_all(events):
+    for event in events:
+        event.set()
+
+
+class EventHub:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex[:8]
+        self.sequence = 0
+        self.buffer = deque(maxlen=settings.ORDER_STREAM_BUFFER)
+        self.subscribers = set()
+
+    @property
+    def last_id(self):
+        return f'{self.epoch}-{self.sequence}'
+
+    def publish(self, events):
+        """Number, encode and fan out a list of (event, data) pairs."""
+        woken = set()
+        with self.lock:
+            for event, data in events:
+                self.sequence += 1
+                encoded = frame(self.last_id, event, data)
+                self.buffer.append((self.sequence, encoded))
+                for subscription in self.subscribers:
+                    if subscription.push(encoded):
+                        woken.add(subscription)
+            wake(woken)
+
+    def subscribe(self, last_event_id=None, loop=None):
+        """
+        Register a client and return it with the frames to send first: those after
+        `last_event_id`, or a reset frame if they are no longer in the buffer.
+        """
+        with self.lock:
+            if self.is_full():
+                raise StreamFull
+            subscription = Subscription(self, settings.ORDER_STREAM_CLIENT_BUFFER, loop)
+            self.subscribers.add(subscription)
+            return subscription, self._backlog(last_event_id)
+
+    def _backlog(self, last_event_id):
+        if not last_event_id:
+            return []
+        epoch, _, sequence = last_event_id.partition('-')
+        if epoch != self.epoch or not sequence.isdigit() or int(sequence) > self.sequence:
+            return [reset_frame(self.last_id)]
+        sequence = int(sequence)
+        oldest = self.buffer[0][0] if self.buffer else self.sequence + 1
+        if sequence < oldest - 1:
+            return [reset_frame(self.last_id)]
+        return [encoded for number, encoded in self.buffer if number > sequence]
+
+    def is_full(self):
+        return len(self.subscribers) >= settings.ORDER_STREAM_MAX_SUBSCRIBERS
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def _after_fork(self):
+        # Subscribers belong to the parent's connections; a worker starts its own hub.
+        self._reset()
+
+
+order_events = EventHub()
+
+os.register_at_fork(after_in_child=order_events._after_fork)
+
+
+def order_delta(order):
+    return {
+        'id': order.pk,
+        'customer_id': order.customer_id,
+        'product_id': order.product_id,
+        'user_id': order.user_id,
+        'amount': order.amount,
+        'price': order.price,
+        'status': order.status,
+        'created_at': order.created_at.isoformat() if order.created_at else None,
+    }
+
+
+def publish_on_commit(events):
+    if events:
+        transaction.on_commit(lambda: order_events.publish(events))
+
+
+def record_orders_created(orders):
+    publish_on_commit([('order.created', order_delta(order)) for order in orders])
+
+
+def record_order_updated(order, previous):
+    if previous.get('status', order.status) != order.status:
+        publish_on_commit([('order.status', {'id': order.pk, 'status': order.status, 'previous': previous['status']})])
+
+
+def record_orders_deleted(orders):
+    publish_on_commit([('order.deleted', {'id': order.pk}) for order in orders])
+
+
+def record_orders_late(status, count):
+    """mark_overdue_orders() moves orders with a queryset update, so only the counts are known."""
+    if count:
+        publish_on_commit([('orders.late', {'previous': status, 'status': Order.OrderTypes.LATED, 'count': count})])
+
+
+def last_event_id(request):
+    # EventSource sends the header on reconnects; the query parameter lets a page resume on load.
+    return request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+
+
+def event_stream_response(body):
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def stream(last_event_id, duration):
+    """
+    The SSE body for a WSGI response; it holds its thread, blocked between events,
+    for `duration` seconds and then ends, and the client reconnects with Last-Event-ID.
+    The client subscribes on the first read, so a response that is never sent leaves nothing behind.
+    """
+    try:
+        subscription, backlog = order_events.subscribe(last_event_id)
+    except StreamFull:
+        return
+    deadline = time.monotonic() + duration
+    try:
+        yield f'retry: {settings.ORDER_STREAM_RETRY_MS}\n\n'.encode()
+        yield from backlog
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not subscription.wait(min(settings.ORDER_STREAM_HEARTBEAT, remaining)):
+                yield HEARTBEAT
+                continue
+            for data in subscription.take():
+                if data is None:
+                    return
+                yield data
+    finally:
+        subscription.close()
+
+
+async def astream(last_event_id):
+    """The SSE body for an ASGI response; Django cancels it when the client disconnects."""
+    try:
+        subscription, backlog = order_events.subscribe(last_event_id, loop=asyncio.get_running_loop())
+    except StreamFull:
+        return
+    try:
+        yield f'retry: {settings.ORDER_STREAM_RETRY_MS}\n\n'.encode()
+        for data in backlog:
+            yield data
+        while True:
+            if not await subscription.await_frames(settings.ORDER_STREAM_HEARTBEAT):
+                yield HEARTBEAT
+                continue
+            for data in subscription.take():
+                if data is None:
+                    return
+                yield data
+    finally:
+        subscription.close()
@@ -0,0 +1,124 @@
+import csv
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from users.models import Order, Product
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+ORDER_EXPORT_FIELDS = (
+    ('id', 'id'),
+    ('customer_id', 'customer_id'),
+    ('product_id', 'product_id'),
+    ('product_name', 'product__name'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('amount', 'amount'),
+    ('price', 'price'),
+    ('status', 'status'),
+    ('created_at', 'created_at'),
+)
+
+# Also the columns /products/import/ reads, so an export can be loaded back as is.
+PRODUCT_EXPORT_FIELDS = (
+    ('id', 'id'),
+    ('name', 'name'),
+    ('price', 'price'),
+    ('description', 'description'),
+    ('discount', 'discount'),
+    ('gift', 'gift'),
+    ('delivery', 'delivery'),
+    ('image', 'image'),
+    ('user_id', 'user_id'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+)
+
+
+class ExportFilterError(ValueError):
+    pass
+
+
+def parse_moment(value, end_of_day=False):
+    """Accept either an ISO datetime or a bare date; naive values are taken in the current timezone."""
+    try:
+        # Both return None for text that is not a date, and raise ValueError for impossible ones (2024-02-30).
+        moment = parse_datetime(value)
+        day = parse_date(value) if moment is None else None
+    except ValueError:
+        moment = day = None
+    if moment is None:
+        if day is None:
+            raise ExportFilterError(f'Invalid date: {value!r}.')
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def order_export_queryset(created_after=None, created_before=None, status=None):
+    queryset = Order.objects.all()
+    if created_after:
+        queryset = queryset.filter(created_at__gte=parse_moment(created_after))
+    if created_before:
+        queryset = queryset.filter(created_at__lte=parse_moment(created_before, end_of_day=True))
+    if status:
+        statuses = [item.strip() for item in status.split(',') if item.strip()]
+        unknown = set(statuses) - set(Order.OrderTypes.values)
+        if unknown:
+            raise ExportFilterError(f'Unknown status: {", ".join(sorted(unknown))}.')
+        queryset = queryset.filter(status__in=statuses)
+    return queryset.order_by('id')
+
+
+def product_export_queryset():
+    return Product.objects.order_by('id')
+
+
+def iter_rows(queryset, fields, chunk_size=None):
+    """Yield tuples straight from the cursor, chunk_size rows at a time, without building model instances."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    return queryset.values_list(*(lookup for _, lookup in fields)).iterator(chunk_size=chunk_size)
+
+
+def plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in fields])
+    for row in rows:
+        yield writer.writerow([plain(value) for value in row])
+
+
+def iter_ndjson(rows, fields):
+    names = [name for name, _ in fields]
+    for row in rows:
+        yield json.dumps(dict(zip(names, map(plain, row))), separators=(',', ':'), ensure_ascii=False) + '\n'
+
+
+def iter_export(output, queryset, fields, chunk_size=None):
+    rows = iter_rows(queryset, fields, chunk_size)
+    if output == 'csv':
+        return iter_csv(rows, fields)
+    return iter_ndjson(rows, fields)
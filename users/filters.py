@@ -0,0 +1,156 @@
+import re
+import sys
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+# ?ordering= values and the keyset each one pages over; every key ends in the id
+# so it is unique, and each is served by one of the Product indexes.
+PRODUCT_ORDERINGS = {
+    'id': ('id',),
+    '-id': ('-id',),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'discount': ('discount', 'id'),
+    '-discount': ('-discount', '-id'),
+    'created_at': ('created_at', 'id'),
+    '-created_at': ('-created_at', '-id'),
+}
+# Search results: best bm25 rank first (FTS5 ranks are negative, lower is better).
+RANKED_ORDERING = ('search_rank', 'id')
+MAX_SEARCH_TERMS = 8
+
+BOOLEANS = {'true': True, '1': True, 'false': False, '0': False}
+
+
+def _decimal(value):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError
+    if not number.is_finite():
+        raise ValueError
+    return number
+
+
+def _boolean(value):
+    try:
+        return BOOLEANS[value.lower()]
+    except KeyError:
+        raise ValueError
+
+
+PRODUCT_FILTERS = (
+    ('min_price', 'price__gte', _decimal, 'A valid number is required.'),
+    ('max_price', 'price__lte', _decimal, 'A valid number is required.'),
+    ('min_discount', 'discount__gte', int, 'A valid integer is required.'),
+    ('max_discount', 'discount__lte', int, 'A valid integer is required.'),
+    ('gift', 'gift', _boolean, 'Must be true or false.'),
+    ('delivery', 'delivery', _boolean, 'Must be true or false.'),
+)
+
+
+def search_expression(query):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one as a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation in the input are never
+    interpreted. Returns None if the text has no searchable words.
+    """
+    terms = re.findall(r'\w+', query.lower())[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+
+def product_ordering(query_params):
+    ordering = query_params.get('ordering')
+    if ordering is None:
+        return RANKED_ORDERING if search_expression(query_params.get('q', '')) else PRODUCT_ORDERINGS['id']
+    if ordering not in PRODUCT_ORDERINGS:
+        raise ValidationError({"ordering": f"Choose one of: {', '.join(PRODUCT_ORDERINGS)}."})
+    return PRODUCT_ORDERINGS[ordering]
+
+
+class ProductFilterBackend(BaseFilterBackend):
+    """
+    ?min_price=&max_price=&min_discount=&max_discount=&gift=&delivery= filters and
+    ?q= full-text search over name and description through users_product_fts.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        filters, errors = {}, {}
+        for param, lookup, parse, message in PRODUCT_FILTERS:
+            if params.get(param, '') == '':
+                continue
+            try:
+                filters[lookup] = parse(params[param])
+            except ValueError:
+                errors[param] = message
+        if errors:
+            raise ValidationError(errors)
+        queryset = queryset.filter(**filters)
+
+        query = params.get('q', '').strip()
+        if query:
+            expression = search_expression(query)
+            if expression is None:
+                return queryset.none()
+            queryset = queryset.filter(search_index__document__match=expression).annotate(
+                search_rank=F('search_index__rank')
+            )
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {'name': param, 'required': False, 'in': 'query',
+             'schema': {'type': 'boolean' if parse is _boolean else 'number'}}
+            for param, lookup, parse, message in PRODUCT_FILTERS
+        ]
+        parameters.append({
+            'name': 'q', 'required': False, 'in': 'query', 'schema': {'type': 'string'},
+            'description': 'Full-text search over name and description; results are ranked unless ?ordering= is given.',
+        })
+        parameters.append({
+            'name': 'ordering', 'required': False, 'in': 'query',
+            'schema': {'type': 'string', 'enum': list(PRODUCT_ORDERINGS)},
+        })
+        return parameters
+
+
+def prefix_range(prefix):
+    """
+    Bounds (gte, lt) of the strings starting with `prefix`, so a prefix match is a
+    range scan on an ordinary index. (SQLite's LIKE is case-insensitive and so
+    cannot use one.) The upper bound is None when there is none.
+    """
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return prefix, None
+    return prefix, stem[:-1] + chr(ord(stem[-1]) + 1)
+
+
+def user_ordering(query_params):
+    # A username search pages through the username index; usernames are unique.
+    return ('username',) if query_params.get('q', '').strip() else ('id',)
+
+
+class UsernamePrefixFilterBackend(BaseFilterBackend):
+    """?q= matches usernames that start with the text (case-sensitive, like usernames themselves)."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return queryset
+        lower, upper = prefix_range(query)
+        queryset = queryset.filter(username__gte=lower)
+        return queryset.filter(username__lt=upper) if upper is not None else queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': 'q', 'required': False, 'in': 'query', 'schema': {'type': 'string'},
+            'description': 'Username prefix; results are then ordered by username.',
+        }]
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+class HashingPoolSaturated(Exception):
+    pass
+
+
+class HashingPool:
+    """
+    A bounded thread pool for PBKDF2-heavy work, awaited from async views.
+
+    At most HASHING_POOL_WORKERS jobs run at once and HASHING_POOL_QUEUE more may
+    wait; anything beyond that is refused immediately so the caller can answer 503
+    instead of letting the backlog grow.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _setup(self):
+        with self._lock:
+            if self._executor is None:
+                workers = settings.HASHING_POOL_WORKERS
+                self._slots = threading.BoundedSemaphore(workers + settings.HASHING_POOL_QUEUE)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hashing')
+
+    async def run(self, func, *args, **kwargs):
+        if self._executor is None:
+            self._setup()
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(self._call, func, *args, **kwargs))
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _call(func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+hashing_pool = HashingPool()
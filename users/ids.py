@@ -0,0 +1,78 @@
+"""
+Compact, time-ordered ids for Order.customer_id.
+
+An id is 15 lowercase Crockford base32 characters (75 bits):
+
+    10 chars  milliseconds since the Unix epoch (50 bits)
+     3 chars  per-process sequence within that millisecond (15 bits)
+     2 chars  random (10 bits)
+
+Ids sort by creation time, so inserts land at the right edge of the unique
+index instead of all over it. Within a process they strictly increase. The
+sequence starts at a random point every millisecond, and together with the random
+tail this makes a clash between two processes in the same millisecond about a
+one in 16 million event. Callers still retry on a unique violation
+(ID_ATTEMPTS).
+"""
+import os
+import secrets
+import threading
+import time
+
+ALPHABET = '0123456789abcdefghjkmnpqrstvwxyz'
+LENGTH = 15
+SEQUENCE_BITS = 15
+RANDOM_BITS = 10
+ID_ATTEMPTS = 3
+
+
+def encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+class OrderIdGenerator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.last_ms = 0
+        self.sequence = 0
+
+    def _next(self):
+        now = time.time_ns() // 1_000_000
+        if now > self.last_ms:
+            self.last_ms = now
+            # Leave the upper half of the sequence space for ids in this millisecond.
+            self.sequence = secrets.randbits(SEQUENCE_BITS - 1)
+        else:
+            # Same millisecond, or the clock stepped back: keep counting from the last id.
+            self.sequence += 1
+            if self.sequence >> SEQUENCE_BITS:
+                self.last_ms += 1
+                self.sequence = secrets.randbits(SEQUENCE_BITS - 1)
+        value = (self.last_ms << SEQUENCE_BITS | self.sequence) << RANDOM_BITS | secrets.randbits(RANDOM_BITS)
+        return encode(value, LENGTH)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def new(self):
+        with self._lock:
+            return self._next()
+
+    def allocate(self, count):
+        """`count` consecutive ids for a bulk insert, taken under one lock."""
+        with self._lock:
+            return [self._next() for _ in range(count)]
+
+
+order_ids = OrderIdGenerator()
+
+# A forked worker must not continue the parent's sequence within the same millisecond.
+os.register_at_fork(after_in_child=order_ids._after_fork)
@@ -0,0 +1,155 @@
+"""
+Resized variants of uploaded images, built off the request path.
+
+After a model with an image is saved, `schedule_variants` queues the image on
+`image_pipeline` once the transaction commits. A worker thread decodes it with
+Pillow, writes one file per width and format next to the original and records
+their names on the row, e.g.
+
+    {"source": "products/image/a.png",
+     "webp": {"160": "products/image/variants/a.3f2c9e1b7d0a.160w.webp", ...},
+     "jpeg": {...}}
+
+Variant names embed a digest of the source bytes, so they can be served with
+far-future cache headers and re-uploading the same file reuses them.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'method': 4},
+    'jpeg': {'format': 'JPEG', 'optimize': True, 'progressive': True},
+}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def variant_name(source_name, digest, width, output):
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}.{digest[:12]}.{width}w.{EXTENSIONS[output]}')
+
+
+def target_widths(width):
+    # Never upscale; an image narrower than every target gets one variant at its own width.
+    return [w for w in settings.IMAGE_VARIANT_WIDTHS if w < width] or [width]
+
+
+def encode(image, output):
+    if output == 'jpeg' and image.mode != 'RGB':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+    elif output == 'webp' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, quality=settings.IMAGE_VARIANT_QUALITY, **SAVE_OPTIONS[output])
+    return buffer.getvalue()
+
+
+def build_variants(field_file):
+    """Write the variants of `field_file` to its storage and return the names, keyed by format and width."""
+    storage, source_name = field_file.storage, field_file.name
+    with storage.open(source_name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    image = Image.open(io.BytesIO(data))
+    # Let the JPEG decoder downscale by a power of two while it decodes, as long as
+    # both sides stay at least as large as the widest variant.
+    widest = max(settings.IMAGE_VARIANT_WIDTHS)
+    image.draft('RGB', (widest, widest))
+    image = ImageOps.exif_transpose(image)
+    widths = target_widths(image.width)
+
+    variants = {'source': source_name}
+    for output in settings.IMAGE_VARIANT_FORMATS:
+        variants[output] = {}
+    # Widest first, each step resized from the previous one; reducing_gap keeps the quality close to a direct resize.
+    current = image
+    for width in sorted(widths, reverse=True):
+        height = max(1, round(image.height * width / image.width))
+        if current.width != width:
+            current = current.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for output in settings.IMAGE_VARIANT_FORMATS:
+            name = variant_name(source_name, digest, width, output)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(encode(current, output)))
+            variants[output][str(width)] = name
+    return variants
+
+
+def process(model, pk, field_name, variants_field):
+    """Build the variants for one row and store them, unless the image was replaced meanwhile."""
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return None
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return None
+    variants = build_variants(field_file)
+    updated = model._default_manager.filter(pk=pk, **{field_name: field_file.name}).update(**{variants_field: variants})
+    if updated:
+        from users.signals import image_variants_ready
+        image_variants_ready.send(sender=model, pk=pk, variants=variants)
+    return variants
+
+
+class ImagePipeline:
+    """A small lazily started thread pool; Pillow releases the GIL while decoding, resizing and encoding."""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _setup(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_PIPELINE_WORKERS, thread_name_prefix='images'
+                )
+
+    def submit(self, model, pk, field_name, variants_field):
+        if self._executor is None:
+            self._setup()
+        return self._executor.submit(self._call, model, pk, field_name, variants_field)
+
+    @staticmethod
+    def _call(*args):
+        try:
+            return process(*args)
+        except Exception:
+            logger.exception('Building image variants failed for %s pk=%s', args[0].__name__, args[1])
+            raise
+        finally:
+            close_old_connections()
+
+
+image_pipeline = ImagePipeline()
+
+
+def schedule_variants(instance, field_name, variants_field):
+    """Queue variant generation for `instance` after commit if its image has none yet."""
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    model, pk = type(instance), instance.pk
+    if not field_file:
+        if variants:
+            model._default_manager.filter(pk=pk).update(**{variants_field: {}})
+        return
+    if variants.get('source') != field_file.name:
+        transaction.on_commit(lambda: image_pipeline.submit(model, pk, field_name, variants_field))
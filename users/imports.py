@@ -0,0 +1,280 @@
+"""
+Product catalog import from CSV or NDJSON (/products/import/, import_products).
+
+The input is parsed row by row as it is read and handled in batches of
+PRODUCT_IMPORT_BATCH_SIZE rows. A batch is checked with two lookups and written
+with one bulk_create(update_conflicts=True) upsert in its own transaction, so
+memory use and the time the write lock is held do not grow with the input.
+Rows with an id update that product, rows without one are inserted. Invalid
+rows are reported and skipped, as /last-orders/ does for orders.
+
+The columns are those of PRODUCT_EXPORT_FIELDS (created_at and updated_at are
+ignored), so an export can be imported back unchanged. Images are storage names
+of files that already exist; build_image_variants builds their variants.
+"""
+import csv
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from users.exports import EXPORT_FORMATS
+from users.ingest import _as_int, _collect_ids, _in_range
+from users.models import Product, User
+from users.signals import products_bulk_upserted
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = EXPORT_FORMATS
+
+# Written on insert and overwritten on conflict; bulk_create fills updated_at (auto_now) itself.
+UPSERT_FIELDS = ('name', 'price', 'description', 'discount', 'gift', 'delivery', 'image', 'user', 'updated_at')
+
+BOOLEANS = {'true': True, '1': True, 'false': False, '0': False}
+
+
+class InvalidRow:
+    """Stands in for a line the reader could not parse."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_csv(lines):
+    for row in csv.DictReader(lines):
+        # DictReader files surplus values under the None key.
+        yield InvalidRow('More values than columns.') if None in row else row
+
+
+def read_ndjson(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield InvalidRow('Invalid JSON.')
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+def _blank(value):
+    return value is None or value == ''
+
+
+def _text(max_length=None):
+    def parse(value):
+        if _blank(value):
+            raise ValueError('This field is required.')
+        if not isinstance(value, str):
+            raise ValueError('Not a valid string.')
+        if max_length and len(value) > max_length:
+            raise ValueError(f'Ensure this field has no more than {max_length} characters.')
+        return value
+    return parse
+
+
+def _price(value):
+    if _blank(value):
+        raise ValueError('This field is required.')
+    if isinstance(value, bool):
+        raise ValueError('A valid number is required.')
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError('A valid number is required.')
+    if not price.is_finite():
+        raise ValueError('A valid number is required.')
+    # The digit counts DRF's DecimalField checks against the model's max_digits and decimal_places.
+    field = Product._meta.get_field('price')
+    max_whole = field.max_digits - field.decimal_places
+    _, digits, exponent = price.as_tuple()
+    decimals = max(0, -exponent)
+    whole = max(0, len(digits) + exponent)
+    if whole + decimals > field.max_digits:
+        raise ValueError(f'Ensure that there are no more than {field.max_digits} digits in total.')
+    if decimals > field.decimal_places:
+        raise ValueError(f'Ensure that there are no more than {field.decimal_places} decimal places.')
+    if whole > max_whole:
+        raise ValueError(f'Ensure that there are no more than {max_whole} digits before the decimal point.')
+    return price
+
+
+def _integer(field):
+    def parse(value):
+        if _blank(value):
+            raise ValueError('This field is required.')
+        try:
+            number = _as_int(value)
+        except ValueError:
+            raise ValueError('A valid integer is required.')
+        return _in_range(field, number)
+    return parse
+
+
+def _boolean(value):
+    if _blank(value):
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (str, int)) and str(value).lower() in BOOLEANS:
+        return BOOLEANS[str(value).lower()]
+    raise ValueError('Must be a valid boolean.')
+
+
+def _image(value):
+    if _blank(value):
+        return ''
+    return _text(Product._meta.get_field('image').max_length)(value)
+
+
+FIELD_PARSERS = (
+    ('name', _text(Product._meta.get_field('name').max_length)),
+    ('price', _price),
+    ('description', _text()),
+    ('discount', _integer(Product._meta.get_field('discount'))),
+    ('gift', _boolean),
+    ('delivery', _boolean),
+    ('image', _image),
+)
+
+
+def validate_product_rows(rows, default_user_id):
+    """
+    Check a batch of (index, row) pairs with two lookups in total.
+
+    Returns the unsaved Product instances for the valid rows, the ids among them
+    that already exist, and {"index": ..., "errors": {...}} entries for the rest.
+    """
+    dicts = [row for _, row in rows if isinstance(row, dict)]
+    existing = set(Product.objects.filter(id__in=_collect_ids(dicts, 'id')).values_list('id', flat=True))
+    users = set(User.objects.filter(id__in=_collect_ids(dicts, 'user_id')).values_list('id', flat=True))
+    users.add(default_user_id)
+
+    products, errors, seen = [], [], set()
+    for index, row in rows:
+        if isinstance(row, InvalidRow):
+            errors.append({"index": index, "errors": {"non_field_errors": [row.message]}})
+            continue
+        if not isinstance(row, dict):
+            errors.append({"index": index, "errors": {"non_field_errors": ["Invalid data. Expected a dictionary."]}})
+            continue
+        row_errors, values = {}, {}
+
+        for name, parse in FIELD_PARSERS:
+            try:
+                values[name] = parse(row.get(name))
+            except ValueError as e:
+                row_errors[name] = [str(e)]
+
+        # _collect_ids skipped ids out of the key range, so they are reported as missing too.
+        product_id = None
+        if not _blank(row.get('id')):
+            try:
+                product_id = _as_int(row['id'])
+                if product_id not in existing:
+                    row_errors['id'] = [f'Invalid pk "{row["id"]}" - object does not exist.']
+                elif product_id in seen:
+                    # One upsert cannot write a row twice; the counts would also take it for an insert.
+                    row_errors['id'] = ['Duplicate id; a product can be updated once per batch.']
+            except ValueError:
+                row_errors['id'] = ['Incorrect type.']
+
+        user_id = default_user_id
+        if not _blank(row.get('user_id')):
+            try:
+                user_id = _as_int(row['user_id'])
+                if user_id not in users:
+                    row_errors['user_id'] = [f'Invalid pk "{row["user_id"]}" - object does not exist.']
+            except ValueError:
+                row_errors['user_id'] = ['Incorrect type.']
+
+        if row_errors:
+            errors.append({"index": index, "errors": row_errors})
+            continue
+        seen.add(product_id)
+        products.append(Product(id=product_id, user_id=user_id, **values))
+    return products, existing & {product.id for product in products}, errors
+
+
+def upsert_products(products, updated):
+    """Write one validated batch with a single INSERT ... ON CONFLICT (id) DO UPDATE."""
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            products, update_conflicts=True, unique_fields=['id'], update_fields=UPSERT_FIELDS,
+        )
+        products_bulk_upserted.send(sender=Product, products=products, updated=updated)
+
+
+class ImportSummary:
+    """Counts of a running import and its first PRODUCT_IMPORT_MAX_ERRORS row errors."""
+
+    def __init__(self):
+        self.rows = self.created = self.updated = self.invalid = 0
+        self.errors = []
+
+    def add(self, products, updated, errors):
+        self.rows += len(products) + len(errors)
+        self.created += len(products) - len(updated)
+        self.updated += len(updated)
+        self.invalid += len(errors)
+        self.errors.extend(errors[:max(0, settings.PRODUCT_IMPORT_MAX_ERRORS - len(self.errors))])
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+
+def import_products(lines, input_format, default_user_id, batch_size=None):
+    """
+    Upsert the products in `lines` (an iterable of text lines in `input_format`),
+    batch by batch, and return the ImportSummary. A batch that was written stays
+    written if a later one fails.
+    """
+    batch_size = batch_size or settings.PRODUCT_IMPORT_BATCH_SIZE
+    summary = ImportSummary()
+
+    def flush(batch):
+        products, updated, errors = validate_product_rows(batch, default_user_id)
+        if products:
+            try:
+                upsert_products(products, updated)
+            except DatabaseError:
+                # The batch was rolled back; its rows are reported and the import goes on with the next one.
+                logger.exception('Product import batch of %d rows failed', len(products))
+                invalid = {error['index'] for error in errors}
+                errors += [
+                    {"index": index, "errors": {"non_field_errors": ["The batch with this row could not be written."]}}
+                    for index, _ in batch if index not in invalid
+                ]
+                errors.sort(key=lambda error: error['index'])
+                products, updated = [], set()
+        summary.add(products, updated, errors)
+
+    batch, index = [], 0
+    rows = READERS[input_format](lines)
+    try:
+        for index, row in enumerate(rows):
+            batch.append((index, row))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except UnicodeDecodeError:
+        # Nothing after this point can be read; what was read is still imported.
+        batch.append((index + 1, InvalidRow('Invalid UTF-8; the rest of the input was not read.')))
+    except csv.Error as e:
+        batch.append((index + 1, InvalidRow(f'Invalid CSV: {e}; the rest of the input was not read.')))
+    if batch:
+        flush(batch)
+    return summary
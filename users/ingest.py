@@ -0,0 +1,171 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction, IntegrityError
+
+from users.ids import order_ids, ID_ATTEMPTS
+from users.models import Order, Product, User
+from users.signals import orders_bulk_created
+
+AMOUNT_FIELD = Order._meta.get_field('amount')
+PRICE_FIELD = Order._meta.get_field('price')
+
+
+def _as_int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        return int(value)
+    raise ValueError
+
+
+def _in_range(field, value):
+    # The field's validators include the backend's integer range; larger values would not reach the database.
+    try:
+        field.run_validators(value)
+    except ValidationError as e:
+        raise ValueError(e.messages[0])
+    return value
+
+
+def _collect_ids(rows, field):
+    # Ids outside the primary key range cannot exist, and the database driver would refuse to send them.
+    low, high = connection.ops.integer_field_range('BigAutoField')
+    ids = set()
+    for row in rows:
+        if isinstance(row, dict):
+            try:
+                value = _as_int(row.get(field))
+            except ValueError:
+                continue
+            if low <= value <= high:
+                ids.add(value)
+    return ids
+
+
+def validate_order_rows(rows):
+    """
+    Check every row against the Order columns with two lookups in total.
+
+    Returns the unsaved Order instances for the valid rows and a list of
+    {"index": ..., "errors": {...}} entries for the rest.
+    """
+    products = Product.objects.only('id', 'price').in_bulk(_collect_ids(rows, 'product'))
+    users = set(User.objects.filter(id__in=_collect_ids(rows, 'user')).values_list('id', flat=True))
+    requested_ids = {
+        row['customer_id'] for row in rows if isinstance(row, dict) and isinstance(row.get('customer_id'), str)
+    }
+    taken_ids = set(Order.objects.filter(customer_id__in=requested_ids).values_list('customer_id', flat=True))
+    statuses = set(Order.OrderTypes.values)
+
+    orders, errors = [], []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({"index": index, "errors": {"non_field_errors": ["Invalid data. Expected a dictionary."]}})
+            continue
+        row_errors = {}
+
+        product = None
+        try:
+            product = products.get(_as_int(row.get('product')))
+            if product is None:
+                row_errors['product'] = [f'Invalid pk "{row.get("product")}" - object does not exist.']
+        except ValueError:
+            row_errors['product'] = ['This field is required.' if row.get('product') is None else 'Incorrect type.']
+
+        user_id = None
+        try:
+            user_id = _as_int(row.get('user'))
+            if user_id not in users:
+                row_errors['user'] = [f'Invalid pk "{row.get("user")}" - object does not exist.']
+        except ValueError:
+            row_errors['user'] = ['This field is required.' if row.get('user') is None else 'Incorrect type.']
+
+        amount = None
+        try:
+            amount = _as_int(row.get('amount'))
+        except ValueError:
+            row_errors['amount'] = ['This field is required.' if row.get('amount') is None else 'A valid integer is required.']
+        else:
+            try:
+                _in_range(AMOUNT_FIELD, amount)
+            except ValueError as e:
+                row_errors['amount'] = [str(e)]
+                amount = None
+
+        price = None
+        if product is not None and amount is not None:
+            try:
+                price = _in_range(PRICE_FIELD, int(product.price * amount))
+            except ValueError as e:
+                row_errors['price'] = [str(e)]
+
+        status = row.get('status') or Order.OrderTypes.TODO
+        if not isinstance(status, str):
+            row_errors['status'] = ['Not a valid string.']
+        elif status not in statuses:
+            row_errors['status'] = [f'"{status}" is not a valid choice.']
+
+        customer_id = row.get('customer_id') or ''
+        if customer_id:
+            if not isinstance(customer_id, str):
+                row_errors['customer_id'] = ['Not a valid string.']
+            elif len(customer_id) > 15:
+                row_errors['customer_id'] = ['Ensure this field has no more than 15 characters.']
+            elif customer_id in taken_ids:
+                row_errors['customer_id'] = ['order with this customer id already exists.']
+            else:
+                taken_ids.add(customer_id)
+
+        if row_errors:
+            errors.append({"index": index, "errors": row_errors})
+            continue
+        orders.append(Order(
+            product=product,
+            user_id=user_id,
+            amount=amount,
+            status=status,
+            price=price,
+            customer_id=customer_id,
+        ))
+    return orders, errors
+
+
+def _bulk_insert(orders, chunk_size):
+    """
+    bulk_create the orders, giving the ones without a customer_id ids from one batch allocation.
+
+    If a generated id turns out to be taken, the insert is rolled back to a
+    savepoint and retried with fresh ids for those rows.
+    """
+    generated = [order for order in orders if not order.customer_id]
+    for attempt in range(ID_ATTEMPTS):
+        for order, customer_id in zip(generated, order_ids.allocate(len(generated))):
+            order.customer_id = customer_id
+        try:
+            with transaction.atomic():
+                return Order.objects.bulk_create(orders, batch_size=chunk_size)
+        except IntegrityError:
+            ids = [order.customer_id for order in generated]
+            taken = Order.objects.filter(customer_id__in=ids).exists()
+            if not taken or attempt == ID_ATTEMPTS - 1:
+                raise
+            for order in orders:
+                order.pk = None
+                order._state.adding = True
+
+
+def ingest_orders(rows, chunk_size=None):
+    """
+    Insert a list of order payloads with bulk_create, chunk_size rows per INSERT, in one transaction.
+
+    Invalid rows are reported and skipped instead of failing the whole batch.
+    """
+    chunk_size = chunk_size or settings.ORDER_INGEST_CHUNK_SIZE
+    orders, errors = validate_order_rows(rows)
+    if orders:
+        with transaction.atomic():
+            _bulk_insert(orders, chunk_size)
+            orders_bulk_created.send(sender=Order, orders=orders)
+    return orders, errors
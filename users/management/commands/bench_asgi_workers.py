@@ -0,0 +1,163 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.benchmarks import benchmark_database, file_test_databases, percentile, seed_products, seed_users
+
+# gunicorn arguments of each deployment profile (see Procfile), always run with a single worker process.
+PROFILES = {
+    'wsgi': ['root.wsgi:application'],
+    'asgi': ['root.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve a read endpoint from ONE gunicorn worker process, sync (root.wsgi) and uvicorn (root.asgi). '
+        'Send it concurrent clients while a few slow clients stall halfway through their requests. Report '
+        'requests/s and latency of the normal clients and how many requests the process had in flight on average.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=20, help='Concurrent normal clients.')
+        parser.add_argument('--slow-clients', type=int, default=4)
+        parser.add_argument(
+            '--stall', type=float, default=0.5,
+            help='Seconds a slow client pauses halfway through sending each request, like a poor mobile link.',
+        )
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds of load per profile.')
+        parser.add_argument('--path', default='/products/?page_size=20')
+        parser.add_argument('--products', type=int, default=2_000)
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+
+    def handle(self, *args, **options):
+        if 'asgi' in options['profiles'] and find_spec('uvicorn_worker') is None:
+            raise CommandError(
+                'The asgi profile needs uvicorn-worker (pip install -r requirements.txt); '
+                'pass --profiles wsgi to run without it.'
+            )
+        with tempfile.TemporaryDirectory(prefix='bench-asgi-') as directory, \
+                file_test_databases(directory), benchmark_database():
+            users = seed_users(10)
+            seed_products(options['products'], users[0])
+            token = str(AccessToken.for_user(users[0]))
+            env = {
+                **os.environ,
+                'SQLITE_PATH': connections['default'].settings_dict['NAME'],
+                'SHARED_CACHE_DIR': os.path.join(directory, 'cache'),
+                'DJANGO_SETTINGS_MODULE': 'root.settings',
+            }
+            env.pop('DJANGO_ASYNC_VIEWS', None)
+            connections.close_all()
+
+            self.stdout.write(
+                f'GET {options["path"]} for {options["duration"]:.0f}s from {options["connections"]} clients and '
+                f'{options["slow_clients"]} clients stalling {options["stall"] * 1000:.0f}ms per request, '
+                f'1 worker process'
+            )
+            for profile in options['profiles']:
+                port = free_port()
+                with serve(profile, port, env, os.path.join(directory, f'{profile}.log')):
+                    result = asyncio.run(self.load(port, token, options))
+                self.report(profile, result)
+
+    async def load(self, port, token, options):
+        request = (
+            f'GET {options["path"]} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n'
+            f'Authorization: Bearer {token}\r\nConnection: close\r\n\r\n'
+        ).encode()
+        results = {'normal': [], 'slow': []}
+
+        async def client(kind, stall, deadline):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                status = await fetch(port, request, stall)
+                results[kind].append((time.perf_counter() - start, status))
+
+        # Load the URLconf and open the database connections outside the measurement.
+        await fetch(port, request, 0)
+        start = time.perf_counter()
+        deadline = start + options['duration']
+        await asyncio.gather(
+            *(client('normal', 0, deadline) for _ in range(options['connections'])),
+            *(client('slow', options['stall'], deadline) for _ in range(options['slow_clients'])),
+        )
+        results['elapsed'] = time.perf_counter() - start
+        return results
+
+    def report(self, profile, result):
+        elapsed = result['elapsed']
+        latencies = [seconds for seconds, _ in result['normal']]
+        failed = sum(status != 200 for _, status in result['normal'] + result['slow'])
+        # Little's law: the average number of requests in the process is throughput x time in it.
+        in_flight = sum(seconds for seconds, _ in result['normal'] + result['slow']) / elapsed
+        ms = lambda seconds: f'{seconds * 1000:7.1f}ms'
+        self.stdout.write(
+            f'{profile:>5}: {len(latencies) / elapsed:7.1f} req/s  p50 {ms(percentile(latencies, 50))}  '
+            f'p99 {ms(percentile(latencies, 99))}  in flight {in_flight:5.1f}  '
+            f'slow clients served {len(result["slow"])}  failed {failed}'
+        )
+
+
+async def fetch(port, request, delay):
+    """Send `request` in two halves `delay` seconds apart and return the response status code."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        half = len(request) // 2
+        writer.write(request[:half])
+        await writer.drain()
+        if delay:
+            await asyncio.sleep(delay)
+        writer.write(request[half:])
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1]) if response else 0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(profile, port, env, log_path):
+    command = [
+        sys.executable, '-m', 'gunicorn', *PROFILES[profile],
+        '--workers', '1', '--bind', f'127.0.0.1:{port}', '--backlog', '2048', '--timeout', '120',
+    ]
+    with open(log_path, 'w+') as log:
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            wait_for_port(server, port, log)
+            yield
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def wait_for_port(server, port, log, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            log.seek(0)
+            raise CommandError(f'gunicorn exited with {server.returncode}:\n{log.read()[-2000:]}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f'gunicorn did not listen on port {port} within {timeout}s.')
@@ -0,0 +1,93 @@
+import random
+import tempfile
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.benchmarks import benchmark_database, count_queries, file_test_databases, seed_products, seed_users, timer
+from users.ingest import ingest_orders
+from users.models import Order, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a catalog and its orders, sync once, then change and delete a few rows. Compare bringing a '
+        'client up to date by reloading every page of /products/ and /recent-orders/ with one '
+        '/products/changes/ and /orders/changes/ call each: requests, bytes, queries and time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20_000)
+        parser.add_argument('--orders', type=int, default=100_000)
+        parser.add_argument('--changes', type=int, default=50, help='Rows updated and deleted per table.')
+        parser.add_argument('--page-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rng = random.Random(11)
+        with tempfile.TemporaryDirectory(prefix='bench-sync-') as directory, \
+                file_test_databases(directory), benchmark_database(), \
+                override_settings(SYNC_SETTLE=timedelta(0), SYNC_MAX_PAGE_SIZE=options['page_size']):
+            users = seed_users(10)
+            products = seed_products(options['products'], users[0])
+            ingest_orders([
+                {'product': rng.choice(products).id, 'user': rng.choice(users).id, 'amount': rng.randint(1, 20)}
+                for _ in range(options['orders'])
+            ])
+            client = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(users[0])}'})
+            page = f'page_size={options["page_size"]}'
+            # The initial sync of each feed; its last token is where the measured delta starts.
+            tokens = {
+                path: self.follow(client, f'{path}?{page}', 'since')[-1]['since']
+                for path in ('/products/changes/', '/orders/changes/')
+            }
+
+            self.change(rng, products, options['changes'])
+
+            self.stdout.write(
+                f'{options["products"]:,} products, {options["orders"]:,} orders; {options["changes"]} of each '
+                f'updated and {options["changes"]} deleted (with the orders of deleted products) since the last sync\n'
+                f'{"":<24} {"requests":>9} {"KiB":>9} {"queries":>8} {"time":>9}'
+            )
+            for label, path, key in (
+                ('reload /products/', f'/products/?{page}', 'cursor'),
+                ('reload /recent-orders/', f'/recent-orders/?{page}', 'cursor'),
+                ('/products/changes/', f'/products/changes/?{page}&since={tokens["/products/changes/"]}', 'since'),
+                ('/orders/changes/', f'/orders/changes/?{page}&since={tokens["/orders/changes/"]}', 'since'),
+            ):
+                requests, size, queries, seconds, _ = self.follow(client, path, key)
+                self.stdout.write(
+                    f'{label:<24} {requests:>9} {size / 1024:>9.1f} {queries:>8} {seconds * 1000:>7.1f}ms'
+                )
+
+    def follow(self, client, path, key):
+        """Fetch `path` and its next pages by ?cursor= or ?since=; return requests, bytes, queries, seconds, last body."""
+        requests = size = 0
+        with timer() as elapsed, count_queries() as counted:
+            while path:
+                response = client.get(path)
+                body = response.json()
+                requests += 1
+                size += len(response.content)
+                if key == 'cursor':
+                    path = body['next']
+                else:
+                    path = path.split('&since=')[0] + f'&since={body["since"]}' if body['more'] else None
+        return requests, size, counted['queries'], elapsed['seconds'], body
+
+    def change(self, rng, products, count):
+        sample = rng.sample(products, 2 * count)
+        updated, deleted = sample[:count], sample[count:]
+        for product in updated:
+            product.discount += 1
+            # The seeded image has no file; marking its variants as built keeps the image pipeline out of it.
+            product.image_variants = {'source': product.image.name}
+            product.save()
+        orders = list(Order.objects.exclude(product__in=deleted).order_by('?')[:2 * count])
+        for order in orders[:count]:
+            order.status = Order.OrderTypes.DOING
+            order.save()
+        for order in orders[count:]:
+            order.delete()
+        Product.objects.filter(pk__in=[product.pk for product in deleted]).delete()
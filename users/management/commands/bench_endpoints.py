@@ -0,0 +1,400 @@
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from PIL import Image
+
+from users.benchmarks import benchmark_database, count_queries, file_test_databases, percentile, seed_products, \
+    seed_users
+from users.ingest import ingest_orders
+from users.models import Order, Product, User
+from users.tokens import IndexedRefreshToken
+
+PASSWORD = 'bench-password-123'
+
+
+class Replay:
+    """
+    The seeded dataset and the built-in request mix.
+
+    Each profile entry returns the request to send; whatever it has to set up
+    first (a user to delete, a refresh token to rotate) is done before timing.
+    """
+
+    def __init__(self, scale, rng):
+        self.rng = rng
+        self.counter = 0
+        self.password_hash = make_password(PASSWORD)
+
+        self.users = seed_users(200 * scale, prefix='bench')
+        User.objects.filter(username__startswith='bench').update(password=self.password_hash)
+        self.admin, self.user = self.users[0], self.users[1]
+        User.objects.filter(pk=self.admin.pk).update(is_staff=True, is_superuser=True)
+        self.products = seed_products(500 * scale, self.admin)
+        ingest_orders([
+            {
+                'product': rng.choice(self.products).id,
+                'user': rng.choice(self.users).id,
+                'amount': rng.randint(1, 20),
+                'status': rng.choice(Order.OrderTypes.values),
+            }
+            for _ in range(20_000 * scale)
+        ])
+        self.customer_ids = list(Order.objects.values_list('customer_id', flat=True))
+        self.tokens = {'user': self.access_token(self.user), 'admin': self.access_token(self.admin), 'none': None}
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+        self.image_bytes = buffer.getvalue()
+
+        self.profile = [
+            (1, self.root), (3, self.get_users), (1, self.register), (1, self.login), (1, self.refresh),
+            (3, self.profile_get), (1, self.profile_update), (1, self.profile_put), (1, self.change_password),
+            (1, self.delete_user), (1, self.cache_stats), (5, self.last_orders), (2, self.post_orders),
+            (5, self.recent_orders), (1, self.export_orders), (2, self.status_counts), (1, self.order_stream),
+            (2, self.order_changes), (3, self.order_detail), (3, self.top_products), (3, self.chart),
+            (2, self.dashboard), (5, self.list_products), (1, self.create_product), (2, self.product_changes),
+            (1, self.export_products), (1, self.import_products), (5, self.get_product), (1, self.update_product),
+            (1, self.delete_product),
+        ]
+
+    @staticmethod
+    def access_token(user):
+        return str(IndexedRefreshToken.for_user(user).access_token)
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f'{prefix}-{self.counter}'
+
+    def fresh_user(self):
+        return User.objects.create(username=self.unique('bench-fresh'), password=self.password_hash)
+
+    def placeholders(self):
+        return {'product': self.rng.choice(self.products).id, 'user': self.rng.choice(self.users).id}
+
+    @staticmethod
+    def request(method, path, data=None, auth='user', json_body=True):
+        return {'method': method, 'path': path, 'data': data, 'auth': auth, 'json': json_body}
+
+    def root(self):
+        return self.request('GET', '/', auth='none')
+
+    def get_users(self):
+        return self.request('GET', '/get-users/')
+
+    def register(self):
+        username = self.unique('bench-register')
+        return self.request(
+            'POST', '/register/', {'username': username, 'email': f'{username}@example.com', 'password': PASSWORD},
+            auth='none',
+        )
+
+    def login(self):
+        return self.request('POST', '/login/', {'username': self.user.username, 'password': PASSWORD}, auth='none')
+
+    def refresh(self):
+        return self.request('POST', '/token/refresh/', {'refresh': str(IndexedRefreshToken.for_user(self.user))})
+
+    def profile_get(self):
+        return self.request('GET', '/profile/')
+
+    def profile_update(self):
+        return self.request('POST', '/profile/update/', {'bio': self.unique('bio')})
+
+    def profile_put(self):
+        return self.request('PUT', '/profile/put/', {'bio': self.unique('bio')})
+
+    def change_password(self):
+        user = self.fresh_user()
+        request = self.request(
+            'POST', '/change-password/', {'current_password': PASSWORD, 'new_password': PASSWORD + '-new'}
+        )
+        request['token'] = self.access_token(user)
+        return request
+
+    def delete_user(self):
+        return self.request('DELETE', f'/user/delete/{self.fresh_user().pk}/')
+
+    def cache_stats(self):
+        return self.request('GET', '/user-cache/stats/', auth='admin')
+
+    def last_orders(self):
+        return self.request('GET', '/last-orders/')
+
+    def post_orders(self):
+        rows = [
+            {'product': self.rng.choice(self.products).id, 'user': self.user.id, 'amount': self.rng.randint(1, 5)}
+            for _ in range(20)
+        ]
+        return self.request('POST', '/last-orders/', rows)
+
+    def recent_orders(self):
+        return self.request('GET', '/recent-orders/')
+
+    def export_orders(self):
+        return self.request('GET', '/orders/export/?status=lated')
+
+    def status_counts(self):
+        return self.request('GET', '/orders/status-counts/')
+
+    def order_stream(self):
+        return self.request('GET', '/orders/stream/')
+
+    def order_changes(self):
+        return self.request('GET', '/orders/changes/')
+
+    def order_detail(self):
+        return self.request('GET', f'/orders/{self.rng.choice(self.customer_ids)}/')
+
+    def top_products(self):
+        return self.request('GET', '/top-products/?limit=10')
+
+    def chart(self):
+        return self.request('GET', '/chart/')
+
+    def dashboard(self):
+        return self.request('GET', '/dashboard/')
+
+    def list_products(self):
+        return self.request('GET', '/products/')
+
+    def create_product(self):
+        image = SimpleUploadedFile('bench.png', self.image_bytes, content_type='image/png')
+        data = {
+            'name': self.unique('Bench product'), 'price': '19.99', 'user': self.admin.id,
+            'description': 'Created by bench_endpoints', 'image': image, 'discount': 5,
+        }
+        return self.request('POST', '/products/', data, json_body=False)
+
+    def product_changes(self):
+        return self.request('GET', '/products/changes/')
+
+    def export_products(self):
+        return self.request('GET', '/products/export/')
+
+    def import_products(self):
+        rows = [
+            {
+                'id': product.id, 'name': self.unique('Imported product'), 'price': '9.99',
+                'description': 'Imported by bench_endpoints', 'discount': self.rng.randint(0, 20),
+            }
+            for product in self.rng.sample(self.products, 20)
+        ]
+        request = self.request('POST', '/products/import/', '\n'.join(json.dumps(row) for row in rows), json_body=False)
+        request['content_type'] = 'application/x-ndjson'
+        return request
+
+    def get_product(self):
+        return self.request('GET', f'/product/crud/{self.rng.choice(self.products).id}')
+
+    def update_product(self):
+        return self.request('PATCH', f'/product/crud/{self.rng.choice(self.products).id}', {'discount': 10})
+
+    def delete_product(self):
+        product = Product.objects.create(
+            name=self.unique('Doomed product'), price='1.00', user=self.admin, description='-',
+            image='', discount=0,
+        )
+        return self.request('DELETE', f'/product/crud/{product.id}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a scaled dataset and replay a request mix against the API through the test client, reporting '
+        'throughput, latency percentiles and SQL queries per endpoint. With --compare, exit non-zero when an '
+        'endpoint regressed against an earlier --output file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Dataset multiplier (200 users, 500 products, '
+                                                                   '20k orders per unit).')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests to replay from the built-in mix.')
+        parser.add_argument('--traffic', help='JSON-lines file of recorded requests to replay instead of the '
+                                              'built-in mix: {"method", "path", "json", "auth"}; "{product}" and '
+                                              '"{user}" in paths are replaced with seeded ids.')
+        parser.add_argument('--repeat', type=int, default=1, help='Times to replay the --traffic file.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', help='Results file of an earlier run to check for regressions.')
+        parser.add_argument('--threshold', type=float, default=settings.BENCH_REGRESSION_THRESHOLD,
+                            help='Allowed relative p95 increase before an endpoint counts as regressed.')
+        parser.add_argument('--min-delta-ms', type=float, default=settings.BENCH_REGRESSION_MIN_DELTA_MS,
+                            help='Ignore p95 increases smaller than this, whatever the ratio.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        traffic = self.load_traffic(options['traffic']) if options['traffic'] else None
+
+        # The WSGI order stream is refused unless it is bounded; send() only reads its first frame.
+        with tempfile.TemporaryDirectory(prefix='bench-endpoints-') as directory, \
+                file_test_databases(directory), benchmark_database(), \
+                override_settings(MEDIA_ROOT=os.path.join(directory, 'media'), ORDER_STREAM_WSGI_SECONDS=60):
+            started = time.perf_counter()
+            replay = Replay(options['scale'], rng)
+            self.stdout.write(f'Seeded dataset in {time.perf_counter() - started:.1f}s.')
+
+            if traffic is None:
+                weights, factories = zip(*replay.profile)
+                # One untimed pass over every endpoint so first-call costs are not measured.
+                for factory in factories:
+                    self.send(Client(), replay, factory())
+                plan = [factory for factory in rng.choices(factories, weights=weights, k=options['requests'])]
+            else:
+                plan = [lambda entry=entry: self.recorded(replay, entry) for entry in traffic] * options['repeat']
+
+            client = Client()
+            samples = defaultdict(list)
+            started = time.perf_counter()
+            for factory in plan:
+                request = factory()
+                samples[self.endpoint_name(request)].append(self.send(client, replay, request))
+            elapsed = time.perf_counter() - started
+
+        results = self.summarize(samples, elapsed, options)
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Wrote {options["output"]}.')
+        if options['compare']:
+            self.compare(results, options)
+
+    @staticmethod
+    def load_traffic(path):
+        with open(path) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        if not entries:
+            raise CommandError(f'{path} has no requests to replay.')
+        return entries
+
+    @staticmethod
+    def recorded(replay, entry):
+        return replay.request(
+            entry.get('method', 'GET').upper(),
+            entry['path'].format(**replay.placeholders()),
+            entry.get('json'),
+            auth=entry.get('auth', 'user'),
+        )
+
+    @staticmethod
+    def endpoint_name(request):
+        route = resolve(request['path'].split('?', 1)[0]).route
+        return f'{request["method"]} /{route}'
+
+    @staticmethod
+    def send(client, replay, request):
+        token = request.get('token') or replay.tokens[request['auth']]
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        kwargs = {'headers': headers}
+        if request['data'] is not None:
+            kwargs['data'] = json.dumps(request['data']) if request['json'] else request['data']
+            if request['json']:
+                kwargs['content_type'] = 'application/json'
+            elif 'content_type' in request:
+                kwargs['content_type'] = request['content_type']
+        send = getattr(client, request['method'].lower())
+        with count_queries() as queries:
+            start = time.perf_counter()
+            response = send(request['path'], **kwargs)
+            if response.get('Content-Type') == 'text/event-stream':
+                # An event stream stays open; it is timed to its first frame and then closed.
+                Command.first_frame(response)
+            elif response.streaming:
+                b''.join(response.streaming_content)
+            seconds = time.perf_counter() - start
+        return {'seconds': seconds, 'queries': queries['queries'], 'status': response.status_code}
+
+    @staticmethod
+    def first_frame(response):
+        if not response.is_async:
+            next(iter(response.streaming_content))
+            response.close()
+            return
+
+        async def read():
+            frames = response.streaming_content
+            await anext(frames)
+            await frames.aclose()
+        async_to_sync(read)()
+
+    @staticmethod
+    def summarize(samples, elapsed, options):
+        endpoints = {}
+        for name, rows in sorted(samples.items()):
+            latencies = [row['seconds'] for row in rows]
+            queries = [row['queries'] for row in rows]
+            endpoints[name] = {
+                'requests': len(rows),
+                'errors': sum(1 for row in rows if row['status'] >= 400),
+                'statuses': dict(Counter(str(row['status']) for row in rows)),
+                'rps': len(rows) / sum(latencies),
+                'mean_ms': statistics.fmean(latencies) * 1000,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'queries_median': statistics.median(queries),
+                'queries_max': max(queries),
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'meta': {
+                'recorded_at': timezone.now().isoformat(),
+                'scale': options['scale'],
+                'seed': options['seed'],
+                'traffic': options['traffic'] or 'built-in',
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'total': {'requests': total, 'seconds': elapsed, 'rps': total / elapsed},
+            'endpoints': endpoints,
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<34} {"reqs":>5} {"err":>4} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"queries":>8}'
+        )
+        for name, row in results['endpoints'].items():
+            self.stdout.write(
+                f'{name:<34} {row["requests"]:>5} {row["errors"]:>4} {row["rps"]:>8.1f} '
+                f'{row["p50_ms"]:>6.1f}ms {row["p95_ms"]:>6.1f}ms {row["p99_ms"]:>6.1f}ms '
+                f'{row["queries_median"]:>4g}/{row["queries_max"]:<3}'
+            )
+        total = results['total']
+        self.stdout.write(f'{total["requests"]} requests in {total["seconds"]:.2f}s = {total["rps"]:.1f} req/s')
+
+    def compare(self, results, options):
+        with open(options['compare']) as f:
+            baseline = json.load(f)['endpoints']
+        regressions = []
+        for name, row in results['endpoints'].items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            slower = row['p95_ms'] - before['p95_ms']
+            if slower > options['min_delta_ms'] and row['p95_ms'] > before['p95_ms'] * (1 + options['threshold']):
+                regressions.append(f'{name}: p95 {before["p95_ms"]:.1f}ms -> {row["p95_ms"]:.1f}ms')
+            if row['queries_max'] > before['queries_max']:
+                regressions.append(f'{name}: queries {before["queries_max"]} -> {row["queries_max"]}')
+            if row['errors'] / row['requests'] > before['errors'] / before['requests']:
+                regressions.append(f'{name}: errors {before["errors"]}/{before["requests"]} -> '
+                                   f'{row["errors"]}/{row["requests"]}')
+        if regressions:
+            raise CommandError('Endpoints regressed against {}:\n  {}'.format(
+                options['compare'], '\n  '.join(regressions)
+            ))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {options["compare"]}.'))
@@ -0,0 +1,88 @@
+import asyncio
+import tempfile
+import time
+from types import ModuleType
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from users.benchmarks import benchmark_database, file_test_databases, percentile
+from users.models import User
+from users.urls import build_urlpatterns
+
+PASSWORD = 'storm-password-123'
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire a burst of concurrent logins through the ASGI handler and measure login latency '
+        'and the latency of a cheap endpoint requested meanwhile, for the sync and async auth views.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=24, help='Concurrent login requests in the storm.')
+        parser.add_argument('--probe-interval', type=float, default=0.01, help='Seconds between probe requests.')
+        parser.add_argument('--probe-path', default='/')
+
+    def handle(self, *args, **options):
+        # Concurrent logins write last_login from several threads, which the shared in-memory database refuses.
+        with tempfile.TemporaryDirectory(prefix='bench-login-') as directory, \
+                file_test_databases(directory), benchmark_database():
+            user = User(username='storm')
+            user.set_password(PASSWORD)
+            user.save()
+            for mode in ('sync', 'async'):
+                urlconf = ModuleType(f'bench_{mode}_urls')
+                urlconf.urlpatterns = build_urlpatterns(async_views=mode == 'async')
+                with override_settings(ROOT_URLCONF=urlconf):
+                    result = asyncio.run(self.storm(options))
+                self.report(mode, result)
+
+    async def storm(self, options):
+        client = AsyncClient()
+        done = asyncio.Event()
+        login_times, probe_times, statuses = [], [], []
+
+        async def login():
+            start = time.perf_counter()
+            response = await client.post(
+                '/login/', {'username': 'storm', 'password': PASSWORD}, content_type='application/json'
+            )
+            login_times.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get(options['probe_path'])
+                probe_times.append(time.perf_counter() - start)
+                await asyncio.sleep(options['probe_interval'])
+
+        # Warm up the URLconf and the database connection outside the measurement.
+        await client.get(options['probe_path'])
+        await sync_to_async(User.objects.count)()
+
+        started = time.perf_counter()
+        prober = asyncio.create_task(probe())
+        await asyncio.gather(*(login() for _ in range(options['logins'])))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+        return {
+            'elapsed': elapsed,
+            'logins': login_times,
+            'probes': probe_times,
+            'ok': statuses.count(200),
+            'shed': statuses.count(503),
+        }
+
+    def report(self, mode, result):
+        ms = lambda seconds: f'{seconds * 1000:8.1f}ms'
+        self.stdout.write(
+            f'{mode:>5} views: {len(result["logins"])} logins in {result["elapsed"]:.2f}s '
+            f'({result["ok"]} ok, {result["shed"]} shed with 503)\n'
+            f'        login p50 {ms(percentile(result["logins"], 50))}  p99 {ms(percentile(result["logins"], 99))}\n'
+            f'        probe p50 {ms(percentile(result["probes"], 50))}  p99 {ms(percentile(result["probes"], 99))}'
+            f'  ({len(result["probes"])} requests)'
+        )
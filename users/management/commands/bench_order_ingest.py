@@ -0,0 +1,54 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.benchmarks import benchmark_database, count_queries, timer, seed_users, seed_products
+from users.ingest import ingest_orders
+from users.models import Order
+from users.serializers import LastOrdersSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare per-row serializer saves with the bulk ingestion path of /last-orders/ (rows/second).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--skip-serializer', action='store_true', help='Only measure the bulk path.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            users = seed_users(20)
+            products = seed_products(options['products'], users[0])
+            rng = random.Random(42)
+            payload = [
+                {
+                    'product': rng.choice(products).id,
+                    'user': rng.choice(users).id,
+                    'amount': rng.randint(1, 20),
+                    'status': 'to do',
+                }
+                for _ in range(options['rows'])
+            ]
+
+            if not options['skip_serializer']:
+                self.report('serializer', payload, self.serializer_path)
+                Order.objects.all().delete()
+            self.report('bulk', payload, lambda rows: ingest_orders(rows, options['chunk_size']))
+
+    def serializer_path(self, rows):
+        serializer = LastOrdersSerializer(data=rows, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+
+    def report(self, label, payload, ingest):
+        with count_queries() as queries, timer() as elapsed:
+            ingest(payload)
+        rate = len(payload) / elapsed['seconds']
+        self.stdout.write(
+            f'{label:>10}: {len(payload)} rows in {elapsed["seconds"]:.3f}s '
+            f'= {rate:,.0f} rows/s, {queries["queries"]} queries'
+        )
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from users.benchmarks import percentile
+from users.events import astream, order_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Fan order events out to many /orders/stream/ subscribers on one event loop, published from another '
+        'thread as the web workers do. Report the publish cost per event and the publish-to-delivery latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=1000)
+        parser.add_argument('--events', type=int, default=200)
+        parser.add_argument('--batch', type=int, default=1, help='Events per publish, as with a bulk insert.')
+        parser.add_argument('--interval', type=float, default=0.005, help='Seconds between publishes.')
+
+    def handle(self, *args, **options):
+        with override_settings(ORDER_STREAM_MAX_SUBSCRIBERS=options['subscribers'], ORDER_STREAM_HEARTBEAT=60):
+            result = asyncio.run(self.fan_out(options))
+        events, subscribers = result['events'], options['subscribers']
+        ms = lambda seconds: f'{seconds * 1000:.2f}ms'
+        self.stdout.write(
+            f'{subscribers} subscribers, {events} events in batches of {options["batch"]}: '
+            f'publish {result["publish"] / events * 1e6:.1f}us/event '
+            f'({result["publish"] / events / subscribers * 1e9:.0f}ns per subscriber)\n'
+            f'delivered {result["delivered"]:,} of {events * subscribers:,} frames, '
+            f'{result["dropped"]} subscribers dropped as too slow; '
+            f'latency p50 {ms(percentile(result["latencies"], 50))} p99 {ms(percentile(result["latencies"], 99))}'
+        )
+
+    async def fan_out(self, options):
+        events = options['events'] - options['events'] % options['batch']
+        sent_at, latencies = {}, []
+        counts = {'delivered': 0, 'dropped': 0}
+
+        async def subscriber():
+            body = astream(None)
+            await anext(body)  # retry: hint; the subscription now exists
+            ready.release()
+            received = 0
+            async for data in body:
+                sequence = int(data.split(b'\n', 1)[0].rsplit(b'-', 1)[1])
+                latencies.append(time.perf_counter() - sent_at[sequence])
+                received += 1
+                if received == events:
+                    break
+            else:
+                counts['dropped'] += 1
+            counts['delivered'] += received
+            await body.aclose()
+
+        def publish():
+            elapsed = 0.0
+            first = order_events.sequence + 1
+            for start in range(0, events, options['batch']):
+                batch = [('order.created', {'id': index, 'amount': 1}) for index in range(start, start + options['batch'])]
+                now = time.perf_counter()
+                for offset in range(len(batch)):
+                    sent_at[first + start + offset] = now
+                order_events.publish(batch)
+                elapsed += time.perf_counter() - now
+                time.sleep(options['interval'])
+            return elapsed
+
+        ready = asyncio.Semaphore(0)
+        tasks = [asyncio.create_task(subscriber()) for _ in range(options['subscribers'])]
+        for _ in tasks:
+            await ready.acquire()
+        publisher = threading.Thread(target=lambda: result.update(publish=publish()))
+        result = {}
+        publisher.start()
+        await asyncio.gather(*tasks)
+        publisher.join()
+        return {**result, **counts, 'events': events, 'latencies': latencies}
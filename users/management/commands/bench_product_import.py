@@ -0,0 +1,92 @@
+import csv
+import io
+import os
+import tempfile
+import tracemalloc
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.benchmarks import benchmark_database, file_test_databases, seed_users, timer
+from users.exports import PRODUCT_EXPORT_FIELDS
+from users.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Load products one POST /products/ per item, as clients do without an import, and as one CSV '
+        'POST /products/import/; report rows/s. Then round-trip the catalog through export_products and '
+        'import_products (every row an update) and report the time and peak Python memory of each step.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=300, help='Products created one request each.')
+        parser.add_argument('--products', type=int, default=100_000, help='Products in the imported file.')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(prefix='bench-import-') as directory, \
+                file_test_databases(directory), benchmark_database(), \
+                override_settings(MEDIA_ROOT=os.path.join(directory, 'media')):
+            user = seed_users(1, prefix='bench-import')[0]
+            client = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+            count = options['products']
+
+            with timer() as elapsed:
+                self.post_each(client, user, options['posts'])
+            self.report('POST /products/ per item', options['posts'], elapsed['seconds'])
+
+            body = self.catalog_csv(count)
+            with timer() as elapsed:
+                response = client.post('/products/import/', body, content_type='text/csv')
+            summary = response.json()
+            self.report(
+                f'POST /products/import/ ({len(body) / 2 ** 20:.1f} MiB CSV)', summary['created'], elapsed['seconds']
+            )
+
+            path = os.path.join(directory, 'catalog.ndjson')
+            total = Product.objects.count()
+            for label, command, arguments in (
+                ('export_products', 'export_products', ['-o', path]),
+                ('import_products (updates)', 'import_products', [path, '--user', user.username]),
+            ):
+                if options['batch_size'] and command == 'import_products':
+                    arguments += ['--batch-size', str(options['batch_size'])]
+                with timer() as elapsed:
+                    call_command(command, *arguments, stdout=io.StringIO(), stderr=io.StringIO())
+                # Again under tracemalloc, which slows Python down too much to time the same run.
+                tracemalloc.start()
+                call_command(command, *arguments, stdout=io.StringIO(), stderr=io.StringIO())
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.report(label, total, elapsed['seconds'], f'peak {peak / 2 ** 20:.1f} MiB')
+
+    def post_each(self, client, user, count):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (40, 120, 200)).save(buffer, 'PNG')
+        for index in range(count):
+            client.post('/products/', {
+                'name': f'Posted product {index}', 'price': '19.99', 'user': user.id, 'description': 'One request each',
+                'image': SimpleUploadedFile('bench.png', buffer.getvalue(), content_type='image/png'), 'discount': 5,
+            })
+
+    def catalog_csv(self, count):
+        # New rows: no id, owned by the importing user.
+        skipped = ('id', 'user_id', 'created_at', 'updated_at')
+        columns = [name for name, _ in PRODUCT_EXPORT_FIELDS if name not in skipped]
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(columns)
+        for index in range(count):
+            writer.writerow([
+                f'Imported product {index}', f'{10 + index % 490}.99', f'Imported product number {index}',
+                index % 50, index % 7 == 0, index % 3 == 0, 'products/image/bench.png',
+            ])
+        return output.getvalue().encode()
+
+    def report(self, label, rows, seconds, extra=''):
+        self.stdout.write(f'{label:<36} {rows:>8,} rows {seconds:>8.2f}s {rows / seconds:>10,.0f} rows/s  {extra}')
@@ -0,0 +1,105 @@
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from users.benchmarks import benchmark_database, file_test_databases, percentile, seed_users, timer
+from users.filters import search_expression
+from users.models import Product
+
+SYLLABLES = ('ka', 'lo', 'mi', 'ner', 'sto', 'va', 'ru', 'pel', 'dor', 'fin', 'ta', 'bex', 'qu', 'zan', 'ol', 'ith')
+
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words, key=lambda word: rng.random())
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large product catalog and compare the first page of ?q= search through the FTS5 index '
+        '(ranked) with LIKE scans over name and description (in id order, so they stop early on common '
+        'words and read the whole table on rare ones).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query; the median is reported.')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        words = vocabulary(options['vocabulary'], rng)
+        # Zipf-like word frequencies, so the terms below range from very common to rare.
+        weights = [1 / (rank + 1) for rank in range(len(words))]
+
+        with tempfile.TemporaryDirectory(prefix='bench-search-') as directory, \
+                file_test_databases(directory), benchmark_database():
+            with timer() as elapsed:
+                self.seed(options, rng, words, weights)
+            self.stdout.write(f'Seeded {options["products"]:,} products in {elapsed["seconds"]:.1f}s.')
+
+            terms = {
+                'common word': words[0],
+                'mid word': words[len(words) // 50],
+                'rare word': words[-1],
+                'two words': f'{words[1]} {words[20]}',
+                'prefix': words[len(words) // 50][:4],
+                'no match': 'xyzzy',
+            }
+            self.stdout.write(f'{"query":<14} {"matches":>9} {"fts5":>10} {"like":>10}')
+            for label, term in terms.items():
+                self.compare(label, term, options)
+
+    def seed(self, options, rng, words, weights):
+        owner = seed_users(1, prefix='bench-search')[0]
+        remaining = options['products']
+        while remaining:
+            count = min(remaining, options['batch_size'])
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        name=' '.join(rng.choices(words, weights, k=3)).title(),
+                        description=' '.join(rng.choices(words, weights, k=20)),
+                        price=Decimal(rng.randint(100, 50_000)) / 100,
+                        user=owner,
+                        image='products/image/bench.png',
+                        discount=rng.randint(0, 50),
+                        gift=rng.random() < 0.1,
+                        delivery=rng.random() < 0.3,
+                    )
+                    for _ in range(count)
+                ],
+                batch_size=1000,
+            )
+            remaining -= count
+
+    def compare(self, label, term, options):
+        expression = search_expression(term)
+        ranked = (
+            Product.objects.filter(search_index__document__match=expression)
+            .annotate(search_rank=F('search_index__rank'))
+            .order_by('search_rank', 'id')
+        )
+        like = Q()
+        for word in term.split():
+            like &= Q(name__icontains=word) | Q(description__icontains=word)
+        scanned = Product.objects.filter(like).order_by('id')
+
+        matches = ranked.count()
+        results = []
+        for queryset in (ranked, scanned):
+            samples = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset[:options['page_size']])
+                samples.append(time.perf_counter() - start)
+            results.append(percentile(samples, 50) * 1000)
+        self.stdout.write(f'{label:<14} {matches:>9,} {results[0]:>8.1f}ms {results[1]:>8.1f}ms   ({term!r})')
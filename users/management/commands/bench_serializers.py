@@ -0,0 +1,95 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from users.benchmarks import benchmark_database, percentile, seed_products, seed_users
+from users.ingest import ingest_orders
+from users.models import Order, Product, User
+from users.renderers import ORJSONRenderer
+from users.rows import ValuesSerializer
+from users.serializers import ProductsSerializer, RecentOrdersSerializer, UsersSerializer, \
+    recent_orders_values_serializer
+
+class Command(BaseCommand):
+    help = (
+        'Serialize and render large list payloads (users, products, recent orders) through DRF '
+        'serializers + JSONRenderer and through ValuesSerializer + ORJSONRenderer; report rows/second '
+        'and check that both produce the same bytes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per payload; the median is reported.')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with benchmark_database():
+            users = seed_users(rows)
+            seed_products(rows, users[0])
+            products = list(Product.objects.values_list('id', flat=True))
+            rng = random.Random(42)
+            ingest_orders([
+                {'product': rng.choice(products), 'user': rng.choice(users).id, 'amount': rng.randint(1, 20)}
+                for _ in range(rows)
+            ])
+            context = {'request': Request(RequestFactory().get('/'))}
+
+            payloads = {
+                'users': (
+                    lambda: UsersSerializer(User.objects.all(), many=True, context=context).data,
+                    lambda: self.fast(UsersSerializer, User.objects.all(), context),
+                ),
+                'products': (
+                    lambda: ProductsSerializer(Product.objects.order_by('id'), many=True, context=context).data,
+                    lambda: self.fast(ProductsSerializer, Product.objects.order_by('id'), context),
+                ),
+                'recent orders': (self.recent_orders, self.fast_recent_orders),
+            }
+            self.stdout.write(f'{"payload":<14} {"rows":>7} {"drf rows/s":>12} {"fast rows/s":>12} {"speedup":>8}')
+            for label, (drf, fast) in payloads.items():
+                self.compare(label, drf, fast, options['repeat'])
+
+    def fast(self, serializer_class, queryset, context):
+        serializer = ValuesSerializer(serializer_class, context=context)
+        return serializer.serialize(serializer.rows(queryset))
+
+    def recent_orders(self):
+        # What RecentOrdersAPIView did before the fast path: serialize, then reshape the rows.
+        orders = Order.objects.select_related('product', 'user').only(
+            'id', 'created_at', 'price', 'user__username', 'product__name'
+        ).order_by('-created_at', '-id')
+        return [
+            {
+                'product_name': order['product_name'],
+                'price': order['price'],
+                'username': order['username'],
+                'created_at': order['created_at'].split('T')[0],
+            }
+            for order in RecentOrdersSerializer(orders, many=True).data
+        ]
+
+    def fast_recent_orders(self):
+        serializer = recent_orders_values_serializer()
+        return serializer.serialize(serializer.rows(Order.objects.order_by('-created_at', '-id')))
+
+    def compare(self, label, drf, fast, repeat):
+        results = []
+        for build, renderer in ((drf, JSONRenderer()), (fast, ORJSONRenderer())):
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data = build()
+                content = renderer.render(data)
+                samples.append(time.perf_counter() - start)
+            results.append((len(data), percentile(samples, 50), content))
+        (count, drf_seconds, drf_content), (_, fast_seconds, fast_content) = results
+        if drf_content != fast_content:
+            raise CommandError(f'{label}: the fast path rendered different bytes.')
+        self.stdout.write(
+            f'{label:<14} {count:>7,} {count / drf_seconds:>12,.0f} {count / fast_seconds:>12,.0f} '
+            f'{drf_seconds / fast_seconds:>7.1f}x'
+        )
@@ -0,0 +1,102 @@
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections, OperationalError
+
+from root.db import read_database
+from users.benchmarks import benchmark_database, file_test_databases, percentile, seed_products, seed_users
+from users.models import Order, Product
+
+# What DATABASES looked like before WAL: default journal mode, Django's 5s busy
+# timeout, deferred transactions, a new connection per request and no read alias.
+BASELINE = {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a mixed read/write workload from several threads against a file-backed SQLite database, '
+        'once with the pre-WAL configuration and once with the configured DATABASES.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--products', type=int, default=200)
+
+    def handle(self, *args, **options):
+        for mode in ('baseline', 'configured'):
+            with tempfile.TemporaryDirectory(prefix='bench-sqlite-') as directory:
+                overrides = BASELINE if mode == 'baseline' else {}
+                with file_test_databases(directory, **overrides), benchmark_database():
+                    result = self.run(mode, options)
+            self.report(mode, result, options)
+
+    def run(self, mode, options):
+        owner = seed_users(1, prefix='bench-sqlite')[0]
+        buyers = seed_users(20, prefix='bench-sqlite-buyer')
+        products = seed_products(options['products'], owner)
+        use_read_alias = mode == 'configured' and settings.READ_DATABASE_ALIAS in connections.settings
+        lock = threading.Lock()
+        with connections['default'].cursor() as cursor:
+            journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+        result = {'reads': [], 'writes': [], 'locked': 0, 'journal_mode': journal_mode}
+        deadline = time.perf_counter() + options['seconds']
+
+        def read():
+            list(Order.objects.select_related('user', 'product').order_by('-created_at', '-id')[:50])
+            list(Product.objects.filter(price__lt=Decimal(250)).order_by('-id')[:50])
+
+        def write(rng):
+            Order.objects.create(product=rng.choice(products), user=rng.choice(buyers), amount=rng.randint(1, 5))
+
+        def worker(seed):
+            rng = random.Random(seed)
+            reads, writes, locked = [], [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    is_write = rng.random() < options['write_ratio']
+                    start = time.perf_counter()
+                    try:
+                        if is_write:
+                            write(rng)
+                        elif use_read_alias:
+                            with read_database():
+                                read()
+                        else:
+                            read()
+                    except OperationalError:
+                        locked += 1
+                    else:
+                        (writes if is_write else reads).append(time.perf_counter() - start)
+                    # End of "request": closes the connection unless it is persistent.
+                    close_old_connections()
+            finally:
+                connections.close_all()
+                with lock:
+                    result['reads'] += reads
+                    result['writes'] += writes
+                    result['locked'] += locked
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def report(self, mode, result, options):
+        ms = lambda seconds: f'{seconds * 1000:7.1f}ms'
+        total = len(result['reads']) + len(result['writes'])
+        self.stdout.write(
+            f'{mode:>10}: {total / options["seconds"]:8.1f} ops/s, journal_mode={result["journal_mode"]} '
+            f'({len(result["reads"])} reads, {len(result["writes"])} writes, '
+            f'{result["locked"]} failed with "database is locked")\n'
+            f'            read p50 {ms(percentile(result["reads"], 50))}  p99 {ms(percentile(result["reads"], 99))}\n'
+            f'           write p50 {ms(percentile(result["writes"], 50))}  p99 {ms(percentile(result["writes"], 99))}'
+        )
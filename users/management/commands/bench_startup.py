@@ -0,0 +1,79 @@
+import json
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from drf_spectacular.drainage import GENERATOR_STATS
+
+from users.benchmarks import percentile
+from users.openapi import generate_schema
+
+# Runs in a fresh interpreter: boot the WSGI app and load the URLconf ("ready"), then serve GET /.
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+os.environ['DJANGO_SETTINGS_MODULE'] = 'root.settings'
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+import root.urls
+if {eager}:
+    # What startup used to do: drf_spectacular's views and extensions imported, extend_schema applied.
+    import drf_spectacular.views, users.schema
+    from users.openapi import apply_schema_annotations
+    apply_schema_annotations()
+ready = time.perf_counter()
+from django.test import Client
+Client().get('/')
+served = time.perf_counter()
+print(json.dumps({{
+    'ready': ready - start,
+    'served': served - start,
+    'modules': sum(name.split('.')[0] == 'drf_spectacular' for name in sys.modules),
+}}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Start fresh interpreters the way a new dyno does and time booting the app, loading the URLconf '
+        'and serving the first request, with drf_spectacular deferred (now) and imported eagerly (before). '
+        'Also time generating the schema against the collected static copy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=15, help='Interpreters per mode; medians are reported.')
+
+    def handle(self, *args, **options):
+        samples = {'deferred': [], 'eager': []}
+        for _ in range(options['runs']):
+            # Interleaved, so load on the machine affects both modes alike.
+            for mode in samples:
+                samples[mode].append(self.start(eager=mode == 'eager'))
+
+        self.stdout.write(f'{"mode":<9} {"process":>9} {"ready":>9} {"1st req":>9} {"spectacular modules":>20}')
+        for mode, runs in samples.items():
+            median = lambda key: percentile([run[key] for run in runs], 50) * 1000
+            self.stdout.write(
+                f'{mode:<9} {median("process"):>7.0f}ms {median("ready"):>7.0f}ms {median("served"):>7.0f}ms '
+                f'{runs[0]["modules"]:>20}'
+            )
+
+        start = time.perf_counter()
+        with GENERATOR_STATS.silence():
+            content = generate_schema()
+        self.stdout.write(
+            f'generating the schema (/schema/ without collectstatic): {(time.perf_counter() - start) * 1000:.0f}ms '
+            f'for {len(content) / 1024:.0f} KiB'
+        )
+
+    def start(self, eager):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD.format(eager=eager)],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['process'] = time.perf_counter() - start
+        return result
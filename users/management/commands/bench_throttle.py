@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+from rest_framework.throttling import AnonRateThrottle
+
+from users.throttling import parse_rate, throttle_wait, token_buckets
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure what a shared token-bucket throttle check costs per request, alone and with several '
+        'processes checking the same bucket, and check that the processes share one limit.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=20_000)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        checks = options['checks']
+        with tempfile.TemporaryDirectory(prefix='bench-throttle-') as directory, override_settings(
+            THROTTLE_DATABASE=os.path.join(directory, 'throttle.sqlite3'),
+            THROTTLE_RATES={'login': {'ip': f'{checks}/min', 'username': f'{checks}/min'}},
+        ):
+            capacity, rate = parse_rate(f'{checks}/min')
+            self.report('same bucket', checks, lambda i: token_buckets.consume('bench:hot', capacity, rate))
+            self.report('new bucket each', checks, lambda i: token_buckets.consume(f'bench:{i}', capacity, rate))
+
+            request = RequestFactory().post('/login/', REMOTE_ADDR='10.0.0.1')
+            data = {'username': 'bench', 'password': 'secret'}
+            self.report('login (ip + user)', checks, lambda i: throttle_wait('login', request, data))
+
+            drf_throttle = AnonRateThrottle()
+            drf_throttle.rate = '1000000/min'
+            drf_throttle.num_requests, drf_throttle.duration = drf_throttle.parse_rate(drf_throttle.rate)
+            drf_request = Request(request)
+            self.report('drf AnonRate', checks, lambda i: drf_throttle.allow_request(drf_request, None))
+
+            self.contended(options['processes'], checks)
+
+    def report(self, label, checks, check):
+        token_buckets.clear()
+        start = time.perf_counter()
+        for index in range(checks):
+            check(index)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{label:>18}: {elapsed / checks * 1e6:6.1f} us/check, {checks / elapsed:>9,.0f} checks/s')
+
+    def contended(self, processes, checks):
+        """Every process drains one bucket; together they may take exactly its capacity."""
+        token_buckets.clear()
+        per_process = checks // processes
+        limit = per_process  # a quarter of the attempts (with 4 processes) may pass
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(target=drain, args=(results, per_process, limit)) for _ in range(processes)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        allowed = sum(results.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        total = per_process * processes
+        self.stdout.write(
+            f'{processes:>3} processes, 1 bucket: {total / elapsed:,.0f} checks/s overall, '
+            f'{allowed:,} of {total:,} allowed (limit {limit:,})'
+        )
+
+
+def drain(results, checks, limit):
+    # A refill slow enough not to matter during the run.
+    allowed = sum(not token_buckets.consume('bench:shared', limit, 1e-9) for _ in range(checks))
+    results.put(allowed)
@@ -0,0 +1,52 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.images import image_pipeline
+from users.models import Product, User
+
+TARGETS = {
+    'products': (Product, 'image', 'image_variants'),
+    'users': (User, 'user_image', 'user_image_variants'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Build resized variants for product and user images uploaded before the image pipeline existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(TARGETS), help='Process one kind of image only.')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Also process rows that already have variants, e.g. after changing IMAGE_VARIANT_WIDTHS.',
+        )
+
+    def handle(self, *args, **options):
+        targets = [options['only']] if options['only'] else sorted(TARGETS)
+        in_flight = set()
+        submitted = failed = 0
+        limit = settings.IMAGE_PIPELINE_WORKERS * 4
+
+        def drain(block_until):
+            nonlocal in_flight, failed
+            while len(in_flight) > block_until:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                failed += sum(1 for future in done if future.exception() is not None)
+
+        for target in targets:
+            model, field_name, variants_field = TARGETS[target]
+            rows = (
+                model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .order_by('pk')
+                .values_list('pk', field_name, variants_field)
+            )
+            for pk, name, variants in rows.iterator(chunk_size=1000):
+                if not options['force'] and (variants or {}).get('source') == name:
+                    continue
+                drain(limit - 1)
+                in_flight.add(image_pipeline.submit(model, pk, field_name, variants_field))
+                submitted += 1
+        drain(0)
+
+        self.stdout.write(self.style.SUCCESS(f'Built variants for {submitted - failed} images ({failed} failed).'))
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.exports import EXPORT_FORMATS, ORDER_EXPORT_FIELDS, ExportFilterError, order_export_queryset, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream every order as NDJSON or CSV without loading the table into memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='output', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--status', help='Comma-separated list of statuses to include.')
+        parser.add_argument('--created-after', help='ISO date or datetime (inclusive).')
+        parser.add_argument('--created-before', help='ISO date or datetime (inclusive).')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('-o', '--output-file', help='Write to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            queryset = order_export_queryset(
+                created_after=options['created_after'],
+                created_before=options['created_before'],
+                status=options['status'],
+            )
+        except ExportFilterError as e:
+            raise CommandError(str(e))
+
+        chunks = iter_export(options['output'], queryset, ORDER_EXPORT_FIELDS, options['chunk_size'])
+        if options['output_file']:
+            with open(options['output_file'], 'w', encoding='utf-8', newline='') as stream:
+                stream.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,22 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from users.exports import EXPORT_FORMATS, PRODUCT_EXPORT_FIELDS, product_export_queryset, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream every product as NDJSON or CSV without loading the table into memory; import_products reads it back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='output', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('-o', '--output-file', help='Write to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        chunks = iter_export(options['output'], product_export_queryset(), PRODUCT_EXPORT_FIELDS, options['chunk_size'])
+        if options['output_file']:
+            with open(options['output_file'], 'w', encoding='utf-8', newline='') as stream:
+                stream.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.imports import IMPORT_FORMATS, import_products
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert products from a CSV or NDJSON file (as written by export_products) in batches, reading it as it goes. '
+        'Rows with an id update that product; the others are inserted. Invalid rows are reported and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The file to import, or - for stdin.')
+        parser.add_argument('--format', dest='input', choices=IMPORT_FORMATS, help='Default: from the file extension.')
+        parser.add_argument('--user', required=True, help='Username owning rows that have no user_id.')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        input_format = options['input'] or os.path.splitext(options['path'])[1].lstrip('.')
+        if input_format not in IMPORT_FORMATS:
+            raise CommandError(f'Cannot tell the format of {options["path"]}; pass --format.')
+        user_id = User.objects.filter(username=options['user']).values_list('id', flat=True).first()
+        if user_id is None:
+            raise CommandError(f'No user named {options["user"]!r}.')
+
+        if options['path'] == '-':
+            summary = import_products(sys.stdin, input_format, user_id, options['batch_size'])
+        else:
+            with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+                summary = import_products(lines, input_format, user_id, options['batch_size'])
+
+        for error in summary.errors:
+            self.stderr.write(json.dumps(error))
+        if summary.invalid > len(summary.errors):
+            self.stderr.write(f'... and {summary.invalid - len(summary.errors)} more invalid rows.')
+        self.stdout.write(self.style.SUCCESS(
+            f'{summary.rows} rows: {summary.created} products created, {summary.updated} updated, '
+            f'{summary.invalid} invalid.'
+        ))
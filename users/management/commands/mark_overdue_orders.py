@@ -0,0 +1,32 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.statuses import mark_overdue_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Move to-do and doing orders older than ORDER_OVERDUE_AFTER to "lated" in batched UPDATEs. '
+        'Run it from cron, or with --every to keep it running as its own process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overdue-after', type=float, default=None, metavar='HOURS',
+                            help='Age in hours after which an order is overdue (default: ORDER_OVERDUE_AFTER).')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--every', type=float, default=None, metavar='SECONDS',
+                            help='Repeat forever, sleeping this long between runs.')
+
+    def handle(self, *args, **options):
+        overdue_after = timedelta(hours=options['overdue_after']) if options['overdue_after'] else None
+        while True:
+            moved = mark_overdue_orders(overdue_after=overdue_after, batch_size=options['batch_size'])
+            summary = ', '.join(f'{count} {status}' for status, count in moved.items())
+            self.stdout.write(self.style.SUCCESS(f'Marked {sum(moved.values())} orders as late ({summary}).'))
+            if not options['every']:
+                return
+            close_old_connections()
+            time.sleep(options['every'])
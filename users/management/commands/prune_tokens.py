@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted refresh tokens in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        last_id = 0
+        outstanding = blacklisted = 0
+        # Walk the primary key instead of filtering on the unindexed expires_at,
+        # so every batch is a short range scan and no lock is held for long.
+        while True:
+            batch = list(
+                OutstandingToken.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'expires_at')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            expired = [token_id for token_id, expires_at in batch if expires_at <= now]
+            if not expired:
+                continue
+            if options['dry_run']:
+                outstanding += len(expired)
+                blacklisted += BlacklistedToken.objects.filter(token_id__in=expired).count()
+                continue
+            with transaction.atomic():
+                blacklisted += BlacklistedToken.objects.filter(token_id__in=expired).delete()[0]
+                outstanding += OutstandingToken.objects.filter(id__in=expired).delete()[0]
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {outstanding} outstanding and {blacklisted} blacklisted expired tokens.'
+        ))
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete tombstones older than SYNC_TOMBSTONE_TTL in small batches; sync tokens that old are refused anyway.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        expired = Tombstone.objects.filter(deleted_at__lt=timezone.now() - settings.SYNC_TOMBSTONE_TTL)
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Would delete {expired.count()} tombstones.'))
+            return
+        deleted = 0
+        # Oldest first along the deleted_at index, one short write transaction per batch.
+        while True:
+            with transaction.atomic():
+                count = Tombstone.objects.filter(
+                    pk__in=expired.order_by('deleted_at').values('pk')[:options['batch_size']]
+                ).delete()[0]
+            deleted += count
+            if count < options['batch_size']:
+                break
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.sales import rebuild_product_sales
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-product sales summary behind /top-products/ from the orders table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_product_sales(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales summary for {count} products.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.statuses import rebuild_status_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-status order counters behind /orders/status-counts/ from the orders table.'
+
+    def handle(self, *args, **options):
+        totals = rebuild_status_counts()
+        self.stdout.write(self.style.SUCCESS(f'Recounted {sum(totals.values())} orders.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily per-user order rollups behind /chart/ from the orders table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_user_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily rollup rows.'))
@@ -0,0 +1,19 @@
+"""Gauges and counters of the users app for /metrics (registered in UsersConfig.ready)."""
+from users.authentication import user_cache
+from users.tokens import revocation_index
+
+
+def collect():
+    stats = user_cache.stats()
+    yield 'auth_user_cache_lookups_total', 'counter', 'User lookups by CachedJWTAuthentication, by outcome.', [
+        ({'result': result}, stats[result]) for result in ('local_hits', 'misses')
+    ]
+    yield 'auth_user_cache_invalidations_total', 'counter', 'User cache entries dropped after a User write.', [
+        ({}, stats['invalidations']),
+    ]
+    yield 'auth_user_cache_local_size', 'gauge', 'Users held in the per-process LRU.', [
+        ({}, stats['local_size']),
+    ]
+    yield 'token_revocation_database_checks_total', 'counter', 'Blacklist lookups the revocation filter could not answer alone.', [
+        ({}, revocation_index.database_checks),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_product_sales(apps, schema_editor):
+    Order = apps.get_model('users', 'Order')
+    ProductSales = apps.get_model('users', 'ProductSales')
+    totals = Order.objects.values('product_id').annotate(total=Sum('amount')).order_by('product_id')
+    ProductSales.objects.bulk_create(
+        [ProductSales(product_id=row['product_id'], total_sold=row['total'] or 0) for row in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_order_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='users.product')),
+                ('total_sold', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['total_sold', 'product'], name='product_sales_total_idx')],
+            },
+        ),
+        migrations.RunPython(fill_product_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_user_daily_stats(apps, schema_editor):
+    Order = apps.get_model('users', 'Order')
+    UserDailyStats = apps.get_model('users', 'UserDailyStats')
+    rows = (
+        Order.objects.annotate(day=TruncDate('created_at'))
+        .values('user_id', 'day')
+        .annotate(orders=Count('id'), revenue=Sum('price'))
+        .order_by('user_id', 'day')
+    )
+    UserDailyStats.objects.bulk_create(
+        [UserDailyStats(user_id=row['user_id'], day=row['day'], orders=row['orders'], revenue=row['revenue'] or 0)
+         for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_productsales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='user_daily_stats_user_day_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_user_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_userdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='user_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:59
+
+import django.db.models.deletion
+import users.models
+from django.db import migrations, models
+
+# External-content FTS5 table over users_product(name, description), kept in sync
+# by triggers. Name matches weigh ten times description matches in the rank (bm25).
+CREATE_SEARCH_INDEX = (
+    """
+    CREATE VIRTUAL TABLE users_product_fts USING fts5(
+        name, description,
+        content='users_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    "INSERT INTO users_product_fts(users_product_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """
+    CREATE TRIGGER users_product_fts_insert AFTER INSERT ON users_product BEGIN
+        INSERT INTO users_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER users_product_fts_delete AFTER DELETE ON users_product BEGIN
+        INSERT INTO users_product_fts(users_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER users_product_fts_update AFTER UPDATE OF name, description ON users_product BEGIN
+        INSERT INTO users_product_fts(users_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO users_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO users_product_fts(users_product_fts) VALUES ('rebuild')",
+)
+
+DROP_SEARCH_INDEX = (
+    'DROP TRIGGER IF EXISTS users_product_fts_insert',
+    'DROP TRIGGER IF EXISTS users_product_fts_delete',
+    'DROP TRIGGER IF EXISTS users_product_fts_update',
+    'DROP TABLE IF EXISTS users_product_fts',
+)
+
+
+def run_on_sqlite(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchIndex',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='users.product')),
+                ('name', models.TextField()),
+                ('description', models.TextField()),
+                ('document', users.models.SearchDocumentField(db_column='users_product_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'users_product_fts',
+                'managed': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['discount', 'id'], name='product_discount_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='product_created_at_id_idx'),
+        ),
+        migrations.RunPython(run_on_sqlite(CREATE_SEARCH_INDEX), run_on_sqlite(DROP_SEARCH_INDEX)),
+    ]
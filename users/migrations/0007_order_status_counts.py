@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+STATUSES = ('to do', 'doing', 'done', 'lated')
+
+
+def fill_status_counts(apps, schema_editor):
+    Order = apps.get_model('users', 'Order')
+    OrderStatusCount = apps.get_model('users', 'OrderStatusCount')
+    totals = dict(Order.objects.values('status').annotate(total=Count('id')).order_by().values_list('status', 'total'))
+    OrderStatusCount.objects.bulk_create(
+        [OrderStatusCount(status=status, count=totals.get(status, 0)) for status in STATUSES]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusCount',
+            fields=[
+                ('status', models.CharField(choices=[('to do', 'To Do'), ('doing', 'Doing'), ('done', 'Done'), ('lated', 'Lated')], max_length=10, primary_key=True, serialize=False)),
+                ('count', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='order_status_created_at_idx'),
+        ),
+        migrations.RunPython(fill_status_counts, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,7 @@
-import uuid
-from random import random, randint
-
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction, IntegrityError
+
+from users.ids import order_ids, ID_ATTEMPTS
 
 # Create your models here.
 
@@ -12,14 +11,11 @@ class User(AbstractUser):
         Manager = 'manager', 'Manager'
 
     user_image = models.ImageField(upload_to='users/photos/', blank=True, null=True)
+    user_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.CharField(max_length=355, blank=True, null=True)
     role = models.CharField(max_length=25, choices=UserTypes.choices, default=UserTypes.User)
     statistics = models.TextField(blank=True)
 
-    def save(self, *args, **kwargs):
-        self.statistics = [randint(200, 700) for _ in range(7)]
-        super().save(*args, **kwargs)
-
 
 class Product(models.Model):
     name = models.CharField(max_length=100)
@@ -29,13 +25,58 @@ class Product(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     description = models.TextField()
     image = models.ImageField(upload_to='products/image/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     discount = models.IntegerField()
     gift = models.BooleanField(default=False)
     delivery = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['discount', 'id'], name='product_discount_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='product_created_at_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='product_updated_at_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+
+class FullTextMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+class SearchDocumentField(models.TextField):
+    """The hidden column an FTS5 table has under its own name; `__match` runs a full-text query."""
+
+
+SearchDocumentField.register_lookup(FullTextMatch)
+
+
+class ProductSearchIndex(models.Model):
+    """
+    The FTS5 table over Product.name and description, created in migration 0006.
+
+    It stores no copy of the text (external content) and is kept in sync by SQLite
+    triggers on users_product, so it is only ever read through the ORM.
+    """
+    product = models.OneToOneField(
+        Product, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING, related_name='search_index'
+    )
+    name = models.TextField()
+    description = models.TextField()
+    document = SearchDocumentField(db_column='users_product_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'users_product_fts'
+
 class Order(models.Model):
     class OrderTypes(models.TextChoices):
         TODO = 'to do', 'To Do'
@@ -48,16 +89,121 @@ class Order(models.Model):
     amount = models.IntegerField()
     status = models.CharField(max_length=10, choices=OrderTypes.choices, default=OrderTypes.TODO)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     price = models.IntegerField(blank=True)
     customer_id = models.CharField(unique=True, blank=True, max_length=15)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_at_id_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_at_idx'),
+            models.Index(fields=['updated_at', 'id'], name='order_updated_at_id_idx'),
+        ]
+
+    TRACKED_FIELDS = ('product_id', 'user_id', 'amount', 'price', 'status', 'created_at')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so signal handlers can work out deltas on update.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
         price = self.product.price
-        self.price = price * self.amount
-        if not self.customer_id:
-            self.customer_id = str(uuid.uuid4())[:15]
-        # super().save(*args, **kwargs)
-        super().save(*args, **kwargs)
+        self.price = int(price * self.amount)
+        self._fetch_stored_values()
+        if self.customer_id:
+            # super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
+        else:
+            self._save_with_new_customer_id(*args, **kwargs)
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {name: getattr(self, name) for name in self.TRACKED_FIELDS if name not in deferred}
+
+    def _fetch_stored_values(self):
+        # An instance built by hand or loaded with only() lacks some of the values the
+        # signal handlers diff against; read them from its row, which is one indexed lookup.
+        loaded = getattr(self, '_loaded_values', {})
+        missing = [name for name in self.TRACKED_FIELDS if name not in loaded]
+        if self.pk is None or not missing:
+            return
+        stored = Order.objects.filter(pk=self.pk).values(*missing).first()
+        if stored is not None:
+            self._loaded_values = {**stored, **loaded}
+
+    def _save_with_new_customer_id(self, *args, **kwargs):
+        for attempt in range(ID_ATTEMPTS):
+            self.customer_id = self.new_customer_id()
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = Order.objects.filter(customer_id=self.customer_id).exists()
+                if not taken or attempt == ID_ATTEMPTS - 1:
+                    raise
+
+    @staticmethod
+    def new_customer_id():
+        return order_ids.new()
+
+    def __str__(self):
+        return f'{self.product.name}: {self.user}'
+
+
+class ProductSales(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='sales')
+    total_sold = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['total_sold', 'product'], name='product_sales_total_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {self.total_sold}'
+
+
+class UserDailyStats(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    orders = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='user_daily_stats_user_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.day}: {self.orders}'
+
+
+class OrderStatusCount(models.Model):
+    status = models.CharField(max_length=10, choices=Order.OrderTypes.choices, primary_key=True)
+    count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.status}: {self.count}'
+
+
+class Tombstone(models.Model):
+    """A deleted product or order, kept for SYNC_TOMBSTONE_TTL so delta sync can report the deletion."""
+    class Models(models.TextChoices):
+        Product = 'product', 'Product'
+        Order = 'order', 'Order'
+
+    model = models.CharField(max_length=10, choices=Models.choices)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'deleted_at', 'id'], name='tombstone_model_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
 
     def __str__(self):
-        return f'{self.product.name}: {self.user}'
\ No newline at end of file
+        return f'{self.model} {self.object_id}'
@@ -0,0 +1,116 @@
+"""
+The OpenAPI schema as a static file, generated once by collectstatic.
+
+Generating the schema imports all of drf_spectacular and introspects every view
+and serializer. SchemaFinder hands the generated schema to collectstatic as
+SCHEMA_STATIC_PATH plus a content-hashed copy. Whitenoise serves the hashed copy
+with a far-future cache header, and /schema/ redirects to it. /schema/ only
+generates the schema itself when none was collected.
+
+Views are annotated with the extend_schema() below. It records the annotations,
+and users.schema.SchemaGenerator applies drf_spectacular's decorator right before
+generating, so serving a request never imports the schema machinery.
+"""
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.files.storage import FileSystemStorage
+from django.http import HttpResponseRedirect
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+_annotations = []
+_annotations_lock = threading.Lock()
+
+
+def extend_schema(*args, **kwargs):
+    """drf_spectacular's extend_schema, applied when a schema is generated instead of at import."""
+    def decorator(target):
+        with _annotations_lock:
+            _annotations.append((target, args, kwargs))
+        return target
+    return decorator
+
+
+def apply_schema_annotations():
+    # In source order: method annotations come before their class's, as with the eager decorator.
+    from drf_spectacular.utils import extend_schema as spectacular_extend_schema
+
+    with _annotations_lock:
+        while _annotations:
+            target, args, kwargs = _annotations.pop(0)
+            spectacular_extend_schema(*args, **kwargs)(target)
+
+
+def generate_schema():
+    from drf_spectacular.renderers import OpenApiJsonRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    schema = spectacular_settings.DEFAULT_GENERATOR_CLASS().get_schema(request=None, public=True)
+    return OpenApiJsonRenderer().render(schema, renderer_context={})
+
+
+def hashed_name(name, content):
+    root, ext = os.path.splitext(name)
+    return f'{root}.{hashlib.md5(content).hexdigest()[:12]}{ext}'
+
+
+class SchemaFinder(BaseFinder):
+    """Gives collectstatic the generated schema; there is nothing to find before that."""
+
+    def check(self, **kwargs):
+        return []
+
+    def find(self, path, all=False):
+        return []
+
+    def list(self, ignore_patterns):
+        content = generate_schema()
+        with tempfile.TemporaryDirectory(prefix='openapi-') as directory:
+            storage = FileSystemStorage(location=directory)
+            for name in (settings.SCHEMA_STATIC_PATH, hashed_name(settings.SCHEMA_STATIC_PATH, content)):
+                path = storage.path(name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as file:
+                    file.write(content)
+                yield name, storage
+
+
+@functools.cache
+def collected_schema_url():
+    """URL of the hashed schema in STATIC_ROOT, or None if collectstatic has not written one."""
+    try:
+        with open(os.path.join(settings.STATIC_ROOT, settings.SCHEMA_STATIC_PATH), 'rb') as file:
+            content = file.read()
+    except FileNotFoundError:
+        return None
+    return urljoin(settings.STATIC_URL, hashed_name(settings.SCHEMA_STATIC_PATH, content))
+
+
+def lazy_view(import_path, **initkwargs):
+    """A view that imports its class on the first request instead of with the URLconf."""
+    @functools.cache
+    def load():
+        return import_string(import_path).as_view(**initkwargs)
+
+    @csrf_exempt
+    def view(request, *args, **kwargs):
+        return load()(request, *args, **kwargs)
+    return view
+
+
+generated_schema_view = lazy_view('drf_spectacular.views.SpectacularAPIView')
+
+
+@csrf_exempt
+def schema_view(request, *args, **kwargs):
+    url = collected_schema_url()
+    if url is not None:
+        return HttpResponseRedirect(url)
+    return generated_schema_view(request, *args, **kwargs)
@@ -0,0 +1,157 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a fixed, unique ordering such as ("-created_at", "-id").
+
+    The cursor stores the ordering values of the last row on the page, so every
+    page is a single range scan on the matching index, however deep the client
+    has paged. All ordering fields must share the same direction.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = None
+    max_page_size = None
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering=None, page_size=None, max_page_size=None):
+        self.page_size = page_size or self.page_size or settings.KEYSET_PAGE_SIZE
+        self.max_page_size = max_page_size or self.max_page_size or settings.KEYSET_MAX_PAGE_SIZE
+        self.set_ordering(ordering or self.ordering)
+
+    def set_ordering(self, ordering):
+        self.ordering = tuple(ordering)
+        self.descending = self.ordering[0].startswith('-')
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_page_queryset(self, queryset, request):
+        """Return the lazily sliced queryset for the requested page (one extra row to detect the next page)."""
+        self.request = request
+        self.limit = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        if queryset._fields:
+            # values_list(named=True) rows: the cursor is read off the last row, so it needs the ordering columns.
+            missing = [name for name in self.fields if name not in queryset._fields]
+            if missing:
+                # values_list() hides the annotations it did not select (e.g. a search rank); select them again.
+                hidden = {name: F(name) for name in missing if name in queryset.query.annotations}
+                queryset = queryset.annotate(**hidden).values_list(*queryset._fields, *missing, named=True)
+        position = self.decode_cursor(queryset.model, request.query_params.get(self.cursor_query_param))
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position))
+        return queryset[:self.limit + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.set_view_ordering(request, view)
+        return self.finish_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.set_view_ordering(request, view)
+        return self.finish_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def set_view_ordering(self, request, view):
+        # Views whose ordering depends on the request (e.g. ?ordering=) provide it through get_keyset_ordering().
+        if view is not None and hasattr(view, 'get_keyset_ordering'):
+            self.set_ordering(view.get_keyset_ordering(request))
+
+    def finish_page(self, rows):
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.next_position = self.row_position(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['next', 'results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': self.cursor_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'integer'}},
+        ]
+
+    def position_filter(self, position):
+        lookup = 'lt' if self.descending else 'gt'
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            for previous, value in zip(self.fields[:index], position):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def row_position(self, row):
+        if isinstance(row, dict):
+            return [row[name] for name in self.fields]
+        return [getattr(row, name) for name in self.fields]
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if isinstance(value, (date, datetime)) else
+                  str(value) if isinstance(value, Decimal) else value
+                  for value in position]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, model, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [self.to_python(model, name, value) for name, value in zip(self.fields, values)]
+        except (ValueError, TypeError, DjangoValidationError):
+            raise NotFound('Invalid cursor.')
+
+    @staticmethod
+    def to_python(model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a search rank) travel as plain JSON values.
+            return value
+        return field.to_python(value)
@@ -0,0 +1,44 @@
+import orjson
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+# orjson writes datetimes with full microseconds; hand them, like every type it
+# does not know (Decimal, lazy strings, ...), to DRF's encoder instead.
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer with the same compact output, produced by orjson.
+
+    Strings, integers, booleans and containers come out byte for byte as
+    JSONRenderer writes them. Floats in exponent form are spelled differently
+    (1e16 rather than 1e+16), and NaN becomes null instead of an error, so use
+    it for payloads made of the types above. Indented output, and settings
+    this renderer does not reproduce, go through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.ensure_ascii or not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        # Same as JSONRenderer: keep the output a strict JavaScript subset.
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets EventSource clients (Accept: text/event-stream) through content negotiation.
+    The stream itself is a StreamingHttpResponse; this only renders errors, as an "error" event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b'event: error\ndata: ' + ORJSONRenderer().render(data) + b'\n\n'
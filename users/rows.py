@@ -0,0 +1,150 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, relations, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation() returns a value read from the database unchanged.
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.SlugField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.ReadOnlyField,
+)
+
+
+def file_url(field):
+    """The FileField/ImageField representation, computed from the stored name without building a FieldFile."""
+    storage = field.parent.Meta.model._meta.get_field(field.source).storage
+    request = field.context.get('request')
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return lambda name: name or None
+    if request is None:
+        return lambda name: storage.url(name) if name else None
+    return lambda name: request.build_absolute_uri(storage.url(name)) if name else None
+
+
+def iso_datetime(field):
+    """DateTimeField.to_representation with the field's timezone looked up once instead of per row."""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or zone is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        text = value.astimezone(zone).isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+def compile_field(field):
+    """Return (lookup, converter) for a readable serializer field; converter None means pass the value through."""
+    if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField, relations.ManyRelatedField)) \
+            or field.source == '*':
+        raise ImproperlyConfigured(
+            f'{type(field).__name__} {field.field_name!r} cannot be read from values(); use the serializer instead.'
+        )
+    lookup = field.source.replace('.', '__')
+    if type(field) in PASSTHROUGH_FIELDS or (type(field) is serializers.JSONField and not field.binary):
+        return lookup, None
+    if type(field) is relations.PrimaryKeyRelatedField:
+        # values() already holds the related id.
+        return lookup, field.pk_field.to_representation if field.pk_field else None
+    if isinstance(field, serializers.FileField):
+        return lookup, file_url(field)
+    if type(field) is serializers.DateTimeField:
+        return lookup, iso_datetime(field)
+    return lookup, field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path for a ModelSerializer's output.
+
+    Rows are read with values_list(), so no model instances are built, and each
+    column goes through a converter compiled once from the serializer's own
+    fields: plain columns are passed through, the rest reuse the field's
+    to_representation(). The result matches `serializer_class(rows, many=True).data`
+    key for key. `converters` replaces the representation of individual fields,
+    and `fields` picks and orders the output keys.
+    """
+
+    def __init__(self, serializer_class, context=None, fields=None, converters=None):
+        serializer = serializer_class(context=context or {})
+        readable = {field.field_name: field for field in serializer._readable_fields}
+        unknown = [name for name in fields or () if name not in readable]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(readable)}.")
+        converters = converters or {}
+        self.names = tuple(fields or readable)
+        self.lookups = []
+        self.converters = []
+        for index, name in enumerate(self.names):
+            lookup, convert = compile_field(readable[name])
+            self.lookups.append(lookup)
+            if name in converters:
+                convert = converters[name]
+            if convert is not None:
+                self.converters.append((index, convert))
+
+    def rows(self, queryset):
+        """The queryset as named tuples holding just the columns the output needs."""
+        return queryset.values_list(*self.lookups, named=True)
+
+    def serialize(self, rows):
+        names, converters = self.names, self.converters
+        count = len(names)
+        data = []
+        for row in rows:
+            values = list(row[:count])
+            for index, convert in converters:
+                value = values[index]
+                if value is not None:
+                    values[index] = convert(value)
+            data.append(dict(zip(names, values)))
+        return data
+
+
+class ValuesListMixin:
+    """
+    list() for generic views through a ValuesSerializer built from get_serializer_class().
+
+    With `fields_query_param` set, clients can ask for a subset of the fields
+    (e.g. ?fields=id,username); only those columns are selected.
+    """
+
+    values_fields = None
+    values_converters = None
+    fields_query_param = None
+
+    def get_values_fields(self):
+        if self.fields_query_param is None:
+            return self.values_fields
+        requested = self.request.query_params.get(self.fields_query_param, '')
+        # Each column once, in the order first asked for: values_list() refuses duplicate names.
+        names = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+        return names or self.values_fields
+
+    def get_values_serializer(self):
+        try:
+            return ValuesSerializer(
+                self.get_serializer_class(),
+                context=self.get_serializer_context(),
+                fields=self.get_values_fields(),
+                converters=self.values_converters,
+            )
+        except ValueError as e:
+            raise ValidationError({self.fields_query_param or 'fields': str(e)})
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        rows = serializer.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(rows))
@@ -0,0 +1,135 @@
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Sum
+
+from users.counters import increment_many
+from users.models import Order, ProductSales
+from users.serializers import TopProductSerializer
+
+TOP_PRODUCTS_CACHE_KEY = 'top-products:{}'
+TOP_PRODUCTS_VERSION_KEY = 'top-products:version'
+
+
+def order_sales_deltas(orders, sign=1):
+    """Sum order amounts per product, e.g. for a batch of freshly inserted orders."""
+    deltas = Counter()
+    for order in orders:
+        deltas[order.product_id] += sign * order.amount
+    return deltas
+
+
+def apply_sales_deltas(deltas):
+    """Add per-product amounts to the summary table and drop the cached ranking once the transaction commits."""
+    changed = increment_many(
+        ProductSales, ('product_id',), {(product_id,): {'total_sold': delta} for product_id, delta in deltas.items()}
+    )
+    if changed:
+        transaction.on_commit(invalidate_top_products)
+
+
+def record_orders_created(orders):
+    apply_sales_deltas(order_sales_deltas(orders))
+
+
+def record_order_updated(order, previous):
+    if 'product_id' not in previous or 'amount' not in previous:
+        recompute_product_sales({order.product_id, previous.get('product_id', order.product_id)})
+        return
+    deltas = order_sales_deltas([order])
+    deltas[previous['product_id']] -= previous['amount']
+    apply_sales_deltas(deltas)
+
+
+def record_orders_deleted(orders):
+    apply_sales_deltas(order_sales_deltas(orders, sign=-1))
+
+
+def recompute_product_sales(product_ids):
+    """Recompute the summary for a few products from their orders (used when the previous values are unknown)."""
+    totals = dict(
+        Order.objects.filter(product_id__in=product_ids)
+        .values('product_id')
+        .annotate(total=Sum('amount'))
+        .values_list('product_id', 'total')
+    )
+    for product_id in product_ids:
+        ProductSales.objects.update_or_create(
+            product_id=product_id, defaults={'total_sold': totals.get(product_id) or 0}
+        )
+    transaction.on_commit(invalidate_top_products)
+
+
+def rebuild_product_sales(batch_size=1000):
+    """Throw the summary away and rebuild it with one aggregate over all orders."""
+    totals = (
+        Order.objects.values('product_id')
+        .annotate(total=Sum('amount'))
+        .order_by('product_id')
+        .values_list('product_id', 'total')
+    )
+    with transaction.atomic():
+        ProductSales.objects.all().delete()
+        rows = [ProductSales(product_id=product_id, total_sold=total or 0) for product_id, total in totals]
+        ProductSales.objects.bulk_create(rows, batch_size=batch_size)
+        transaction.on_commit(invalidate_top_products)
+    return len(rows)
+
+
+def _rankings():
+    return caches[settings.TOP_PRODUCTS_CACHE_ALIAS]
+
+
+def ranking_key():
+    """
+    The ranking is stored under the current version, which every worker reads from
+    the shared cache, so an invalidation in one process reaches all of them. A
+    ranking built from rows read before an invalidation lands under the old version.
+    """
+    version = _rankings().get(TOP_PRODUCTS_VERSION_KEY)
+    if version is None:
+        _rankings().add(TOP_PRODUCTS_VERSION_KEY, uuid.uuid4().hex, None)
+        version = _rankings().get(TOP_PRODUCTS_VERSION_KEY)
+    return TOP_PRODUCTS_CACHE_KEY.format(version)
+
+
+def invalidate_top_products():
+    _rankings().set(TOP_PRODUCTS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def top_products(limit):
+    """Return the `limit` best selling products from a cached ranking of TOP_PRODUCTS_CACHE_SIZE rows."""
+    key = ranking_key()
+    ranking = _rankings().get(key)
+    if ranking is None:
+        ranking = build_ranking(key, list(ranking_queryset()))
+    return ranking[:limit]
+
+
+async def atop_products(limit):
+    key = ranking_key()
+    ranking = await _rankings().aget(key)
+    if ranking is None:
+        ranking = build_ranking(key, [row async for row in ranking_queryset()])
+    return ranking[:limit]
+
+
+def ranking_queryset():
+    return (
+        ProductSales.objects.select_related('product')
+        .order_by('-total_sold', '-product_id')[:settings.TOP_PRODUCTS_CACHE_SIZE]
+    )
+
+
+def build_ranking(key, rows):
+    products = []
+    for row in rows:
+        product = row.product
+        product.total_sold = row.total_sold
+        products.append(product)
+    ranking = [dict(item) for item in TopProductSerializer(products, many=True).data]
+    _rankings().set(key, ranking, settings.TOP_PRODUCTS_CACHE_TIMEOUT)
+    return ranking
@@ -0,0 +1,31 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from django.urls import get_resolver
+from drf_spectacular.generators import SchemaGenerator as SpectacularSchemaGenerator
+
+from users.openapi import apply_schema_annotations
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = 'users.authentication.CachedJWTAuthentication'
+
+
+class SchemaGenerator(SpectacularSchemaGenerator):
+    """
+    Applies the views' deferred extend_schema() annotations first. Importing this
+    module (DEFAULT_GENERATOR_CLASS) also registers CachedJWTScheme.
+
+    Without explicit patterns or a urlconf it documents the DRF views, which the
+    async views (settings.ASYNC_VIEWS) mirror, so both profiles collect the same schema.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if kwargs.get('patterns') is None and kwargs.get('urlconf') is None:
+            from users.urls import build_urlpatterns
+
+            kwargs['patterns'] = build_urlpatterns(async_views=False)
+        super().__init__(*args, **kwargs)
+
+    def get_schema(self, request=None, public=False):
+        get_resolver(self.urlconf).url_patterns  # imports the views, which records their annotations
+        apply_schema_annotations()
+        return super().get_schema(request=request, public=public)
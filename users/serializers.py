@@ -1,14 +1,44 @@
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 
 from users.models import User, Order, Product
+from users.rows import ValuesSerializer
+from users.tokens import IndexedRefreshToken
+
+
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Variant names recorded by users.images, as URLs keyed by format and width; empty until they are built."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        storage = self.parent.Meta.model._meta.get_field(self.image_field).storage
+        request = self.context.get('request')
+        urls = {}
+        for output, names in (variants or {}).items():
+            if output == 'source':
+                continue
+            urls[output] = {
+                width: request.build_absolute_uri(storage.url(name)) if request else storage.url(name)
+                for width, name in names.items()
+            }
+        return urls
 
 
 class UsersSerializer(serializers.ModelSerializer):
+    user_image_variants = ImageVariantsField('user_image')
+
     class Meta:
         model = User
-        fields = ("id","username", "email", "bio", "role", "user_image")
+        fields = ("id","username", "email", "bio", "role", "user_image", "user_image_variants")
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -38,17 +68,22 @@ class RefreshTokenSerializer(serializers.Serializer):
     def validate(self, attrs):
         refresh_token = attrs.get("refresh")
         try:
-            token = RefreshToken(refresh_token)
+            token = IndexedRefreshToken(refresh_token)
             attrs["access"] = str(token.access_token)
-        except Exception as e:
+            if api_settings.ROTATE_REFRESH_TOKENS:
+                token.rotate()
+                attrs["refresh"] = str(token)
+        except TokenError as e:
             raise serializers.ValidationError("Invalid refresh token.")
         return attrs
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
+    user_image_variants = ImageVariantsField('user_image')
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'bio', 'user_image', 'statistics']
+        fields = ['id', 'username', 'email', 'bio', 'user_image', 'user_image_variants']
 
 class UserProfileUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -107,6 +142,16 @@ class RecentOrdersSerializer(serializers.ModelSerializer):
         model = Order
         fields = ('created_at', 'price', 'username', 'product_name')
 
+
+def recent_orders_values_serializer():
+    """RecentOrdersSerializer read through values(), in the shape /recent-orders/ returns: created_at as a date."""
+    return ValuesSerializer(
+        RecentOrdersSerializer,
+        fields=('product_name', 'price', 'username', 'created_at'),
+        # Listed by day: the date of created_at in the current timezone.
+        converters={'created_at': lambda value: timezone.localtime(value).date().isoformat()},
+    )
+
 class TopProductSerializer(serializers.ModelSerializer):
     total_sold = serializers.IntegerField()
 
@@ -117,6 +162,8 @@ class TopProductSerializer(serializers.ModelSerializer):
 
 
 class ProductsSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField('image')
+
     class Meta:
         model = Product
         fields = '__all__'
\ No newline at end of file
@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from users import events, sales, stats, statuses, sync
+from users.authentication import user_cache
+from users.caching import bump_catalog, bump_products
+from users.images import schedule_variants
+from users.models import Order, Product, User
+
+# Sent after orders were inserted with bulk_create(), which skips post_save.
+orders_bulk_created = Signal()  # providing_args: orders
+
+# Sent after products were upserted with bulk_create(update_conflicts=True), which skips post_save.
+products_bulk_upserted = Signal()  # providing_args: products, updated (the ids that existed before)
+
+# Sent from an image pipeline worker once variants were stored with a queryset update().
+image_variants_ready = Signal()  # providing_args: pk, variants
+
+ORDER_ROLLUPS = (sales, stats, statuses, events)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    for rollup in ORDER_ROLLUPS:
+        if created:
+            rollup.record_orders_created([instance])
+        else:
+            rollup.record_order_updated(instance, getattr(instance, '_loaded_values', {}))
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    for rollup in ORDER_ROLLUPS:
+        rollup.record_orders_deleted([instance])
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Product)
+def leave_tombstone(sender, instance, **kwargs):
+    # Also sent for the rows a user or product deletion cascades to.
+    sync.record_deleted(sender, [instance.pk])
+
+
+@receiver(orders_bulk_created)
+def orders_inserted(sender, orders, **kwargs):
+    for rollup in ORDER_ROLLUPS:
+        rollup.record_orders_created(orders)
+
+
+@receiver(post_save, sender=User)
+def user_image_saved(sender, instance, **kwargs):
+    schedule_variants(instance, 'user_image', 'user_image_variants')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Drop the entry now and again after commit, so a request racing the
+    # transaction cannot put the old row back into the cache.
+    user_cache.invalidate(instance.pk)
+    transaction.on_commit(lambda: user_cache.invalidate(instance.pk))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    bump_catalog(instance.pk)
+    # The cached top-products ranking holds product names and prices.
+    transaction.on_commit(sales.invalidate_top_products)
+
+
+@receiver(products_bulk_upserted)
+def products_upserted(sender, products, updated, **kwargs):
+    bump_products(updated)
+    if updated:
+        transaction.on_commit(sales.invalidate_top_products)
+
+
+@receiver(post_save, sender=Product)
+def product_image_saved(sender, instance, **kwargs):
+    schedule_variants(instance, 'image', 'image_variants')
+
+
+@receiver(image_variants_ready, sender=User)
+def user_variants_ready(sender, pk, **kwargs):
+    user_cache.invalidate(pk)
+
+
+@receiver(image_variants_ready, sender=Product)
+def product_variants_ready(sender, pk, **kwargs):
+    # The variants were stored with update(), which leaves updated_at alone; delta sync has to see them.
+    Product.objects.filter(pk=pk).update(updated_at=timezone.now())
+    bump_catalog(pk)
@@ -0,0 +1,103 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from users.counters import increment_many
+from users.models import Order, UserDailyStats
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def order_stats_deltas(orders, sign=1):
+    """Group order count and revenue per (user, day)."""
+    deltas = defaultdict(lambda: [0, 0])
+    for order in orders:
+        delta = deltas[order.user_id, order_day(order)]
+        delta[0] += sign
+        delta[1] += sign * order.price
+    return deltas
+
+
+def apply_stats_deltas(deltas):
+    increment_many(UserDailyStats, ('user_id', 'day'), {
+        key: {'orders': orders, 'revenue': revenue} for key, (orders, revenue) in deltas.items()
+    })
+
+
+def record_orders_created(orders):
+    apply_stats_deltas(order_stats_deltas(orders))
+
+
+def record_order_updated(order, previous):
+    if not {'user_id', 'created_at', 'price'} <= previous.keys():
+        # The order may have moved from another (user, day); recount that one as well, as far as it is known.
+        old_key = (
+            previous.get('user_id', order.user_id),
+            timezone.localdate(previous.get('created_at', order.created_at)),
+        )
+        recompute_user_days({(order.user_id, order_day(order)), old_key})
+        return
+    deltas = order_stats_deltas([order])
+    old = deltas[previous['user_id'], timezone.localdate(previous['created_at'])]
+    old[0] -= 1
+    old[1] -= previous['price']
+    apply_stats_deltas(deltas)
+
+
+def record_orders_deleted(orders):
+    apply_stats_deltas(order_stats_deltas(orders, sign=-1))
+
+
+def recompute_user_days(keys):
+    """Recompute a few (user_id, day) rollups from the orders table."""
+    with transaction.atomic():
+        for user_id, day in keys:
+            totals = (
+                Order.objects.filter(user_id=user_id, created_at__date=day)
+                .aggregate(orders=Count('id'), revenue=Sum('price'))
+            )
+            UserDailyStats.objects.update_or_create(
+                user_id=user_id, day=day,
+                defaults={'orders': totals['orders'], 'revenue': totals['revenue'] or 0},
+            )
+
+
+def rebuild_user_stats(batch_size=1000):
+    rows = (
+        Order.objects.annotate(day=TruncDate('created_at'))
+        .values('user_id', 'day')
+        .annotate(orders=Count('id'), revenue=Sum('price'))
+        .order_by('user_id', 'day')
+    )
+    with transaction.atomic():
+        UserDailyStats.objects.all().delete()
+        objects = [
+            UserDailyStats(user_id=row['user_id'], day=row['day'], orders=row['orders'], revenue=row['revenue'] or 0)
+            for row in rows
+        ]
+        UserDailyStats.objects.bulk_create(objects, batch_size=batch_size)
+    return len(objects)
+
+
+def daily_stats(user, days):
+    """Return the last `days` days for `user`, oldest first, with empty days filled in as zeros."""
+    today = timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    stored = {
+        day: (orders, revenue)
+        for day, orders, revenue in UserDailyStats.objects
+        .filter(user=user, day__gte=first_day, day__lte=today)
+        .values_list('day', 'orders', 'revenue')
+    }
+    result = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        orders, revenue = stored.get(day, (0, 0))
+        result.append({"day": day.isoformat(), "orders": orders, "revenue": revenue})
+    return result
@@ -0,0 +1,149 @@
+"""
+Order counts per status, and the job that marks overdue orders as late.
+
+OrderStatusCount holds one row per status. Order writes keep it current through
+the same record_* hooks as the sales and stats rollups. The overdue job moves
+orders with queryset updates, which send no signals, so it adjusts the counters
+itself in the transaction that moved the orders.
+"""
+import logging
+import os
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from users import events
+from users.counters import increment_many
+from users.models import Order, OrderStatusCount
+
+logger = logging.getLogger(__name__)
+
+OVERDUE_STATUSES = (Order.OrderTypes.TODO, Order.OrderTypes.DOING)
+
+
+def order_status_deltas(orders, sign=1):
+    deltas = Counter()
+    for order in orders:
+        deltas[order.status] += sign
+    return deltas
+
+
+def apply_status_deltas(deltas):
+    increment_many(OrderStatusCount, ('status',), {(status,): {'count': delta} for status, delta in deltas.items()})
+
+
+def record_orders_created(orders):
+    apply_status_deltas(order_status_deltas(orders))
+
+
+def record_order_updated(order, previous):
+    # Order.save() reads the stored status if the instance did not load it; it is
+    # missing only if the row could not be read, and then a recount is the only way to know.
+    if 'status' not in previous:
+        rebuild_status_counts()
+        return
+    if previous['status'] != order.status:
+        apply_status_deltas({order.status: 1, previous['status']: -1})
+
+
+def record_orders_deleted(orders):
+    apply_status_deltas(order_status_deltas(orders, sign=-1))
+
+
+def rebuild_status_counts():
+    """Recount every status with one GROUP BY, read from the (status, created_at) index."""
+    # Read and replace in one transaction, so orders written in between cannot be lost from the counts.
+    with transaction.atomic():
+        totals = dict(
+            Order.objects.values('status').annotate(total=Count('id')).order_by().values_list('status', 'total')
+        )
+        for status in Order.OrderTypes.values:
+            OrderStatusCount.objects.update_or_create(status=status, defaults={'count': totals.get(status, 0)})
+    return totals
+
+
+def status_counts():
+    counts = dict.fromkeys(Order.OrderTypes.values, 0)
+    counts.update(OrderStatusCount.objects.values_list('status', 'count'))
+    return counts
+
+
+def mark_overdue_orders(now=None, overdue_after=None, batch_size=None):
+    """
+    Move to-do and doing orders created more than `overdue_after` ago to "lated".
+
+    Each batch is a single UPDATE ... WHERE id IN (SELECT id ... LIMIT n): the
+    subquery is a range scan on (status, created_at) and the update finds the
+    rows by primary key. A batch commits together with its counter changes, so
+    no write lock is held for long. Returns the number of
+    orders moved per status.
+    """
+    now = now or timezone.now()
+    cutoff = now - (overdue_after or settings.ORDER_OVERDUE_AFTER)
+    batch_size = batch_size or settings.ORDER_OVERDUE_BATCH_SIZE
+    moved = Counter()
+    for status in OVERDUE_STATUSES:
+        overdue = Order.objects.filter(status=status, created_at__lt=cutoff).order_by('created_at')
+        while True:
+            with transaction.atomic():
+                # One statement, so the subquery's rows cannot change status before they are updated.
+                count = Order.objects.filter(pk__in=overdue.values('pk')[:batch_size]).update(
+                    status=Order.OrderTypes.LATED, updated_at=timezone.now()
+                )
+                apply_status_deltas({status: -count, Order.OrderTypes.LATED: count})
+                events.record_orders_late(status, count)
+            moved[status] += count
+            if count < batch_size:
+                break
+    return moved
+
+
+class OverdueScheduler:
+    """
+    Runs mark_overdue_orders() every ORDER_OVERDUE_INTERVAL seconds on a daemon
+    thread of the web process. Every process that loads the app runs its own;
+    that is safe because a batch only moves orders that are still overdue.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='overdue-orders', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(settings.ORDER_OVERDUE_INTERVAL):
+            close_old_connections()
+            try:
+                moved = mark_overdue_orders()
+                if sum(moved.values()):
+                    logger.info('Marked %d overdue orders as late.', sum(moved.values()))
+            except Exception:
+                logger.exception('Marking overdue orders failed.')
+            finally:
+                close_old_connections()
+
+    def _after_fork(self):
+        # Threads do not survive fork(): a worker forked from a preloaded master starts its own.
+        self._lock = threading.Lock()
+        if self._thread is not None:
+            self._thread = None
+            self.start()
+
+
+overdue_scheduler = OverdueScheduler()
+
+os.register_at_fork(after_in_child=overdue_scheduler._after_fork)
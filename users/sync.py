@@ -0,0 +1,139 @@
+"""
+Delta sync: the products and orders changed or deleted since a sync token.
+
+A client first calls /products/changes/ (or /orders/changes/) without ?since=,
+which pages through every row, and from then on passes the `since` token of the
+previous response. Rows are read in (updated_at, id) order from their index and
+deletions from Tombstone, so a response holds only what changed after the token.
+"more" is true while there are further changes to fetch right away.
+
+A timestamp is taken before the row is written and committed, so a write that
+waited for SQLite's lock can commit with an updated_at older than rows already
+handed out. Changes younger than SYNC_SETTLE are therefore held back until the
+next sync. Tombstones are pruned after SYNC_TOMBSTONE_TTL. A token older than
+that could miss deletions, so it is refused with 410 and the client has to sync
+from scratch.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from users.models import Tombstone
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'The sync token is too old; sync again without since.'
+    default_code = 'sync_token_expired'
+
+
+def record_deleted(model, object_ids):
+    """Leave tombstones for deleted rows, in the transaction that deletes them."""
+    Tombstone.objects.bulk_create(
+        [Tombstone(model=model._meta.model_name, object_id=object_id) for object_id in object_ids]
+    )
+
+
+def after(position, timestamp_field):
+    """Rows past a (timestamp, id) position in (timestamp, id) order."""
+    if position is None:
+        return Q()
+    moment, pk = position
+    # The redundant >= gives SQLite a lower bound to seek to; it cannot take one from the OR.
+    return Q(**{f'{timestamp_field}__gte': moment}) & (
+        Q(**{f'{timestamp_field}__gt': moment}) | Q(**{timestamp_field: moment, 'id__gt': pk})
+    )
+
+
+def encode_token(model, rows, deleted):
+    def position(value):
+        return None if value is None else [value[0].isoformat(), value[1]]
+
+    raw = json.dumps([model._meta.model_name, position(rows), position(deleted)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(model, token):
+    """Return the (rows, tombstones) positions in a token, or raise ValidationError."""
+    def position(value):
+        if value is None:
+            return None
+        moment, pk = value
+        moment = parse_datetime(moment)
+        # Tokens carry aware moments; a naive one cannot be compared with the rows' timestamps.
+        if moment is None or timezone.is_naive(moment) or not isinstance(pk, int):
+            raise ValueError
+        return moment, pk
+
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        name, rows, deleted = json.loads(raw)
+        if name != model._meta.model_name or deleted is None:
+            raise ValueError
+        return position(rows), position(deleted)
+    except (ValueError, TypeError):
+        raise ValidationError({'since': 'Invalid sync token.'})
+
+
+def get_page_size(query_params):
+    try:
+        size = int(query_params['page_size'])
+    except (KeyError, ValueError):
+        return settings.SYNC_PAGE_SIZE
+    return max(1, min(size, settings.SYNC_MAX_PAGE_SIZE))
+
+
+def changes(model, serializer, query_params):
+    """
+    The response body of a changes endpoint: rows of `model` written after the
+    ?since= token, as `serializer` (a ValuesSerializer) renders them, and the ids deleted after it.
+    """
+    now = timezone.now()
+    cutoff = now - settings.SYNC_SETTLE
+    limit = get_page_size(query_params)
+    token = query_params.get('since')
+    if token:
+        rows_position, deleted_position = decode_token(model, token)
+        if deleted_position[0] < now - settings.SYNC_TOMBSTONE_TTL:
+            raise SyncTokenExpired
+    else:
+        # Nothing synced yet: every row is sent, and only deletions from now on matter.
+        rows_position, deleted_position = None, (cutoff, 0)
+
+    # The token is read off the last row, so it needs the ordering columns even if the output has none.
+    missing = [name for name in ('updated_at', 'id') if name not in serializer.lookups]
+    rows = list(
+        model._default_manager
+        .filter(after(rows_position, 'updated_at'), updated_at__lte=cutoff)
+        .order_by('updated_at', 'id')
+        .values_list(*serializer.lookups, *missing, named=True)[:limit + 1]
+    )
+    deleted = list(
+        Tombstone.objects
+        .filter(after(deleted_position, 'deleted_at'), model=model._meta.model_name, deleted_at__lte=cutoff)
+        .order_by('deleted_at', 'id')
+        .values_list('deleted_at', 'id', 'object_id')[:limit + 1]
+    )
+    more_deleted = len(deleted) > limit
+    more = len(rows) > limit or more_deleted
+    rows, deleted = rows[:limit], deleted[:limit]
+    if rows:
+        rows_position = (rows[-1].updated_at, rows[-1].id)
+    if deleted:
+        deleted_position = deleted[-1][:2]
+    if not more_deleted:
+        # Every tombstone up to the cutoff has been handed out, so the token moves on to it even if
+        # there were none; otherwise the token of a table without deletions would expire.
+        deleted_position = max(deleted_position, (cutoff, 0))
+    return {
+        'changed': serializer.serialize(rows),
+        'deleted': [object_id for _, _, object_id in deleted],
+        'since': encode_token(model, rows_position, deleted_position),
+        'more': more,
+    }
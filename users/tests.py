@@ -1,4 +1,1082 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, connections, router
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
 
+from root.middleware import ReadOnlyRequestMiddleware
+from users import sales, stats
+from users.async_views import AsyncLoginAPIView
+from users.authentication import user_cache
+from users.caching import CATALOG_VERSION_KEY, catalog_version
+from users.dashboard import SECTIONS
+from users.hashing import HashingPool, HashingPoolSaturated, hashing_pool
+from users.ids import ALPHABET, LENGTH, OrderIdGenerator
+from users.images import image_pipeline, process
+from users.ingest import ingest_orders
+from users.models import Order, Product, ProductSales, User, UserDailyStats
+from users.openapi import collected_schema_url, generate_schema, hashed_name
+from users.renderers import ORJSONRenderer
+from users.rows import ValuesSerializer
+from users.sales import rebuild_product_sales
+from users.serializers import LastOrdersSerializer, ProductsSerializer, RecentOrdersSerializer, UsersSerializer
+from users.stats import daily_stats, rebuild_user_stats
+from users.statuses import rebuild_status_counts, status_counts
+from users.throttling import client_ip, token_buckets
+from users.tokens import IndexedRefreshToken, RevocationIndex
+from users.urls import build_urlpatterns
+
+
+# The read alias is a second connection, which cannot see the test case's uncommitted rows,
+# and the shared cache is a directory other processes on the host use.
+@override_settings(
+    READ_DATABASE_ALIAS='default', CATALOG_VERSION_CACHE_ALIAS='default', TOP_PRODUCTS_CACHE_ALIAS='default',
+)
+class APITestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='pw-secret-123')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def create_product(self, name='Product', **fields):
+        fields = {'price': Decimal('10.00'), 'description': 'Description', 'discount': 0, **fields}
+        return Product.objects.create(name=name, user=self.user, **fields)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.widgets = [self.create_product(f'Widget {index}', description='A blue widget') for index in range(5)]
+        self.create_product('Gadget', description='Nothing to see')
+
+    def test_search(self):
+        response = self.client.get('/products/', {'q': 'widget'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(row['id'] for row in response.json()['results']), [product.id for product in self.widgets]
+        )
+        self.assertIsNone(response.json()['next'])
+
+    def test_search_pages_by_cursor(self):
+        ids, path = [], '/products/?q=widget&page_size=2'
+        while path:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.json()['results']]
+            path = response.json()['next']
+        self.assertEqual(sorted(ids), [product.id for product in self.widgets])
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_filters(self):
+        cheap = self.create_product('Cheap', price=Decimal('1.00'))
+        response = self.client.get('/products/', {'max_price': '5', 'q': ''})
+        self.assertEqual([row['id'] for row in response.json()['results']], [cheap.id])
+        for value in ('abc', 'NaN', 'sNaN', 'Infinity', '-inf'):
+            with self.subTest(value=value):
+                response = self.client.get('/products/', {'min_price': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('min_price', response.json())
+
+    def test_search_with_ordering(self):
+        response = self.client.get('/products/', {'q': 'widget', 'ordering': '-id', 'page_size': 2})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.widgets[4].id, self.widgets[3].id])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.widgets[2].id, self.widgets[1].id])
+
+
+class UserCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+
+    def test_user_write_invalidates(self):
+        self.assertEqual(self.client.get('/profile/').status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # update() sends no signal, so the cached row is still served ...
+        self.assertEqual(self.client.get('/profile/').status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        user.save()
+        # ... until a save invalidates it.
+        self.assertEqual(self.client.get('/profile/').status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_LOCAL_TTL=0)
+    def test_entries_expire(self):
+        self.assertEqual(self.client.get('/profile/').status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/profile/').status_code, 401)
+
+
+class ProfileTests(APITestCase):
+    def test_fields(self):
+        response = self.client.get('/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.json()), {'id', 'username', 'email', 'bio', 'user_image', 'user_image_variants'}
+        )
+
+
+class ClientIPTests(TestCase):
+    def get(self, forwarded_for):
+        return RequestFactory().get('/login/', HTTP_X_FORWARDED_FOR=forwarded_for, REMOTE_ADDR='10.0.0.1')
+
+    def test_forwarded_for_prefix_is_ignored(self):
+        self.assertEqual(client_ip(self.get('203.0.113.7')), '203.0.113.7')
+        self.assertEqual(client_ip(self.get('198.51.100.1, 203.0.113.7')), '203.0.113.7')
+        self.assertEqual(client_ip(self.get('198.51.100.2, 203.0.113.7')), '203.0.113.7')
+
+    @override_settings(REST_FRAMEWORK={'NUM_PROXIES': 0})
+    def test_without_proxy(self):
+        self.assertEqual(client_ip(self.get('198.51.100.1')), '10.0.0.1')
+
+
+class DatabaseRoutingTests(TestCase):
+    databases = {'default', 'read'}
+
+    def test_safe_requests_read_from_the_read_alias(self):
+        aliases = {}
+
+        def view(request):
+            aliases[request.method] = (router.db_for_read(User), router.db_for_write(User))
+            return HttpResponse()
+
+        middleware = ReadOnlyRequestMiddleware(view)
+        for method in ('GET', 'HEAD', 'OPTIONS', 'POST', 'DELETE'):
+            middleware(RequestFactory().generic(method, '/'))
+        self.assertEqual(aliases, {
+            'GET': ('read', 'default'), 'HEAD': ('read', 'default'), 'OPTIONS': ('read', 'default'),
+            'POST': ('default', 'default'), 'DELETE': ('default', 'default'),
+        })
+        self.assertEqual(router.db_for_read(User), 'default')
+
+    def test_connection_settings(self):
+        def pragma(alias, name):
+            with connections[alias].cursor() as cursor:
+                return cursor.execute(f'PRAGMA {name}').fetchone()[0]
+
+        self.assertEqual(pragma('default', 'synchronous'), 1)  # NORMAL
+        self.assertEqual(pragma('default', 'cache_size'), -20000)
+        self.assertEqual(pragma('default', 'busy_timeout'), 20000)
+        self.assertEqual(pragma('default', 'query_only'), 0)
+        self.assertEqual(pragma('read', 'query_only'), 1)
+        with self.assertRaises(DatabaseError), connections['read'].cursor() as cursor:
+            cursor.execute('UPDATE users_user SET bio = %s', ['read-only'])
+
+
+@override_settings(THROTTLE_RATES={'refresh': {'ip': '3/min'}})
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        database = override_settings(THROTTLE_DATABASE=os.path.join(directory.name, 'throttle.sqlite3'))
+        database.enable()
+        self.addCleanup(database.disable)
+
+    def refresh(self, address='203.0.113.7'):
+        return self.client.post('/token/refresh/', {'refresh': 'not-a-token'}, format='json', REMOTE_ADDR=address)
+
+    def test_burst_limit(self):
+        self.assertNotIn(429, [self.refresh().status_code for _ in range(3)])
+        response = self.refresh()
+        self.assertEqual(response.status_code, 429)
+        # A token comes back every 20 seconds, and the first of them is still about that far away.
+        self.assertIn(int(response['Retry-After']), (19, 20))
+        # Each client address has a bucket of its own.
+        self.assertNotEqual(self.refresh('203.0.113.8').status_code, 429)
+
+    def test_refill(self):
+        # A burst of 2, refilled at one token a second.
+        self.assertEqual([token_buckets.consume('key', 2, 1.0, now=100) for _ in range(2)], [0.0, 0.0])
+        self.assertEqual(token_buckets.consume('key', 2, 1.0, now=100), 1.0)
+        self.assertEqual(token_buckets.consume('key', 2, 1.0, now=100.5), 0.5)
+        self.assertEqual(token_buckets.consume('key', 2, 1.0, now=101), 0.0)
+        self.assertEqual(token_buckets.consume('key', 2, 1.0, now=101), 1.0)
+        # Idle time fills the bucket up to its size, not beyond.
+        self.assertEqual([token_buckets.consume('key', 2, 1.0, now=200) for _ in range(3)], [0.0, 0.0, 1.0])
+
+
+@override_settings(THROTTLE_RATES={})
+class RefreshTokenTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # A fresh index: the module's one has seen the rows of earlier tests, whose ids the rollbacks hand out again.
+        self.index = RevocationIndex()
+        patcher = mock.patch('users.tokens.revocation_index', self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def refresh(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/token/refresh/', {'refresh': str(token)}, format='json')
+
+    def test_rotation(self):
+        token = IndexedRefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'access', 'refresh'})
+        rotated = response.json()['refresh']
+        self.assertNotEqual(rotated, str(token))
+        # The old token is revoked by the rotation; the new one is outstanding and rotates in turn.
+        self.assertEqual(self.refresh(token).status_code, 400)
+        self.assertEqual(self.refresh(rotated).status_code, 200)
+
+    def test_index_answers_without_queries(self):
+        token = IndexedRefreshToken.for_user(self.user)
+        jti = token[api_settings.JTI_CLAIM]
+        self.index.sync()
+        with self.assertNumQueries(0):
+            self.assertFalse(self.index.is_revoked(jti))
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.index.is_revoked(jti))
+
+    @override_settings(REVOCATION_SYNC_INTERVAL=0)
+    def test_revoked_by_another_process(self):
+        token = IndexedRefreshToken.for_user(self.user)
+        jti = token[api_settings.JTI_CLAIM]
+        self.assertFalse(self.index.is_revoked(jti))
+        # Blacklisted without going through this process's index.
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+        self.assertTrue(self.index.is_revoked(jti))
+        self.assertEqual(self.index.database_checks, 1)
+        with self.assertRaises(TokenError):
+            IndexedRefreshToken(str(token))
+
+
+@override_settings(HASHING_POOL_WORKERS=1, HASHING_POOL_QUEUE=1, THROTTLE_RATES={})
+class AsyncAuthTests(SimpleTestCase):
+    def login(self, body=None):
+        body = json.dumps({'username': 'alice', 'password': 'pw-secret-123'}) if body is None else body
+        return AsyncLoginAPIView.as_view()(
+            AsyncRequestFactory().post('/login/', body, content_type='application/json')
+        )
+
+    async def test_pool_refuses_beyond_workers_and_queue(self):
+        pool, release = HashingPool(), threading.Event()
+        # One job runs and one waits; both hold their slot from the start.
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with self.assertRaises(HashingPoolSaturated):
+            await pool.run(release.wait)
+        release.set()
+        self.assertEqual(await asyncio.gather(*running), [True, True])
+        self.assertEqual(await pool.run(len, 'freed'), 5)
+
+    async def test_flow_runs_on_the_pool(self):
+        with mock.patch('users.auth.login', return_value=({'access_token': 'token'}, 200)) as login:
+            response = await self.login()
+        self.assertEqual((response.status_code, json.loads(response.content)), (200, {'access_token': 'token'}))
+        login.assert_called_once_with({'username': 'alice', 'password': 'pw-secret-123'})
+
+    async def test_saturated_pool(self):
+        with mock.patch.object(hashing_pool, 'run', side_effect=HashingPoolSaturated):
+            response = await self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    async def test_invalid_json(self):
+        self.assertEqual((await self.login('{')).status_code, 400)
+
+
+@skipIf(settings.ASYNC_VIEWS, 'the asgi profile serves /orders/stream/ from AsyncOrderStreamAPIView')
+class OrderStreamTests(APITestCase):
+    def test_refused_under_wsgi(self):
+        response = self.client.get('/orders/stream/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('asgi', response.json()['detail'])
+
+    @override_settings(ORDER_STREAM_WSGI_SECONDS=0.05, ORDER_STREAM_HEARTBEAT=0.01)
+    def test_bounded_under_wsgi(self):
+        response = self.client.get('/orders/stream/')
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content)
+        self.assertTrue(body.startswith(b'retry: '))
+        self.assertIn(b': ping', body)
+
+
+class ImageVariantTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def upload(self, size):
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+        return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+    def test_variants(self):
+        with mock.patch.object(image_pipeline, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product(image=self.upload((1200, 600)))
+        submit.assert_called_once_with(Product, product.pk, 'image', 'image_variants')
+
+        variants = process(Product, product.pk, 'image', 'image_variants')
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, variants)
+        self.assertEqual(variants['source'], product.image.name)
+        for output, mode in (('webp', 'RGBA'), ('jpeg', 'RGB')):
+            self.assertEqual(list(variants[output]), ['960', '480', '160'])
+            with default_storage.open(variants[output]['480']) as file, Image.open(file) as image:
+                self.assertEqual((image.size, image.mode), ((480, 240), mode))
+
+        # The same bytes give the same names, so nothing is encoded again.
+        with mock.patch('users.images.encode') as encode:
+            self.assertEqual(process(Product, product.pk, 'image', 'image_variants'), variants)
+        encode.assert_not_called()
+        # A save that keeps the image does not queue it again.
+        with mock.patch.object(image_pipeline, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        submit.assert_not_called()
+
+        url = self.client.get(f'/product/crud/{product.pk}').json()['image_variants']['webp']['160']
+        self.assertEqual(url, 'http://testserver' + default_storage.url(variants['webp']['160']))
+
+    def test_narrow_image_is_not_upscaled(self):
+        with mock.patch.object(image_pipeline, 'submit'):
+            product = self.create_product(image=self.upload((100, 40)))
+        variants = process(Product, product.pk, 'image', 'image_variants')
+        self.assertEqual(list(variants['jpeg']), ['100'])
+
+
+class RecentOrdersTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(price=Decimal('1.00'))
+        # Pairs of orders share a created_at, so pages also break between equal timestamps.
+        start = timezone.now() - timedelta(hours=1)
+        for index in range(7):
+            order = self.order(amount=index + 1)
+            Order.objects.filter(pk=order.pk).update(created_at=start + timedelta(minutes=index // 2))
+
+    def order(self, amount):
+        return Order.objects.create(product=self.product, user=self.user, amount=amount)
+
+    def expected(self):
+        return list(Order.objects.order_by('-created_at', '-id').values_list('price', flat=True))
+
+    def page(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [row['price'] for row in response.json()['results']], response.json()['next']
+
+    def test_pages(self):
+        prices, path = [], '/recent-orders/?page_size=2'
+        while path:
+            page, path = self.page(path)
+            self.assertLessEqual(len(page), 2)
+            prices += page
+        self.assertEqual(prices, self.expected())
+
+    def test_cursor_is_stable_across_inserts(self):
+        expected = self.expected()
+        prices, path = self.page('/recent-orders/?page_size=3')
+        # Newer orders go before the first page; the cursor carries on after the rows already seen.
+        self.order(amount=100)
+        while path:
+            page, path = self.page(path)
+            prices += page
+        self.assertEqual(prices, expected)
+
+    def test_invalid_cursor(self):
+        for cursor in ('x', encode(['2024-01-01T00:00:00Z']), encode({'id': 1}), encode(['not a date', 1])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/recent-orders/', {'cursor': cursor}).status_code, 404)
+
+
+class ValuesSerializerTests(APITestCase):
+    def test_same_bytes_as_the_serializer(self):
+        self.user.bio = 'Line\u2028separator, "quoted", café'
+        self.user.save()
+        User.objects.create_user(username='bob', password='pw-secret-123', user_image='users/photos/bob.png')
+        product = self.create_product(
+            'Lamp \U0001f4a1', price=Decimal('12.30'), gift=True, image='products/image/lamp.png',
+            image_variants={'source': 'products/image/lamp.png', 'webp': {'160': 'products/image/variants/lamp.160w.webp'}},
+        )
+        self.create_product('Plain')
+        for amount in (1, 3):
+            Order.objects.create(product=product, user=self.user, amount=amount)
+
+        context = {'request': Request(RequestFactory().get('/'))}
+        for serializer_class, queryset in (
+            (ProductsSerializer, Product.objects.order_by('id')),
+            (UsersSerializer, User.objects.order_by('id')),
+            (LastOrdersSerializer, Order.objects.order_by('id')),
+            (RecentOrdersSerializer, Order.objects.order_by('id')),
+        ):
+            with self.subTest(serializer=serializer_class.__name__):
+                expected = JSONRenderer().render(serializer_class(queryset, many=True, context=context).data)
+                values = ValuesSerializer(serializer_class, context=context)
+                self.assertEqual(ORJSONRenderer().render(values.serialize(values.rows(queryset))), expected)
+
+    def test_fields_pick_and_order_the_keys(self):
+        values = ValuesSerializer(UsersSerializer, fields=['username', 'id'])
+        self.assertEqual(values.serialize(values.rows(User.objects.all())), [{'username': 'alice', 'id': self.user.id}])
+        with self.assertRaises(ValueError):
+            ValuesSerializer(UsersSerializer, fields=['password'])
+
+
+class SyncURLs:
+    urlpatterns = build_urlpatterns(async_views=False)
+
+
+class AsyncURLs:
+    urlpatterns = build_urlpatterns(async_views=True)
+
+
+class AsyncViewParityTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user(username='bob', password='pw-secret-123')
+        products = [self.create_product(f'Widget {index}', price=Decimal(f'{index}.25')) for index in range(4)]
+        for index, product in enumerate(products):
+            Order.objects.create(product=product, user=self.user, amount=index + 1)
+
+    def get(self, urlconf, path, **headers):
+        # Neither variant is served what the other cached, but both see the same catalog version.
+        version = catalog_version()
+        cache.clear()
+        cache.set(CATALOG_VERSION_KEY, version, None)
+        with override_settings(ROOT_URLCONF=urlconf):
+            return self.client.get(path, **headers)
+
+    def test_same_responses(self):
+        for path in (
+            '/get-users/', '/get-users/?fields=username&page_size=1', '/get-users/?fields=password',
+            '/profile/', '/recent-orders/?page_size=2', '/top-products/?limit=2', '/top-products/?limit=x',
+            '/products/?page_size=2', '/products/?q=widget&ordering=-price', '/products/?min_price=abc',
+        ):
+            with self.subTest(path=path):
+                expected, response = self.get(SyncURLs, path), self.get(AsyncURLs, path)
+                self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content))
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+    def test_validators_carry_over(self):
+        etag = self.get(SyncURLs, '/products/')['ETag']
+        self.assertEqual(self.get(AsyncURLs, '/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_unauthenticated(self):
+        self.client.credentials()
+        expected, response = self.get(SyncURLs, '/profile/'), self.get(AsyncURLs, '/profile/')
+        self.assertEqual((response.status_code, response.json()), (401, expected.json()))
+        self.assertEqual(response['WWW-Authenticate'], expected['WWW-Authenticate'])
+
+
+class CustomerIdTests(APITestCase):
+    def test_ids_are_time_ordered(self):
+        generator = OrderIdGenerator()
+        ids = [generator.new() for _ in range(50)] + generator.allocate(50)
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertTrue(all(len(value) == LENGTH and set(value) <= set(ALPHABET) for value in ids))
+        # A clock that steps back does not send ids back with it.
+        with mock.patch('users.ids.time.time_ns', return_value=0):
+            self.assertGreater(generator.new(), ids[-1])
+
+    def test_lookup(self):
+        product = self.create_product()
+        first = Order.objects.create(product=product, user=self.user, amount=1)
+        orders, errors = ingest_orders([{'product': product.id, 'user': self.user.id, 'amount': 2}] * 3)
+        ids = [first.customer_id] + [order.customer_id for order in orders]
+        self.assertEqual(ids, sorted(set(ids)))
+
+        response = self.client.get(f'/orders/{orders[1].customer_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['id'], response.json()['customer_id']), (orders[1].pk, ids[2]))
+        self.assertEqual(self.client.get('/orders/0000000000000zz/').status_code, 404)
+        # The fixed orders/... routes are not taken for customer ids.
+        self.assertIn('to do', self.client.get('/orders/status-counts/').json())
+
+
+class OrderExportTests(APITestCase):
+    def test_invalid_dates(self):
+        for value in ('yesterday', '2024-02-30', '2024-02-30T10:00:00', '2024-01-01T25:00:00'):
+            with self.subTest(value=value):
+                response = self.client.get('/orders/export/', {'created_after': value})
+                self.assertEqual(response.status_code, 400)
+                with self.assertRaises(CommandError):
+                    call_command('export_orders', '--created-before', value)
+
+    def test_dates(self):
+        response = self.client.get('/orders/export/', {'created_after': '2024-02-29', 'created_before': '2024-03-01'})
+        self.assertEqual(response.status_code, 200)
+
+
+class OrderIngestTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product()
+
+    def order(self, **fields):
+        return {'product': self.product.id, 'user': self.user.id, 'amount': 2, **fields}
+
+    def test_row_errors(self):
+        response = self.client.post('/last-orders/', [
+            self.order(),
+            self.order(customer_id=['A1']),
+            self.order(customer_id={'id': 'A1'}),
+            self.order(status=['todo']),
+            self.order(status='unknown'),
+            self.order(product='x', amount=None),
+            'not a row',
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1)
+        errors = {error['index']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(errors[1], {'customer_id': ['Not a valid string.']})
+        self.assertEqual(errors[2], {'customer_id': ['Not a valid string.']})
+        self.assertEqual(errors[3], {'status': ['Not a valid string.']})
+        self.assertEqual(errors[4], {'status': ['"unknown" is not a valid choice.']})
+        self.assertEqual(set(errors[5]), {'product', 'amount'})
+        self.assertIn('non_field_errors', errors[6])
+
+    def test_duplicate_customer_ids(self):
+        response = self.client.post(
+            '/last-orders/', [self.order(customer_id='A1'), self.order(customer_id='A1')], format='json'
+        )
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'][0]['index'], 1)
+
+    def test_all_invalid(self):
+        response = self.client.post('/last-orders/', [self.order(status=[])], format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/last-orders/', [self.order(status={'a': 1})], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_amount_out_of_range(self):
+        response = self.client.post('/last-orders/', [
+            self.order(amount=10 ** 20),
+            self.order(amount=2 ** 63),
+            self.order(amount=1e20),
+            self.order(amount=2 ** 62),
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = {error['index']: set(error['errors']) for error in response.json()['errors']}
+        # The last amount fits, but the price it gives (amount * 10.00) does not.
+        self.assertEqual(errors, {0: {'amount'}, 1: {'amount'}, 2: {'amount'}, 3: {'price'}})
+        self.assertFalse(Order.objects.exists())
+
+
+@override_settings(SYNC_SETTLE=timedelta(0))
+class SyncTests(APITestCase):
+    def sync(self, path, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_and_deletions(self):
+        first, second = self.create_product('First'), self.create_product('Second')
+        body = self.sync('/products/changes/')
+        self.assertEqual([row['id'] for row in body['changed']], [first.id, second.id])
+        self.assertEqual(body['deleted'], [])
+
+        first.name = 'Renamed'
+        first.save()
+        deleted_id = second.id
+        second.delete()
+        body = self.sync('/products/changes/', body['since'])
+        self.assertEqual([row['name'] for row in body['changed']], ['Renamed'])
+        self.assertEqual(body['deleted'], [deleted_id])
+        self.assertFalse(body['more'])
+
+        body = self.sync('/products/changes/', body['since'])
+        self.assertEqual((body['changed'], body['deleted']), ([], []))
+
+    def test_pages(self):
+        products = [self.create_product(f'Product {index}') for index in range(5)]
+        body, ids = {'since': None, 'more': True}, []
+        while body['more']:
+            body = self.sync('/products/changes/', body['since'], page_size=2)
+            ids += [row['id'] for row in body['changed']]
+        self.assertEqual(ids, [product.id for product in products])
+
+    def test_invalid_tokens(self):
+        moment = timezone.now().isoformat()
+        for token in (
+            'garbage',
+            encode(['order', None, [moment, 0]]),
+            encode(['product', None, None]),
+            encode(['product', None, ['2024-02-30T00:00:00+00:00', 0]]),
+            encode(['product', None, ['2024-01-01T00:00:00', 0]]),
+            encode(['product', ['2024-01-01T00:00:00', 1], [moment, 0]]),
+            encode(['product', None, [moment, '0']]),
+        ):
+            with self.subTest(token=token):
+                response = self.client.get('/products/changes/', {'since': token})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('since', response.json())
+
+    def test_token_of_quiet_table_does_not_expire(self):
+        self.create_product()
+        since, start = self.sync('/products/changes/')['since'], timezone.now()
+        for day in range(1, 32, 10):
+            with mock.patch('django.utils.timezone.now', return_value=start + timedelta(days=day)):
+                since = self.sync('/products/changes/', since)['since']
+
+    def test_deletions_at_the_cutoff_are_sent_once(self):
+        product = self.create_product()
+        product_id = product.id
+        body = self.sync('/products/changes/')
+        product.delete()
+        body = self.sync('/products/changes/', body['since'])
+        self.assertEqual(body['deleted'], [product_id])
+        self.assertEqual(self.sync('/products/changes/', body['since'])['deleted'], [])
+
+    def test_expired_token(self):
+        moment = (timezone.now() - timedelta(days=31)).isoformat()
+        response = self.client.get('/products/changes/', {'since': encode(['product', None, [moment, 0]])})
+        self.assertEqual(response.status_code, 410)
+
+
+def encode(token):
+    return base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+
+class ProductImportTests(APITestCase):
+    def post(self, rows, content_type='application/x-ndjson'):
+        body = '\n'.join(json.dumps(row) for row in rows) if content_type == 'application/x-ndjson' else rows
+        return self.client.post('/products/import/', body, content_type=content_type)
+
+    def row(self, **fields):
+        return {'name': 'Imported', 'price': '9.99', 'description': 'Imported product', 'discount': 5, **fields}
+
+    def test_create_and_update(self):
+        product = self.create_product('Old name')
+        response = self.post([self.row(), self.row(id=product.id, name='New name', price='1.50')])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), {'rows': 2, 'created': 1, 'updated': 1, 'invalid': 0, 'errors': []}
+        )
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.price), ('New name', Decimal('1.50')))
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_csv(self):
+        body = 'name,price,description,discount,gift\nCSV product,3.00,From CSV,0,true\n'
+        response = self.post(body, content_type='text/csv')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertTrue(Product.objects.get(name='CSV product').gift)
+
+    def test_row_errors(self):
+        response = self.post([
+            self.row(),
+            self.row(price='abc'),
+            self.row(price='NaN'),
+            self.row(name=''),
+            self.row(discount='x'),
+            self.row(id=999999),
+            self.row(user_id='me'),
+            ['not', 'a', 'row'],
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['rows'], body['created'], body['invalid']), (8, 1, 7))
+        errors = {error['index']: set(error['errors']) for error in body['errors']}
+        self.assertEqual(errors, {
+            1: {'price'}, 2: {'price'}, 3: {'name'}, 4: {'discount'}, 5: {'id'}, 6: {'user_id'}, 7: {'non_field_errors'},
+        })
+
+    def test_integers_out_of_range(self):
+        response = self.post([self.row(id=10 ** 30), self.row(user_id=10 ** 30), self.row(discount=10 ** 30)])
+        self.assertEqual(response.status_code, 400)
+        errors = {error['index']: set(error['errors']) for error in response.json()['errors']}
+        self.assertEqual(errors, {0: {'id'}, 1: {'user_id'}, 2: {'discount'}})
+
+    def test_invalid_input(self):
+        response = self.client.post(
+            '/products/import/', json.dumps(self.row()) + '\n{broken', content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'], [{'index': 1, 'errors': {'non_field_errors': ['Invalid JSON.']}}])
+        response = self.post('name,price\n', content_type='application/xml')
+        self.assertEqual(response.status_code, 415)
+
+    def test_failed_batch(self):
+        with mock.patch('users.imports.upsert_products', side_effect=DatabaseError('disk I/O error')), \
+                self.assertLogs('users.imports', 'ERROR'):
+            response = self.post([self.row(), self.row(price='abc'), self.row()])
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual((body['rows'], body['created'], body['invalid']), (3, 0, 3))
+        self.assertEqual([error['index'] for error in body['errors']], [0, 1, 2])
+        self.assertFalse(Product.objects.exists())
+
+    def test_duplicate_ids(self):
+        product = self.create_product()
+        response = self.post([self.row(id=product.id, name='First'), self.row(id=product.id, name='Second')])
+        body = response.json()
+        self.assertEqual((body['rows'], body['created'], body['updated'], body['invalid']), (2, 0, 1, 1))
+        self.assertEqual(set(body['errors'][0]['errors']), {'id'})
+        product.refresh_from_db()
+        self.assertEqual(product.name, 'First')
+
+    def test_invalidates_top_products(self):
+        product = self.create_product('Best seller')
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(product=product, user=self.user, amount=3)
+        self.assertEqual(self.client.get('/top-products/').json()[0]['name'], 'Best seller')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post([self.row(id=product.id, name='Renamed')])
+        self.assertEqual(self.client.get('/top-products/').json()[0]['name'], 'Renamed')
+
+
+class TopProductsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = self.create_product('First'), self.create_product('Second')
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(product=self.first, user=self.user, amount=5)
+            Order.objects.create(product=self.second, user=self.user, amount=2)
+
+    def ranking(self):
+        response = self.client.get('/top-products/')
+        self.assertEqual(response.status_code, 200)
+        return [(row['name'], row['total_sold']) for row in response.json()]
+
+    def test_ranking_follows_orders(self):
+        self.assertEqual(self.ranking(), [('First', 5), ('Second', 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(product=self.second, user=self.user, amount=4)
+        self.assertEqual(self.ranking(), [('Second', 6), ('First', 5)])
+
+    def test_ranking_built_before_an_invalidation_is_not_served(self):
+        key, rows = sales.ranking_key(), list(sales.ranking_queryset())
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(product=self.second, user=self.user, amount=4)
+        sales.build_ranking(key, rows)
+        self.assertEqual(self.ranking(), [('Second', 6), ('First', 5)])
+
+    def test_product_save_and_delete_invalidate(self):
+        self.assertEqual(self.ranking(), [('First', 5), ('Second', 2)])
+        self.first.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.save()
+        self.assertEqual(self.ranking(), [('Renamed', 5), ('Second', 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.delete()
+        self.assertEqual(self.ranking(), [('Second', 2)])
+
+
+class OrderStatusCountTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product()
+        self.orders = [Order.objects.create(product=self.product, user=self.user, amount=1) for _ in range(3)]
+
+    def counts(self):
+        response = self.client.get('/orders/status-counts/')
+        self.assertEqual(response.status_code, 200)
+        return {status: count for status, count in response.json().items() if count}
+
+    def test_updates(self):
+        self.assertEqual(self.counts(), {'to do': 3})
+        order = self.orders[0]
+        order.status = Order.OrderTypes.DONE
+        order.save()
+        self.assertEqual(self.counts(), {'to do': 2, 'done': 1})
+        self.orders[1].delete()
+        self.assertEqual(self.counts(), {'to do': 1, 'done': 1})
+
+    def test_update_of_partly_loaded_order(self):
+        # The old status is read from the row instead of recounting every order.
+        order = Order.objects.only('id', 'product', 'amount', 'customer_id').get(pk=self.orders[0].pk)
+        order.status = Order.OrderTypes.DOING
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self.assertFalse([query for query in queries if 'GROUP BY' in query['sql']])
+        self.assertEqual(self.counts(), {'to do': 2, 'doing': 1})
+
+    def test_update_of_unloaded_order(self):
+        stored = self.orders[0]
+        order = Order(
+            pk=stored.pk, product=self.product, user=self.user, amount=2, status=Order.OrderTypes.LATED,
+            customer_id=stored.customer_id, created_at=stored.created_at,
+        )
+        order.save()
+        self.assertEqual(self.counts(), {'to do': 2, 'lated': 1})
+        self.assertEqual(Order.objects.count(), 3)
+
+
+class OrderRollupTests(APITestCase):
+    """The incrementally kept rollups always equal what a rebuild from the orders gives."""
+
+    def setUp(self):
+        super().setUp()
+        self.other_user = User.objects.create_user(username='bob', password='pw-secret-123')
+        self.products = [self.create_product(f'Product {index}', price=Decimal(f'{index + 1}.50')) for index in range(3)]
+
+    def snapshot(self):
+        return (
+            set(ProductSales.objects.exclude(total_sold=0).values_list('product_id', 'total_sold')),
+            set(UserDailyStats.objects.exclude(orders=0).values_list('user_id', 'day', 'orders', 'revenue')),
+            {status: count for status, count in status_counts().items() if count},
+        )
+
+    def assertRollupsCurrent(self):
+        kept = self.snapshot()
+        rebuild_product_sales()
+        rebuild_user_stats()
+        rebuild_status_counts()
+        self.assertEqual(kept, self.snapshot())
+
+    def order(self, **fields):
+        return Order.objects.create(**{'product': self.products[0], 'user': self.user, 'amount': 1, **fields})
+
+    def test_create(self):
+        self.order(amount=2)
+        self.order(product=self.products[1], user=self.other_user, amount=3)
+        self.assertEqual(ProductSales.objects.get(product=self.products[0]).total_sold, 2)
+        self.assertRollupsCurrent()
+
+    def test_bulk_create(self):
+        orders, errors = ingest_orders([
+            {'product': self.products[index % 3].id, 'user': self.user.id, 'amount': index + 1} for index in range(6)
+        ] + [{'product': self.products[0].id}])
+        self.assertEqual((len(orders), len(errors)), (6, 1))
+        self.assertEqual(ProductSales.objects.get(product=self.products[2]).total_sold, 3 + 6)
+        self.assertRollupsCurrent()
+
+    def test_bulk_create_writes_each_rollup_once(self):
+        rows = [
+            {'product': product.id, 'user': user.id, 'amount': 2}
+            for product in self.products for user in (self.user, self.other_user)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            ingest_orders(rows * 3)
+        for table in ('users_productsales', 'users_userdailystats', 'users_orderstatuscount'):
+            writes = [query['sql'] for query in queries if table in query['sql'] and 'SELECT' not in query['sql']]
+            self.assertEqual(len(writes), 1, writes)
+            self.assertIn('ON CONFLICT', writes[0])
+        self.assertEqual(ProductSales.objects.get(product=self.products[0]).total_sold, 12)
+        self.assertRollupsCurrent()
+
+    def test_update(self):
+        order = self.order(amount=2)
+        order.amount = 5
+        order.product = self.products[1]
+        order.user = self.other_user
+        order.status = Order.OrderTypes.DONE
+        order.save()
+        order.created_at -= timedelta(days=3)
+        order.save()
+        self.assertRollupsCurrent()
+
+    def test_update_of_unloaded_order(self):
+        stored = self.order(amount=2)
+        Order(
+            pk=stored.pk, product=self.products[2], user=self.other_user, amount=4, customer_id=stored.customer_id,
+            created_at=stored.created_at - timedelta(days=1),
+        ).save()
+        self.assertRollupsCurrent()
+
+    def test_stats_fallback_recounts_the_old_day(self):
+        order = self.order(amount=2)
+        previous = {'user_id': order.user_id, 'created_at': order.created_at}
+        Order.objects.filter(pk=order.pk).update(created_at=order.created_at - timedelta(days=2))
+        order.refresh_from_db()
+        stats.record_order_updated(order, previous)
+        self.assertRollupsCurrent()
+
+    def test_delete(self):
+        orders = [self.order(amount=index + 1) for index in range(3)]
+        self.order(product=self.products[1])
+        orders[0].delete()
+        Order.objects.filter(pk=orders[1].pk).delete()
+        self.products[1].delete()
+        self.assertRollupsCurrent()
+
+
+class CatalogCacheTests(APITestCase):
+    def get(self, path='/products/', status_code=200, **headers):
+        response = self.client.get(path, **headers)
+        self.assertEqual(response.status_code, status_code)
+        return response
+
+    def test_list_follows_writes(self):
+        product = self.create_product('Before')
+        first = self.get()
+        self.assertEqual([row['name'] for row in first.json()['results']], ['Before'])
+        self.get(status_code=304, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        product.name = 'After'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        second = self.get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual([row['name'] for row in second.json()['results']], ['After'])
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_list_follows_deletes(self):
+        kept, deleted = self.create_product('Kept'), self.create_product('Deleted')
+        first = self.get()
+        self.assertNotIn('Last-Modified', first)
+        self.get(status_code=304, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.delete()
+        second = self.get(HTTP_IF_NONE_MATCH=first['ETag'], HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual([row['name'] for row in second.json()['results']], [kept.name])
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=http_date()).status_code, 200)
+
+    def test_wildcard_if_none_match(self):
+        product = self.create_product('Product')
+        self.get('/product/crud/999999', status_code=404, HTTP_IF_NONE_MATCH='*')
+        self.get(f'/product/crud/{product.pk}', status_code=304, HTTP_IF_NONE_MATCH='*')
+        self.get(f'/product/crud/{product.pk}', status_code=304, HTTP_IF_NONE_MATCH='*')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.get(f'/product/crud/{product.pk}', status_code=404, HTTP_IF_NONE_MATCH='*')
+
+    def test_detail_follows_import(self):
+        product = self.create_product('Before')
+        path = f'/product/crud/{product.pk}'
+        self.assertEqual(self.get(path).json()['name'], 'Before')
+        body = json.dumps({'id': product.pk, 'name': 'Imported', 'price': '2.00', 'description': 'd', 'discount': 0})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/products/import/', body, content_type='application/x-ndjson')
+        self.assertEqual(self.get(path).json()['name'], 'Imported')
+
+
+# The sections run on pool threads, whose connections only see committed rows.
+@override_settings(READ_DATABASE_ALIAS='default', TOP_PRODUCTS_CACHE_ALIAS='default', METRICS_SAMPLE_RATE=1)
+class DashboardTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', password='pw-secret-123')
+        self.product = Product.objects.create(
+            name='Lamp', price=Decimal('4.00'), user=self.user, description='A lamp', discount=0
+        )
+        Order.objects.create(product=self.product, user=self.user, amount=3)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_sections(self):
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), {*SECTIONS, 'timings'})
+        self.assertEqual([row['product_name'] for row in data['recent_orders']], ['Lamp'])
+        self.assertEqual([(row['id'], row['total_sold']) for row in data['top_products']], [(self.product.id, 3)])
+        self.assertEqual(data['chart'], daily_stats(self.user, settings.CHART_DEFAULT_DAYS))
+        self.assertEqual(data['profile']['username'], 'alice')
+        self.assertEqual(set(data['timings']), set(SECTIONS))
+
+    def test_server_timing(self):
+        first = self.client.get('/dashboard/')['Server-Timing']
+        # The request's own entries from the metrics middleware, then one per section.
+        self.assertTrue(first.startswith('app;dur='))
+        for name in SECTIONS:
+            self.assertRegex(first, rf'{name};dur=[\d.]+(,|$)')
+        self.assertNotIn('cached', first)
+        # Every section is within its DASHBOARD_SECTION_TTL on the second request.
+        second = self.client.get('/dashboard/')
+        for name in SECTIONS:
+            self.assertRegex(second['Server-Timing'], rf'{name};dur=[\d.]+;desc="cached"')
+        self.assertTrue(all(timing['cached'] for timing in second.json()['timings'].values()))
+
+
+@override_settings(READ_DATABASE_ALIAS='default')
+class MetricsTests(TestCase):
+    def test_closed_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        staff = User.objects.create_user(username='staff', password='pw-secret-123', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+class OpenAPISchemaTests(SimpleTestCase):
+    # staticfiles/ is committed, so a view or serializer change must come with a fresh collectstatic.
+    def test_collected_schema_is_current(self):
+        with open(os.path.join(settings.STATIC_ROOT, settings.SCHEMA_STATIC_PATH), 'rb') as file:
+            content = file.read()
+        self.assertEqual(content, generate_schema())
+        hashed = os.path.join(settings.STATIC_ROOT, hashed_name(settings.SCHEMA_STATIC_PATH, content))
+        self.assertTrue(os.path.exists(hashed))
+
+    def test_schema_redirects_to_hashed_copy(self):
+        response = self.client.get('/schema/')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], collected_schema_url())
+
+
+class GetUsersTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ('bob', 'bobby', 'carol', 'dave', 'boris'):
+            User.objects.create_user(username=name, password='pw-secret-123')
+
+    def pages(self, params):
+        rows, response = [], self.client.get('/get-users/', params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            rows += response.json()['results']
+            if not response.json()['next']:
+                return rows
+            response = self.client.get(response.json()['next'])
+
+    def test_fields(self):
+        rows = self.client.get('/get-users/', {'fields': 'username,id'}).json()['results']
+        self.assertEqual(rows[0], {'username': 'alice', 'id': self.user.id})
+        rows = self.client.get('/get-users/', {'fields': 'id, id,username,id'}).json()['results']
+        self.assertEqual(list(rows[0]), ['id', 'username'])
+        response = self.client.get('/get-users/', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json())
+
+    def test_all_fields(self):
+        row = self.client.get('/get-users/').json()['results'][0]
+        self.assertEqual(set(row), {'id', 'username', 'email', 'bio', 'role', 'user_image', 'user_image_variants'})
+
+    def test_username_prefix(self):
+        rows = self.pages({'q': 'bo', 'fields': 'id', 'page_size': 1})
+        expected = User.objects.filter(username__startswith='bo').order_by('username')
+        self.assertEqual([row['id'] for row in rows], [user.id for user in expected])
+        self.assertEqual(self.client.get('/get-users/', {'q': 'zz'}).json()['results'], [])
+
+    def test_cursor_pages(self):
+        rows = self.pages({'page_size': 2, 'fields': 'username'})
+        usernames = User.objects.order_by('id').values_list('username', flat=True)
+        self.assertEqual([row['username'] for row in rows], list(usernames))
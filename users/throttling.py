@@ -0,0 +1,153 @@
+"""
+Token-bucket throttles for the auth endpoints, shared by all worker processes on a host.
+
+DRF's throttles count in the default cache, which is per process, so N gunicorn
+workers allow N times the limit. These buckets live in a small SQLite database
+(THROTTLE_DATABASE) in WAL mode that every worker opens. A check is one
+INSERT ... ON CONFLICT DO UPDATE ... RETURNING on the bucket's primary key. It
+refills the bucket for the time since its last use and takes a token if one is
+available, atomically and in O(1).
+
+THROTTLE_RATES maps a view's `throttle_scope` to the buckets it draws from, per
+client IP and per submitted username. "5/min" means a burst of 5, refilled at 5
+a minute.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    allowed INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# SET expressions all see the row as it was, so `refilled` is computed from the old values.
+CONSUME = """
+INSERT INTO buckets (key, tokens, updated, allowed) VALUES (:key, :capacity - 1, :now, 1)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = {refilled} - ({refilled} >= 1),
+    updated = max(updated, :now),
+    allowed = {refilled} >= 1
+RETURNING tokens, allowed
+""".format(refilled='min(:capacity, tokens + max(0, :now - updated) * :rate)')
+
+
+def parse_rate(rate):
+    """'5/min' -> (5, 5 / 60): the bucket size and the tokens added per second."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    def __init__(self):
+        self._local = threading.local()
+        self._checks = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        # Reopened if THROTTLE_DATABASE changed (tests give each case its own file).
+        if connection is None or self._local.database != settings.THROTTLE_DATABASE:
+            if connection is not None:
+                connection.close()
+            connection = sqlite3.connect(
+                settings.THROTTLE_DATABASE, timeout=settings.THROTTLE_DATABASE_TIMEOUT, isolation_level=None
+            )
+            # Buckets are cheap to lose, so commits are not synced to disk.
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+            self._local.database = settings.THROTTLE_DATABASE
+        return connection
+
+    def consume(self, key, capacity, rate, now=None):
+        """Take a token from the bucket; return 0 if one was available, else the seconds until one is."""
+        now = time.time() if now is None else now
+        connection = self._connection()
+        tokens, allowed = connection.execute(
+            CONSUME, {'key': key, 'capacity': capacity, 'rate': rate, 'now': now}
+        ).fetchone()
+        self._checks += 1
+        if self._checks % settings.THROTTLE_PRUNE_EVERY == 0:
+            self.prune(now)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def prune(self, now=None):
+        """Drop buckets idle for longer than the slowest refill: they are full, the same as no row."""
+        now = time.time() if now is None else now
+        longest = max(
+            (capacity / rate for buckets in settings.THROTTLE_RATES.values()
+             for capacity, rate in map(parse_rate, buckets.values())),
+            default=0,
+        )
+        self._connection().execute('DELETE FROM buckets WHERE updated < ?', (now - longest,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM buckets')
+
+    def _after_fork(self):
+        # A SQLite connection must not be used across fork(); children open their own.
+        self._local = threading.local()
+
+
+token_buckets = TokenBucketStore()
+
+os.register_at_fork(after_in_child=token_buckets._after_fork)
+
+
+def client_ip(request):
+    # The address the last of REST_FRAMEWORK["NUM_PROXIES"] proxies saw, not what the client wrote into X-Forwarded-For.
+    return BaseThrottle().get_ident(request)
+
+
+def submitted_username(request, data):
+    username = data.get('username') if hasattr(data, 'get') else None
+    return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+
+IDENTITIES = {
+    'ip': lambda request, data: client_ip(request),
+    'username': submitted_username,
+}
+
+
+def throttle_wait(scope, request, data):
+    """Seconds the client has to wait before `scope` serves it again, or None if the request may go ahead."""
+    for kind, rate in settings.THROTTLE_RATES.get(scope, {}).items():
+        ident = IDENTITIES[kind](request, data)
+        if ident is None:
+            continue
+        try:
+            wait = token_buckets.consume(f'{scope}:{kind}:{ident}', *parse_rate(rate))
+        except sqlite3.Error:
+            # A broken store must not take logins down with it.
+            logger.warning('Throttle store unavailable; letting the request through.', exc_info=True)
+            return None
+        if wait:
+            return wait
+    return None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle over the shared buckets of the view's `throttle_scope`."""
+
+    def allow_request(self, request, view):
+        self.wait_seconds = throttle_wait(getattr(view, 'throttle_scope', None), request, request.data)
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,163 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationIndex:
+    """
+    In-memory view of the simplejwt blacklist: a Bloom filter over every revoked jti
+    plus a bounded set of jtis already confirmed as revoked.
+
+    A jti the filter has never seen is definitely not revoked, so the common case
+    needs no query. Rows blacklisted by other processes are pulled in by id at most
+    every REVOCATION_SYNC_INTERVAL seconds, and the filter is rebuilt from the
+    unexpired rows every REVOCATION_REBUILD_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.filter = None
+        self.confirmed = OrderedDict()
+        self.last_id = 0
+        self.synced_at = 0.0
+        self.built_at = 0.0
+        self.database_checks = 0
+
+    def _rebuild(self, now):
+        rows = (
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            .order_by('id')
+            .values_list('id', 'token__jti')
+        )
+        jtis = []
+        last_id = self.last_id
+        for row_id, jti in rows.iterator(chunk_size=5000):
+            jtis.append(jti)
+            last_id = row_id
+        capacity = settings.REVOCATION_FILTER_CAPACITY
+        while capacity < len(jtis) * 2:
+            capacity *= 2
+        bloom = BloomFilter(capacity, settings.REVOCATION_FILTER_ERROR_RATE)
+        for jti in jtis:
+            bloom.add(jti)
+        self.filter, self.last_id, self.built_at, self.synced_at = bloom, last_id, now, now
+
+    def _pull(self, now):
+        rows = BlacklistedToken.objects.filter(id__gt=self.last_id).order_by('id').values_list('id', 'token__jti')
+        for row_id, jti in rows:
+            self.filter.add(jti)
+            self.last_id = row_id
+        self.synced_at = now
+
+    def sync(self):
+        now = time.monotonic()
+        if (
+            self.filter is None
+            or now - self.built_at > settings.REVOCATION_REBUILD_INTERVAL
+            or self.filter.count > self.filter.capacity
+        ):
+            with self._lock:
+                self._rebuild(now)
+        elif now - self.synced_at > settings.REVOCATION_SYNC_INTERVAL:
+            with self._lock:
+                self._pull(now)
+
+    def _confirm(self, jti):
+        self.confirmed[jti] = True
+        self.confirmed.move_to_end(jti)
+        while len(self.confirmed) > settings.REVOCATION_CONFIRMED_SIZE:
+            self.confirmed.popitem(last=False)
+
+    def add(self, jti):
+        self.sync()
+        with self._lock:
+            self.filter.add(jti)
+            self._confirm(jti)
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self.filter:
+            return False
+        with self._lock:
+            if jti in self.confirmed:
+                self.confirmed.move_to_end(jti)
+                return True
+        self.database_checks += 1
+        revoked = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if revoked:
+            with self._lock:
+                self._confirm(jti)
+        return revoked
+
+
+revocation_index = RevocationIndex()
+
+
+class IndexedRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist check goes through `revocation_index`."""
+
+    def check_blacklist(self):
+        if revocation_index.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        jti = self.payload[api_settings.JTI_CLAIM]
+        transaction.on_commit(lambda: revocation_index.add(jti))
+        return result
+
+    def rotate(self):
+        """Blacklist this token if configured and turn it into a new, outstanding refresh token."""
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: self.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None:
+            raise TokenError(_("User not found"))
+        with transaction.atomic():
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                self.blacklist()
+            self.set_jti()
+            self.set_exp()
+            self.set_iat()
+            OutstandingToken.objects.create(
+                user=user,
+                jti=self.payload[api_settings.JTI_CLAIM],
+                token=str(self),
+                created_at=self.current_time,
+                expires_at=datetime_from_epoch(self.payload['exp']),
+            )
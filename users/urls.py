@@ -1,24 +1,50 @@
+from django.conf import settings
 from django.urls import path
 
+from users.async_views import AsyncRegisterAPIView, AsyncLoginAPIView, AsyncChangePasswordAPIView, \
+    AsyncGetUsersAPIView, AsyncProfileAPIView, AsyncRecentOrdersAPIView, AsyncTopSoldProductsAPIView, \
+    AsyncProductsAPIView, AsyncOrderStreamAPIView
 from users.views import RefreshTokenAPIView, GetUsersAPIView, ProfileAPIView, RegisterAPIView, LoginAPIView, \
     RootAPIView, ProfileUpdateAPIView, ProfilePutAPIView, ChangePasswordAPIView, LastOrdersAPIView, RecentOrdersAPIView, \
-    TopSoldProductsAPIView, BarChartGetAPIView, ProductsAPIView, ProductGetUpdateDeleteAPIView, UserDeleteAPIView
+    TopSoldProductsAPIView, BarChartGetAPIView, ProductsAPIView, ProductGetUpdateDeleteAPIView, UserDeleteAPIView, \
+    OrdersExportAPIView, UserCacheStatsAPIView, OrderDetailAPIView, OrderStatusCountsAPIView, \
+    DashboardAPIView, OrderStreamAPIView, OrderChangesAPIView, ProductChangesAPIView, ProductsExportAPIView, \
+    ProductsImportAPIView
 
-urlpatterns = [
-    path('', RootAPIView.as_view()),
-    path('get-users/', GetUsersAPIView.as_view()),
-    path('register/', RegisterAPIView.as_view()),
-    path('login/', LoginAPIView.as_view()),
-    path('token/refresh/', RefreshTokenAPIView.as_view()),
-    path('profile/', ProfileAPIView.as_view()),
-    path('profile/update/', ProfileUpdateAPIView.as_view()),
-    path('profile/put/', ProfilePutAPIView.as_view()),
-    path('change-password/', ChangePasswordAPIView.as_view()),
-    path('user/delete/<int:pk>/', UserDeleteAPIView.as_view()),
-    path('last-orders/', LastOrdersAPIView.as_view()),
-    path('recent-orders/', RecentOrdersAPIView.as_view()),
-    path('top-products/', TopSoldProductsAPIView.as_view()),
-    path('chart/', BarChartGetAPIView.as_view()),
-    path('products/', ProductsAPIView.as_view()),
-    path('product/crud/<int:pk>', ProductGetUpdateDeleteAPIView.as_view()),
-]
\ No newline at end of file
+
+def build_urlpatterns(async_views=False):
+    def view(sync_view, async_view=None):
+        return (async_view if async_views and async_view else sync_view).as_view()
+
+    return [
+        path('', view(RootAPIView)),
+        path('get-users/', view(GetUsersAPIView, AsyncGetUsersAPIView)),
+        path('register/', view(RegisterAPIView, AsyncRegisterAPIView)),
+        path('login/', view(LoginAPIView, AsyncLoginAPIView)),
+        path('token/refresh/', view(RefreshTokenAPIView)),
+        path('profile/', view(ProfileAPIView, AsyncProfileAPIView)),
+        path('profile/update/', view(ProfileUpdateAPIView)),
+        path('profile/put/', view(ProfilePutAPIView)),
+        path('change-password/', view(ChangePasswordAPIView, AsyncChangePasswordAPIView)),
+        path('user/delete/<int:pk>/', view(UserDeleteAPIView)),
+        path('user-cache/stats/', view(UserCacheStatsAPIView)),
+        path('last-orders/', view(LastOrdersAPIView)),
+        path('recent-orders/', view(RecentOrdersAPIView, AsyncRecentOrdersAPIView)),
+        path('orders/export/', view(OrdersExportAPIView)),
+        path('orders/status-counts/', view(OrderStatusCountsAPIView)),
+        path('orders/stream/', view(OrderStreamAPIView, AsyncOrderStreamAPIView)),
+        path('orders/changes/', view(OrderChangesAPIView)),
+        # Keep after the fixed orders/... routes, which it would otherwise shadow.
+        path('orders/<str:customer_id>/', view(OrderDetailAPIView)),
+        path('top-products/', view(TopSoldProductsAPIView, AsyncTopSoldProductsAPIView)),
+        path('chart/', view(BarChartGetAPIView)),
+        path('dashboard/', view(DashboardAPIView)),
+        path('products/', view(ProductsAPIView, AsyncProductsAPIView)),
+        path('products/changes/', view(ProductChangesAPIView)),
+        path('products/export/', view(ProductsExportAPIView)),
+        path('products/import/', view(ProductsImportAPIView)),
+        path('product/crud/<int:pk>', view(ProductGetUpdateDeleteAPIView)),
+    ]
+
+
+urlpatterns = build_urlpatterns(settings.ASYNC_VIEWS)
@@ -1,18 +1,39 @@
-from django.db.models import Sum
-from rest_framework.exceptions import ValidationError
+import codecs
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.generics import GenericAPIView
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
+from . import auth
+from .authentication import user_cache
+from .caching import CatalogListCacheMixin, CatalogDetailCacheMixin
+from .dashboard import build_dashboard
+from .events import event_stream_response, last_event_id, order_events, stream
+from .filters import ProductFilterBackend, UsernamePrefixFilterBackend, product_ordering, user_ordering
+from .exports import EXPORT_FORMATS, CONTENT_TYPES, ORDER_EXPORT_FIELDS, PRODUCT_EXPORT_FIELDS, ExportFilterError, \
+    order_export_queryset, product_export_queryset, iter_export
+from .imports import import_products
+from .ingest import ingest_orders
 from .models import User, Order, Product
+from .openapi import extend_schema
+from .pagination import KeysetPagination
+from .renderers import EventStreamRenderer, ORJSONRenderer
+from .rows import ValuesListMixin, ValuesSerializer
+from .sales import top_products
+from .stats import daily_stats
+from .throttling import TokenBucketThrottle
+from .statuses import status_counts
+from .sync import changes
 from .serializers import RegisterSerializer, LoginSerializer, RefreshTokenSerializer, UserProfileSerializer, \
     UserProfileUpdateSerializer, UserPutPatchSerializer, ChangePasswordSerializer, LastOrdersSerializer, \
-    RecentOrdersSerializer, TopProductSerializer, ProductsSerializer, UsersSerializer
-from django.contrib.auth import authenticate
+    ProductsSerializer, UsersSerializer, recent_orders_values_serializer
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from drf_spectacular.utils import extend_schema, OpenApiExample
+from drf_spectacular.utils import OpenApiExample, OpenApiParameter
 from rest_framework import generics
 
 
@@ -28,6 +49,9 @@ class RootAPIView(APIView):
         return Response(response)
 
 class RegisterAPIView(APIView):
+    throttle_classes = (TokenBucketThrottle, )
+    throttle_scope = 'register'
+
     @extend_schema(
         tags=["auth"],
         request=RegisterSerializer,
@@ -44,18 +68,13 @@ class RegisterAPIView(APIView):
         ]
     )
     def post(self, request):
-        serializer = RegisterSerializer(data=request.data)
-        if serializer.is_valid():
-            user = serializer.save()
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                "user": serializer.data,
-                "access_token": str(refresh.access_token),
-                "refresh_token": str(refresh),
-            }, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        body, code = auth.register(request.data)
+        return Response(body, status=code)
 
 class LoginAPIView(APIView):
+    throttle_classes = (TokenBucketThrottle, )
+    throttle_scope = 'login'
+
     @extend_schema(
         tags=["auth"],
         request=LoginSerializer,
@@ -71,23 +90,13 @@ class LoginAPIView(APIView):
         ]
     )
     def post(self, request):
-        serializer = LoginSerializer(data=request.data)
-        if serializer.is_valid():
-            username = serializer.validated_data['username']
-            password = serializer.validated_data['password']
-            user = authenticate(username=username, password=password)
-            if user:
-                if not user.is_active:
-                    return Response({"error": "User account is inactive."}, status=status.HTTP_401_UNAUTHORIZED)
-                refresh = RefreshToken.for_user(user)
-                return Response({
-                    "access_token": str(refresh.access_token),
-                    "refresh_token": str(refresh),
-                }, status=status.HTTP_200_OK)
-            return Response({"error": "Invalid username or password."}, status=status.HTTP_401_UNAUTHORIZED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        body, code = auth.login(request.data)
+        return Response(body, status=code)
 
 class RefreshTokenAPIView(APIView):
+    throttle_classes = (TokenBucketThrottle, )
+    throttle_scope = 'refresh'
+
     @extend_schema(
         tags=["auth"],
         request=RefreshTokenSerializer,
@@ -104,17 +113,27 @@ class RefreshTokenAPIView(APIView):
     def post(self, request):
         serializer = RefreshTokenSerializer(data=request.data)
         if serializer.is_valid():
-            return Response({
-                "access": serializer.validated_data["access"]
-            }, status=status.HTTP_200_OK)
+            response = {"access": serializer.validated_data["access"]}
+            if "refresh" in serializer.validated_data:
+                response["refresh"] = serializer.validated_data["refresh"]
+            return Response(response, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@extend_schema(tags=['users'])
-class GetUsersAPIView(generics.ListAPIView):
+@extend_schema(tags=['users'], parameters=[
+    OpenApiParameter('fields', str, description='Comma-separated subset of the user fields, e.g. id,username.'),
+])
+class GetUsersAPIView(ValuesListMixin, generics.ListAPIView):
     permission_classes = (IsAuthenticated, )
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
     serializer_class = UsersSerializer
     queryset = User.objects.all()
+    filter_backends = (UsernamePrefixFilterBackend, )
+    pagination_class = KeysetPagination
+    fields_query_param = 'fields'
+
+    def get_keyset_ordering(self, request):
+        return user_ordering(request.query_params)
 
 class ProfileAPIView(GenericAPIView):
     permission_classes = (IsAuthenticated,)
@@ -181,20 +200,18 @@ class ChangePasswordAPIView(APIView):
     permission_classes = (IsAuthenticated,)
     @extend_schema(request=ChangePasswordSerializer, tags=['auth'])
     def post(self, request):
-        serializer = ChangePasswordSerializer(data=request.data, context={'request': request})
-
-        if serializer.is_valid():
-            serializer.save()
-            return Response({"message": "Password changed successfully."}, status=status.HTTP_200_OK)
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        body, code = auth.change_password(request, request.data)
+        return Response(body, status=code)
 
 class LastOrdersAPIView(APIView):
     permission_classes = (IsAuthenticated,)
     @extend_schema(tags=['orders'])
     def get(self, request):
-        # Fetch all orders
-        orders = Order.objects.all()
+        paginator = KeysetPagination()
+        orders = paginator.paginate_queryset(
+            Order.objects.select_related('product').only('id', 'customer_id', 'created_at', 'status', 'product__name'),
+            request,
+        )
 
         response = [
             {
@@ -205,67 +222,223 @@ class LastOrdersAPIView(APIView):
             }
             for order in orders
         ]
-        return Response(response, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(response)
 
-    @extend_schema(tags=['orders'], request=LastOrdersSerializer)
+    @extend_schema(tags=['orders'], request=LastOrdersSerializer(many=True))
     def post(self, request):
-        serializer = LastOrdersSerializer(data=request.data, many=True)
+        if not isinstance(request.data, list):
+            return Response(
+                {"non_field_errors": [f'Expected a list of items but got type "{type(request.data).__name__}".']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        else:
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        orders, errors = ingest_orders(request.data)
+        response = {
+            "created": len(orders),
+            "errors": errors,
+        }
+        if errors and not orders:
+            return Response(response, status=status.HTTP_400_BAD_REQUEST)
+        return Response(response, status=status.HTTP_201_CREATED)
 
 
 class RecentOrdersAPIView(APIView):
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
+
+    @extend_schema(tags=['orders'])
+    def get(self, request):
+        serializer = recent_orders_values_serializer()
+        paginator = KeysetPagination()
+        orders = paginator.paginate_queryset(serializer.rows(Order.objects.all()), request)
+        return paginator.get_paginated_response(serializer.serialize(orders))
+
+
+class OrdersExportAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
     @extend_schema(tags=['orders'])
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({"output": f"Choose one of: {', '.join(EXPORT_FORMATS)}."})
+        try:
+            queryset = order_export_queryset(
+                created_after=request.query_params.get('created_after'),
+                created_before=request.query_params.get('created_before'),
+                status=request.query_params.get('status'),
+            )
+        except ExportFilterError as e:
+            raise ValidationError({"detail": str(e)})
+
+        response = StreamingHttpResponse(
+            iter_export(output, queryset, ORDER_EXPORT_FIELDS),
+            content_type=CONTENT_TYPES[output],
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders.{output}"'
+        return response
+
+
+class OrderStatusCountsAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
 
+    @extend_schema(tags=['orders'])
     def get(self, request):
-        orders = Order.objects.all()
-        serializer = RecentOrdersSerializer(orders, many=True)
-        # 'created_at', 'price', 'username', 'product_name'
-        response = [
-            {
-                "product_name": order["product_name"],
-                "price": order["price"],
-                "username": order["username"],
-                "created_at": f"{order['created_at'].split('T')[0]}",
-            }
-            for order in serializer.data
-        ]
-        return Response(response, status=status.HTTP_200_OK)
+        return Response(status_counts())
+
+
+def stream_unavailable():
+    return Response(
+        {"detail": "Too many open streams, try again shortly."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(settings.ORDER_STREAM_RETRY_MS // 1000)},
+    )
+
+
+class OrderStreamAPIView(APIView):
+    """
+    Server-sent events of order creations, status changes and deletions (users.events).
+    Under WSGI every open stream holds a worker, so it is refused unless
+    ORDER_STREAM_WSGI_SECONDS bounds it; the asgi profile serves AsyncOrderStreamAPIView.
+    """
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (EventStreamRenderer, ORJSONRenderer)
+
+    @extend_schema(tags=['orders'], responses={(200, 'text/event-stream'): str})
+    def get(self, request):
+        if not settings.ORDER_STREAM_WSGI_SECONDS:
+            return Response(
+                {"detail": "The order stream is served by the asgi process type only."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        if order_events.is_full():
+            return stream_unavailable()
+        return event_stream_response(stream(last_event_id(request), settings.ORDER_STREAM_WSGI_SECONDS))
+
+
+SYNC_PARAMETERS = [
+    OpenApiParameter('since', str, description='The "since" token of the last response; omit it to sync from scratch.'),
+    OpenApiParameter('page_size', int),
+]
+
+
+class OrderChangesAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
+
+    @extend_schema(tags=['orders'], parameters=SYNC_PARAMETERS)
+    def get(self, request):
+        serializer = ValuesSerializer(LastOrdersSerializer, context={'request': request})
+        return Response(changes(Order, serializer, request.query_params))
+
+
+@extend_schema(tags=['orders'])
+class OrderDetailAPIView(generics.RetrieveAPIView):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = LastOrdersSerializer
+    queryset = Order.objects.all()
+    lookup_field = 'customer_id'
+
+
+def top_products_limit(query_params):
+    try:
+        limit = int(query_params.get('limit', 3))
+    except ValueError:
+        raise ValidationError({"limit": "A valid integer is required."})
+    return max(1, min(limit, settings.TOP_PRODUCTS_CACHE_SIZE))
 
 
 class TopSoldProductsAPIView(APIView):
     permission_classes = (IsAuthenticated,)
     def get(self, request):
-        top_products = (
-            Product.objects
-            .annotate(total_sold=Sum('order__amount'))
-            .order_by('-total_sold')[:3]
-        )
-        serializer = TopProductSerializer(top_products, many=True)
-        return Response(serializer.data)
+        return Response(top_products(top_products_limit(request.query_params)))
 
 class BarChartGetAPIView(APIView):
     permission_classes = (IsAuthenticated,)
     def get(self, request):
-        user = request.user
-        db_user = User.objects.get(id=user.id)
-        return Response({"data": db_user.statistics})
-        # return Response({"message": "you are not authorized"})
+        try:
+            days = int(request.query_params.get('days', settings.CHART_DEFAULT_DAYS))
+        except ValueError:
+            raise ValidationError({"days": "A valid integer is required."})
+        days = max(1, min(days, settings.CHART_MAX_DAYS))
+        return Response({"data": daily_stats(request.user, days)})
+
+class DashboardAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(tags=['dashboard'])
+    def get(self, request):
+        data, timings = build_dashboard(request)
+        data['timings'] = {
+            name: {'ms': round(seconds * 1000, 2), 'cached': cached} for name, (seconds, cached) in timings.items()
+        }
+        response = Response(data)
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.1f}' + (';desc="cached"' if cached else '')
+            for name, (seconds, cached) in timings.items()
+        )
+        return response
 
 @extend_schema(tags=['products'], request=ProductsSerializer)
-class ProductsAPIView(generics.ListCreateAPIView):
+class ProductsAPIView(CatalogListCacheMixin, ValuesListMixin, generics.ListCreateAPIView):
     permission_classes = (IsAuthenticated, )
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
     queryset = Product.objects.all()
     serializer_class = ProductsSerializer
+    filter_backends = (ProductFilterBackend, )
+    pagination_class = KeysetPagination
+
+    def get_keyset_ordering(self, request):
+        return product_ordering(request.query_params)
+
+
+class ProductChangesAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
+
+    @extend_schema(tags=['products'], parameters=SYNC_PARAMETERS)
+    def get(self, request):
+        serializer = ValuesSerializer(ProductsSerializer, context={'request': request})
+        return Response(changes(Product, serializer, request.query_params))
+
+
+class ProductsExportAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(tags=['products'])
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({"output": f"Choose one of: {', '.join(EXPORT_FORMATS)}."})
+        response = StreamingHttpResponse(
+            iter_export(output, product_export_queryset(), PRODUCT_EXPORT_FIELDS),
+            content_type=CONTENT_TYPES[output],
+        )
+        response['Content-Disposition'] = f'attachment; filename="products.{output}"'
+        return response
+
+
+class ProductsImportAPIView(APIView):
+    """Upserts the CSV or NDJSON body (by Content-Type) while reading it; see users.imports."""
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
+    input_formats = {content_type: name for name, content_type in CONTENT_TYPES.items()}
+
+    @extend_schema(tags=['products'], request={content_type: str for content_type in CONTENT_TYPES.values()})
+    def post(self, request):
+        media_type = request.content_type.split(';')[0].strip()
+        if media_type not in self.input_formats:
+            raise UnsupportedMediaType(media_type)
+        # request.data is never touched: the body is read line by line as the batches are written.
+        lines = codecs.iterdecode(request.stream or (), 'utf-8-sig')
+        summary = import_products(lines, self.input_formats[media_type], request.user.pk)
+        if summary.invalid and not (summary.created or summary.updated):
+            return Response(summary.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary.as_dict())
 
 
 @extend_schema(tags=['products'], request=ProductsSerializer)
-class ProductGetUpdateDeleteAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ProductGetUpdateDeleteAPIView(CatalogDetailCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = (IsAuthenticated, )
     queryset = Product.objects.all()
     serializer_class = ProductsSerializer
@@ -276,3 +449,10 @@ class UserDeleteAPIView(generics.DestroyAPIView):
     serializer_class = UsersSerializer
     queryset = User.objects.all()
 
+
+class UserCacheStatsAPIView(APIView):
+    permission_classes = (IsAdminUser, )
+
+    @extend_schema(tags=['users'])
+    def get(self, request):
+        return Response(user_cache.stats())